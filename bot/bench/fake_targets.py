@@ -0,0 +1,73 @@
+import asyncio
+import socket
+
+# 라우팅되지 않는 TEST-NET-1 주소: SYN에 응답이 없어 체크가 timeout까지 걸린다
+BLACKHOLE_HOST = "192.0.2.1"
+
+
+class TargetFleet:
+    """
+    Local TCP targets for the benchmark.
+      open         listens and accepts immediately
+      refused      port with no listener (connect is refused)
+      slow_accept  listens with a backlog of 1 and accepts one connection every accept_delay seconds,
+                   so bursts queue in the kernel and connects stall
+      blackhole    BLACKHOLE_HOST (no answer at all)
+    """
+
+    def __init__(self, host:str="127.0.0.1", accept_delay:float=0.2):
+        self.host = host
+        self.accept_delay = accept_delay
+        self.targets = {'open': list(), 'refused': list(), 'slow_accept': list(), 'blackhole': list()}
+        self.servers = list()
+        self.sockets = list()
+        self.tasks = list()
+
+    async def start(self, open_count:int, refused_count:int, slow_count:int, blackhole_count:int):
+        for _ in range(open_count):
+            server = await asyncio.start_server(self._accept_and_close, self.host, 0, backlog=1024)
+            self.servers.append(server)
+            self.targets['open'].append((self.host, server.sockets[0].getsockname()[1]))
+
+        for _ in range(refused_count):
+            # bind만 하고 listen 하지 않은 포트는 RST로 거부된다
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((self.host, 0))
+            self.sockets.append(sock)
+            self.targets['refused'].append((self.host, sock.getsockname()[1]))
+
+        for _ in range(slow_count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind((self.host, 0))
+            sock.listen(1)
+            sock.setblocking(False)
+            self.sockets.append(sock)
+            self.tasks.append(asyncio.create_task(self._slow_accept(sock)))
+            self.targets['slow_accept'].append((self.host, sock.getsockname()[1]))
+
+        # blackhole은 포트만 다르게 해서 서로 다른 대상으로 취급
+        self.targets['blackhole'] = [(BLACKHOLE_HOST, 10000 + index) for index in range(blackhole_count)]
+
+    async def _accept_and_close(self, reader, writer):
+        writer.close()
+
+    async def _slow_accept(self, sock:socket.socket):
+        while True:
+            await asyncio.sleep(self.accept_delay)
+            try:
+                conn = sock.accept()[0]
+                conn.close()
+            except BlockingIOError:
+                pass
+
+    def all_targets(self) -> list:
+        """(kind, host, port) 목록"""
+        return [(kind, host, port) for kind, targets in self.targets.items() for host, port in targets]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for server in self.servers:
+            server.close()
+        for sock in self.sockets:
+            sock.close()
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import random
+
+
+class FakeTelegramAPI:
+    """
+    Local stand-in for the Telegram Bot API (HTTP/1.1 keep-alive, any /bot<token>/<method>).
+    rate_limit_ratio: 해당 비율의 요청에 429 + retry_after를 응답
+    """
+
+    def __init__(self, host:str="127.0.0.1", rate_limit_ratio:float=0.0, retry_after:int=1):
+        self.host = host
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.server = None
+        self.port = None
+        self.requests = 0
+        self.rate_limited = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n\r\n")
+                content_length = 0
+                for line in header.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        content_length = int(line.split(b":", 1)[1])
+                if content_length:
+                    await reader.readexactly(content_length)
+                self.requests += 1
+
+                if random.random() < self.rate_limit_ratio:
+                    self.rate_limited += 1
+                    status = b"429 Too Many Requests"
+                    body = {'ok': False, 'error_code': 429, 'parameters': {'retry_after': self.retry_after}}
+                else:
+                    status = b"200 OK"
+                    body = {'ok': True, 'result': {'message_id': self.requests}}
+                payload = json.dumps(body).encode()
+                writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Type: application/json\r\nContent-Length: "
+                             + str(len(payload)).encode() + b"\r\n\r\n" + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
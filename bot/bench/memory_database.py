@@ -0,0 +1,262 @@
+import asyncio
+
+from collections import Counter
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from database.database import DEFAULT_USER_TYPE, Database, service_document, summary_entry
+from model.service_model import ServiceDataModel
+from model.user_model import UserModel
+
+
+class MemoryCollection:
+    """Minimal in-process collection for the write-only paths (probe history / rollups)."""
+
+    def __init__(self, name:str, ops:Counter):
+        self.name = name
+        self.ops = ops
+        self.count = 0
+
+    async def insert_many(self, documents, ordered=True):
+        self.ops[f"{self.name}.insert_many"] += 1
+        self.count += len(documents)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.ops[f"{self.name}.bulk_write"] += 1
+        self.count += len(requests)
+
+    async def create_index(self, keys, **kwargs):
+        return kwargs.get('name')
+
+    def find(self, *args, **kwargs):
+        return _EmptyCursor()
+
+
+class _EmptyCursor:
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class MemoryMongoDatabase:
+    def __init__(self, ops:Counter):
+        self.ops = ops
+        self.collections = dict()
+
+    def __getitem__(self, name:str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name, self.ops)
+        return self.collections[name]
+
+    async def create_collection(self, name:str, **kwargs):
+        return self[name]
+
+
+class MemoryMongoClient:
+    def __init__(self, ops:Counter):
+        self.database = MemoryMongoDatabase(ops)
+
+    def __getitem__(self, name:str) -> MemoryMongoDatabase:
+        return self.database
+
+
+class MemoryDatabase(Database):
+    """
+    In-process stand-in for Database used by the benchmark.
+    Implements the methods the scheduler and command handlers call and counts every operation.
+    """
+
+    def __new__(cls):
+        instance = object.__new__(cls)
+        instance.ops = Counter()
+        instance.mongo_client = MemoryMongoClient(instance.ops)
+        instance.db = instance.mongo_client['bench']
+        instance.health_task = None
+        instance.ready = asyncio.Event()
+        instance.ready.set()
+        instance.redis_client = None
+        instance.services = dict()  # _id -> document
+        instance.chat_services = dict()  # chat_id -> {alias: _id} (Mongo의 (chat_id, alias) 인덱스 역할)
+        instance.users = dict()
+        return instance
+
+    def install(self):
+        """이후의 Database() 호출이 이 인스턴스를 반환하도록 등록"""
+        Database._instance = self
+        return self
+
+    def total_ops(self) -> int:
+        return sum(self.ops.values())
+
+    async def ensure_indexes(self):
+        pass
+
+    async def migrate_datetime_fields(self):
+        pass
+
+    async def migrate_chat_summaries(self):
+        pass
+
+    async def insert_service_data(self, chat_id:str, service_info:ServiceDataModel, host_limit:int=None):
+        self.ops['insert_service_data'] += 1
+        service_id = ObjectId()
+        if not await self.reserve_summary_entry(chat_id, summary_entry(service_id, service_info.model_dump()), host_limit):
+            return None
+        for existing_id in self.chat_services.get(chat_id, dict()).values():
+            service_item = self.services[existing_id]
+            if (service_item['host'], service_item['port'], service_item.get('url')) == \
+                    (service_info.host, service_info.port, service_info.url):
+                del self.chat_services[chat_id][service_item['alias']]
+                await self.release_summary_entry(chat_id, service_id)
+                for entry in self.users[chat_id]['services']:
+                    if entry['_id'] == existing_id:
+                        entry.update(summary_entry(existing_id, service_info.model_dump()))
+                break
+        else:
+            service_item = {'_id': service_id}
+        datetime_now = datetime.now()
+        service_item.update(service_info.model_dump(), chat_id=chat_id, last_check_time=datetime_now,
+                            next_check_time=datetime_now + timedelta(seconds=service_info.interval))
+        self._index(service_item)
+        return dict(service_item)
+
+    async def bulk_insert_services(self, chat_id:str, service_infos:list, host_limit:int=None) -> tuple:
+        self.ops['bulk_insert_services'] += 1
+        datetime_now = datetime.now()
+        documents = [dict(service_document(chat_id, service_info, datetime_now), _id=ObjectId())
+                     for service_info in service_infos]
+        if not await self.reserve_summary_entries(chat_id, [summary_entry(document['_id'], document)
+                                                            for document in documents], host_limit):
+            return list(), {index: "service limit reached" for index in range(len(documents))}
+        errors = dict()
+        for index, document in enumerate(documents):
+            existing = [self.services[service_id] for service_id in self.chat_services.get(chat_id, dict()).values()]
+            if any(service_item['alias'] == document['alias'] or
+                   (service_item['host'], service_item['port'], service_item.get('url')) ==
+                   (document['host'], document['port'], document['url']) for service_item in existing):
+                errors[index] = "service already exists (same alias or target)"
+            else:
+                self._index(document)
+        if errors:
+            await self.release_summary_entries(chat_id, [documents[index]['_id'] for index in errors])
+        return [dict(document) for index, document in enumerate(documents) if index not in errors], errors
+
+    async def reserve_summary_entry(self, chat_id:str, entry:dict, host_limit:int=None) -> bool:
+        return await self.reserve_summary_entries(chat_id, [entry], host_limit)
+
+    async def reserve_summary_entries(self, chat_id:str, entries:list, host_limit:int=None) -> bool:
+        self.ops['reserve_summary_entries'] += 1
+        summary = self.users.setdefault(chat_id, UserModel(chat_id=chat_id, host_cnt=0,
+                                                           user_type=DEFAULT_USER_TYPE).model_dump())
+        if host_limit and summary['host_cnt'] > host_limit - len(entries):
+            return False
+        summary['host_cnt'] += len(entries)
+        summary['services'].extend(entries)
+        return True
+
+    async def release_summary_entries(self, chat_id:str, service_ids:list):
+        for service_id in service_ids:
+            await self.release_summary_entry(chat_id, service_id)
+
+    async def release_summary_entry(self, chat_id:str, service_id):
+        self.ops['release_summary_entry'] += 1
+        summary = self.users.get(chat_id)
+        if summary is not None and any(entry['_id'] == service_id for entry in summary['services']):
+            summary['host_cnt'] -= 1
+            summary['services'] = [entry for entry in summary['services'] if entry['_id'] != service_id]
+
+    def _index(self, service_item:dict):
+        self.services[service_item['_id']] = service_item
+        self.chat_services.setdefault(service_item['chat_id'], dict())[service_item['alias']] = service_item['_id']
+
+    def load_services(self, services:list):
+        for service_item in services:
+            self._index(service_item)
+            summary = self.users.setdefault(service_item['chat_id'], UserModel(
+                chat_id=service_item['chat_id'], host_cnt=0, user_type=DEFAULT_USER_TYPE).model_dump())
+            summary['host_cnt'] += 1
+            summary['services'].append(summary_entry(service_item['_id'], service_item))
+
+    async def bulk_update_service_data(self, updates:dict):
+        self.ops['bulk_update_service_data'] += 1
+        self.ops['bulk_update_service_data.documents'] += len(updates)
+        for service_id, fields in updates.items():
+            if service_id in self.services:
+                self.services[service_id].update(fields)
+
+    async def remove_service_data(self, chat_id:str, alias:str=None, host:str=None, port:int=None) -> dict:
+        self.ops['remove_service_data'] += 1
+        aliases = self.chat_services.get(chat_id, dict())
+        for service_alias, service_id in aliases.items():
+            service_item = self.services[service_id]
+            if (alias is not None and service_alias == alias) or \
+                    (alias is None and (service_item['host'], service_item['port']) == (host, port)):
+                del self.services[service_id]
+                del aliases[service_alias]
+                await self.release_summary_entry(chat_id, service_id)
+                return service_item
+        return None
+
+    async def get_all_services(self, projection:dict=None) -> list:
+        self.ops['get_all_services'] += 1
+        return [dict(service_item) for service_item in self.services.values()]
+
+    async def iter_all_services(self, projection:dict=None, batch_size:int=500):
+        self.ops['iter_all_services'] += 1
+        for index, service_id in enumerate(sorted(self.services)):
+            if index % batch_size == 0:
+                # cursor의 batch 경계처럼 event loop에 양보
+                await asyncio.sleep(0)
+            if service_id in self.services:
+                yield dict(self.services[service_id])
+
+    async def iter_services_by_time(self, datetime_range, projection:dict=None, batch_size:int=500):
+        self.ops['iter_services_by_time'] += 1
+        due = sorted((service_item['next_check_time'], service_id) for service_id, service_item in self.services.items()
+                     if service_item['next_check_time'] < datetime_range)
+        for index, (_, service_id) in enumerate(due):
+            if index % batch_size == 0:
+                await asyncio.sleep(0)
+            if service_id in self.services:
+                yield dict(self.services[service_id])
+
+    async def get_services_by_chat_id(self, chat_id:str, projection:dict=None) -> list:
+        self.ops['get_services_by_chat_id'] += 1
+        return [dict(self.services[service_id]) for service_id in self.chat_services.get(chat_id, dict()).values()]
+
+    async def get_services_page(self, chat_id:str, after_id=None, before_id=None, limit:int=20) -> tuple:
+        self.ops['get_services_page'] += 1
+        service_ids = sorted(self.chat_services.get(chat_id, dict()).values())
+        if after_id is not None:
+            service_ids = [service_id for service_id in service_ids if service_id > after_id][:limit + 1]
+        elif before_id is not None:
+            service_ids = [service_id for service_id in service_ids if service_id < before_id][-(limit + 1):]
+        else:
+            service_ids = service_ids[:limit + 1]
+        has_more = len(service_ids) > limit
+        if has_more:
+            service_ids = service_ids[1:] if before_id is not None else service_ids[:limit]
+        return [dict(self.services[service_id]) for service_id in service_ids], has_more
+
+    async def iter_services_by_chat_id(self, chat_id:str, projection:dict=None, batch_size:int=500):
+        self.ops['iter_services_by_chat_id'] += 1
+        for service_id in sorted(self.chat_services.get(chat_id, dict()).values()):
+            yield dict(self.services[service_id])
+
+    async def load_resume_token(self, name:str):
+        return None
+
+    def watch_services(self, resume_after=None, max_await_time_ms:int=1000):
+        # standalone MongoDB와 같이 동작: change stream 없이 벤치마크 프로세스의 변경만 반영
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    async def get_user_by_chat_id(self, chat_id:str) -> dict:
+        self.ops['get_user_by_chat_id'] += 1
+        return self.users.get(chat_id)
+
+    async def get_service_by_chat_id_and_alias(self, chat_id:str, alias:str) -> dict:
+        self.ops['get_service_by_chat_id_and_alias'] += 1
+        service_id = self.chat_services.get(chat_id, dict()).get(alias)
+        return dict(self.services[service_id]) if service_id is not None else None
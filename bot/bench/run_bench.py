@@ -0,0 +1,288 @@
+"""
+Local benchmark for the scheduler, probe and persistence paths.
+
+    cd bot && python -m bench.run_bench --scales 1000,10000,100000 --duration 30
+
+Every scale starts a fresh fleet of local TCP targets (open / refused / slow_accept / blackhole),
+an in-process Database stand-in (or a real MongoDB with --mongo) and a fake Telegram API,
+then runs greet_every_interval and the /add, /list, /remove handlers against them.
+Results are written as JSON (default: bench/results/bench-<timestamp>.json).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import time
+
+from datetime import datetime
+from bson import ObjectId
+from bench.fake_targets import TargetFleet
+from bench.fake_telegram import FakeTelegramAPI
+from bench.memory_database import MemoryDatabase
+from database.database import Database
+from notification.telegram_dispatcher import TelegramDispatcher
+from scheduler.monitor import Monitor
+import telegram_event_handler
+
+SERVICES_PER_CHAT = 50
+
+
+def percentile(values:list, p:float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def summarize(values:list) -> dict:
+    return {'count': len(values),
+            'p50': percentile(values, 50), 'p95': percentile(values, 95), 'p99': percentile(values, 99),
+            'max': max(values) if values else None,
+            'mean': statistics.fmean(values) if values else None}
+
+
+def rss_mb() -> float:
+    with open('/proc/self/status') as status_file:
+        for line in status_file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def raise_nofile_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class FakeMessage:
+    def __init__(self, chat_id:str, dispatcher:TelegramDispatcher):
+        self.chat_id = chat_id
+        self.dispatcher = dispatcher
+
+    async def reply_text(self, text:str, **kwargs):
+        if kwargs.get('reply_markup') is not None:
+            kwargs['reply_markup'] = kwargs['reply_markup'].to_dict()
+        await self.dispatcher.send(self.chat_id, text, **kwargs)
+
+
+class FakeUpdate:
+    def __init__(self, message:FakeMessage):
+        self.message = message
+
+
+class FakeContext:
+    def __init__(self, args:list):
+        self.args = args
+
+
+def reset_singletons():
+    Database._instance = None
+    Monitor._instance = None
+    TelegramDispatcher._instance = None
+
+
+def count_calls(instance, counter:dict, names:list):
+    """실제 Mongo 사용 시 Database 메소드 호출 횟수를 센다"""
+    for name in names:
+        method = getattr(instance, name)
+
+        async def wrapper(*args, __method=method, __name=name, **kwargs):
+            counter[__name] = counter.get(__name, 0) + 1
+            return await __method(*args, **kwargs)
+        setattr(instance, name, wrapper)
+
+
+async def setup_database(args, service_count:int, targets:list) -> tuple:
+    """(database, ops counter) 반환. 서비스 문서는 fleet 대상에 round-robin으로 분배"""
+    datetime_now = time.time()
+    services = list()
+    for index in range(service_count):
+        kind, host, port = targets[index % len(targets)]
+        services.append({'_id': ObjectId(), 'chat_id': f"bench-{index // SERVICES_PER_CHAT}",
+                         'host': host, 'port': port, 'alias': f"{kind}-{index}", 'interval': args.interval,
+                         'status': 'init', 'probe_type': 'tcp', 'url': None,
+                         'expect_status': None, 'expect_body': None,
+                         'last_check_time': datetime.fromtimestamp(datetime_now),
+                         # 첫 체크를 interval 안에 고르게 분산
+                         'next_check_time': datetime.fromtimestamp(datetime_now + random.uniform(0, args.interval))})
+
+    if not args.mongo:
+        database = MemoryDatabase().install()
+        database.load_services(services)
+        return database, database.ops
+
+    database = Database()
+    await database.initialize_connection()
+    await database.ensure_indexes()
+    await database.get_service_collection.delete_many({'chat_id': {'$regex': '^bench-'}})
+    for start in range(0, len(services), 10000):
+        await database.get_service_collection.insert_many(services[start:start + 10000], ordered=False)
+    ops = dict()
+    count_calls(database, ops, ['insert_service_data', 'bulk_update_service_data', 'remove_service_data',
+                                'reserve_summary_entries', 'release_summary_entry', 'release_summary_entries', 'bulk_insert_services', 'get_all_services', 'get_services_by_chat_id',
+                                'get_user_by_chat_id', 'get_service_by_chat_id_and_alias', 'get_services_page'])
+    return database, ops
+
+
+async def drive_handlers(args, dispatcher:TelegramDispatcher, targets:list, timings:dict):
+    """명령어 핸들러를 일정 속도로 호출하며 처리 시간을 측정"""
+    delay = args.duration / max(args.commands, 1)
+    for index in range(args.commands):
+        chat_id = f"bench-cmd-{index % 10}"
+        update = FakeUpdate(FakeMessage(chat_id, dispatcher))
+        kind, host, port = random.choice(targets)
+        alias = f"cmd-{index}"
+        for name, handler, handler_args in (
+                ('add', telegram_event_handler.add_service, [host, str(port), str(args.interval), alias]),
+                ('list', telegram_event_handler.list_service, []),
+                ('remove', telegram_event_handler.remove_service, [alias])):
+            started = time.perf_counter()
+            await handler(update, FakeContext(handler_args))
+            timings.setdefault(name, list()).append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(delay)
+
+
+async def run_scale(args, service_count:int) -> dict:
+    reset_singletons()
+    fleet = TargetFleet(accept_delay=args.accept_delay)
+    open_count = max(int(args.targets * 0.7), 1)
+    other_count = max(int(args.targets * 0.1), 1)
+    await fleet.start(open_count, other_count, other_count, other_count)
+    targets = fleet.all_targets()
+
+    telegram_api = FakeTelegramAPI(rate_limit_ratio=args.rate_limit_ratio)
+    await telegram_api.start()
+
+    database, ops = await setup_database(args, service_count, targets)
+    dispatcher = TelegramDispatcher()
+    await dispatcher.start("bench-token", telegram_api.url)
+
+    monitor = Monitor()
+    monitor.snapshot_path = None
+
+    # 스케줄러 지연(예정 시각 대비 실제 dispatch 시각)과 probe 결과를 수집
+    lateness = list()
+    pop_due = monitor.scheduler.pop_due
+
+    def recording_pop_due(now, limit=None):
+        due_items = pop_due(now, limit)
+        lateness.extend((now - due) * 1000 for _, due in due_items)
+        return due_items
+    monitor.scheduler.pop_due = recording_pop_due
+
+    probes = {'total': 0}
+    probe_latency = list()
+    probe_service = monitor.probe_engine.probe_service
+
+    async def recording_probe_service(service_item):
+        probe_result = await probe_service(service_item)
+        probes['total'] += 1
+        probes[probe_result.reason] = probes.get(probe_result.reason, 0) + 1
+        if probe_result.latency is not None:
+            probe_latency.append(probe_result.latency)
+        return probe_result
+    monitor.probe_engine.probe_service = recording_probe_service
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    monitor_task = asyncio.create_task(telegram_event_handler.greet_every_interval())
+    handler_timings = dict()
+    while len(monitor.services) < service_count and not monitor_task.done():
+        await asyncio.sleep(0.01)
+    load_seconds = time.perf_counter() - started
+
+    # 측정 구간: 로딩이 끝난 뒤부터 duration 동안
+    ops_before = sum(ops.values())
+    probes_before = probes['total']
+    measure_started = time.perf_counter()
+    await asyncio.gather(asyncio.sleep(args.duration),
+                         drive_handlers(args, dispatcher, targets, handler_timings))
+    elapsed = time.perf_counter() - measure_started
+    probe_count = probes['total'] - probes_before
+    ops_count = sum(ops.values()) - ops_before
+    rss_peak = rss_mb()
+
+    await monitor.stop(timeout=5)
+    monitor_task.cancel()
+    await asyncio.gather(monitor_task, return_exceptions=True)
+    await dispatcher.stop(timeout=5)
+    await telegram_api.stop()
+    await fleet.stop()
+
+    return {
+        'services': service_count,
+        'duration': round(elapsed, 3),
+        'load_seconds': round(load_seconds, 3),
+        'targets': {kind: len(items) for kind, items in fleet.targets.items()},
+        'dedup': monitor.target_stats(),
+        'probe_policy': monitor.policy.stats(),
+        'probes': probes,
+        'probes_per_sec': round(probe_count / elapsed, 1),
+        'probe_latency_ms': summarize(probe_latency),
+        'lateness_ms': summarize(lateness),
+        'db_ops': dict(ops),
+        'db_ops_per_sec': round(ops_count / elapsed, 1),
+        'handler_latency_ms': {name: summarize(values) for name, values in handler_timings.items()},
+        'telegram': {'requests': telegram_api.requests, 'rate_limited': telegram_api.rate_limited,
+                     'dispatcher': dispatcher.stats()},
+        'result_writer': monitor.result_writer.stats(),
+        'rss_mb': {'before': rss_before, 'after': rss_peak},
+    }
+
+
+def print_summary(result:dict):
+    lateness = result['lateness_ms']
+    print(f"[{result['services']} services] probes/sec={result['probes_per_sec']} "
+          f"lateness p50/p95/p99={lateness['p50']}/{lateness['p95']}/{lateness['p99']}ms "
+          f"db ops/sec={result['db_ops_per_sec']} rss={result['rss_mb']['after']:.1f}MB "
+          f"targets={result['dedup']['targets']}/{result['dedup']['subscriptions']}")
+
+
+async def main(args):
+    nofile = raise_nofile_limit()
+    results = list()
+    for service_count in args.scales:
+        result = await run_scale(args, service_count)
+        print_summary(result)
+        results.append(result)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'nofile_limit': nofile,
+        'backend': 'mongo' if args.mongo else 'memory',
+        'options': {key: value for key, value in vars(args).items() if key != 'output'},
+        'ru_maxrss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'results': results,
+    }
+    output = args.output or os.path.join('bench', 'results', f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2, default=str)
+    print(f"Results written to {output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scheduler / probe / persistence benchmark")
+    parser.add_argument('--scales', type=lambda value: [int(item) for item in value.split(',')],
+                        default=[1000, 10000, 100000], help="comma separated service counts")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds per scale")
+    parser.add_argument('--interval', type=int, default=10, help="check interval of every service (seconds)")
+    parser.add_argument('--targets', type=int, default=200, help="number of local fleet targets")
+    parser.add_argument('--accept-delay', type=float, default=0.2, help="slow_accept targets accept one connection per delay")
+    parser.add_argument('--commands', type=int, default=100, help="/add, /list, /remove rounds per scale")
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help="fraction of fake Telegram responses that are 429")
+    parser.add_argument('--mongo', action='store_true', help="use the real Database (MongoDB from the environment)")
+    parser.add_argument('--output', help="result JSON path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -3,11 +3,81 @@ import redis.asyncio as aioredis
 import json
 import os
 import ast
+import uuid
 
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient  # Asynchronous MongoDB client
-from model.service_model import ServiceModel, ServiceDataModel
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId
+from model.service_model import ServiceDataModel
 from model.user_model import UserModel
+from metrics.metrics import observe_db
+from scheduler.spread import aligned_due
+from scheduler.state_machine import STATE_FIELDS
+from scheduler.target_registry import target_key
+
+# MongoDB 설정 (MONGO_URI가 있으면 host/port/계정 대신 사용)
+MONGO_HOST = os.getenv("MONGO_HOST", "mongodb")
+MONGO_PORT = int(os.getenv("MONGO_PORT", 27017))
+MONGO_USERNAME = os.getenv("MONGO_INITDB_ROOT_USERNAME", "root")
+MONGO_PASSWORD = os.getenv("MONGO_INITDB_ROOT_PASSWORD", "example")
+MONGO_URI = os.getenv("MONGO_URI", f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/?authSource=admin")
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "database_scheduler")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+MONGO_HEALTH_CHECK_INTERVAL = float(os.getenv("MONGO_HEALTH_CHECK_INTERVAL", 10))
+# iter_* 메소드가 cursor에서 한 번에 받아 오는 문서 수
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 500))
+
+SERVICE_COLLECTION = "service_collection"
+USER_COLLECTION = "user_collection"
+MIGRATION_COLLECTION = "migration_collection"
+STATE_COLLECTION = "scheduler_state"  # change stream resume token 등 스케줄러 상태
+
+DEFAULT_USER_TYPE = "free"
+# user_type별 등록 가능한 서비스 수 (없거나 0이면 제한 없음)
+HOST_LIMITS = {'free': int(os.getenv("FREE_HOST_LIMIT", 0))}
+# /list 표에 필요한 필드만 읽는다
+LIST_PROJECTION = {'host': 1, 'port': 1, 'alias': 1, 'status': 1, 'interval': 1, 'url': 1, 'breaker': 1}
+# 스케줄러(Monitor / lease worker)가 체크와 상태 계산에 쓰는 필드만 읽는다
+SCHEDULE_PROJECTION = {field: 1 for field in ('chat_id', 'host', 'port', 'alias', 'interval', 'probe_type', 'url',
+                                              'expect_status', 'expect_body', 'last_check_time', 'next_check_time',
+                                              'breaker') + STATE_FIELDS}
+# 스케줄링에 영향을 주는 필드: 이 필드가 바뀐 update만 change stream으로 받는다 (상태/시각 갱신은 제외)
+SERVICE_CONFIG_FIELDS = ('chat_id', 'host', 'port', 'alias', 'interval', 'probe_type', 'url', 'expect_status',
+                         'expect_body')
+SERVICE_CHANGE_PIPELINE = [{'$match': {'$or': [{'operationType': {'$in': ['insert', 'replace', 'delete']}}] + [
+    {f'updateDescription.updatedFields.{field}': {'$exists': True}} for field in SERVICE_CONFIG_FIELDS]}}]
+# 서비스를 다시 등록할 때 지우는 상태 / lease 필드
+RESET_FIELDS = ('reason', 'state_since', 'flapping', 'check_window', 'consecutive_ok', 'transitions',
+                'lease_owner', 'lease_expires', 'lease_token', 'breaker')
+
+
+def host_limit(user_type:str) -> int:
+    return HOST_LIMITS.get(user_type or DEFAULT_USER_TYPE) or None
+
+
+def service_document(chat_id:str, service_info:ServiceDataModel, datetime_now:datetime) -> dict:
+    document = {'chat_id':chat_id, 'host': service_info.host, 'port':service_info.port, 
+                'status':service_info.status,
+                'last_check_time': datetime_now,
+                'interval':service_info.interval, 'alias':service_info.alias,
+                'probe_type': service_info.probe_type, 'url': service_info.url,
+                'expect_status': service_info.expect_status, 'expect_body': service_info.expect_body }
+    # 첫 체크는 한 interval 안에서 대상의 위상에 맞춘다 (/import로 한꺼번에 추가해도 몰리지 않도록)
+    document['next_check_time'] = datetime.fromtimestamp(
+        aligned_due(target_key(document), service_info.interval, datetime_now.timestamp()))
+    return document
+
+
+def summary_entry(service_id, service_item:dict) -> dict:
+    """chat summary의 services 배열 항목 (/list 헤더와 alias 확인에 쓰는 최소 정보)"""
+    return {'_id': service_id, 'alias': service_item['alias'],
+            'target': service_item.get('url') or f"{service_item['host']}:{service_item['port']}"}
 
 
 class Database:
@@ -18,83 +88,80 @@ class Database:
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
             cls._instance.mongo_client = None
-            # cls._instance.redis_client = None
+            cls._instance.db = None
+            cls._instance.redis_client = None
+            cls._instance.health_task = None
+            cls._instance.ready = asyncio.Event()  # health check가 MongoDB 연결을 확인하면 set
         return cls._instance
 
-    async def initialize_service_connections(self):
-        """Initialize MongoDB and Redis connections asynchronously."""
-        # MongoDB connection
-
-        username = "root"
-        username = os.getenv("MONGO_INITDB_ROOT_USERNAME","root")
-        password = os.getenv("MONGO_INITDB_ROOT_PASSWORD","example")
-        mongo_host = "mongodb"  # hostname (can be localhost or a container name)
-        mongo_port = 27017
-        database_name = "database_scheduler"
-        collection_service_name = "collection_scheduler" # "service_collection"
-
-        mongo_uri = f"mongodb://{username}:{password}@{mongo_host}:{mongo_port}/?authSource=admin"
-
+    async def initialize_connection(self, wait:bool=True):
+        """
+        Create the single shared MongoDB client (connection pool) and start the background health check.
+        The driver reconnects by itself after a MongoDB restart; the health check tracks readiness meanwhile.
+        """
+        if self.mongo_client is None:
+            self.mongo_client = AsyncIOMotorClient(
+                MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS, socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                retryWrites=True, retryReads=True)
+            self.db = self.mongo_client[MONGO_DATABASE]
+            self.health_task = asyncio.create_task(self.health_check_loop())
+        if wait:
+            await self.wait_until_ready()
+
+    async def wait_until_ready(self, timeout:float=None):
+        """MongoDB에 연결될 때까지 대기 (readiness gating)"""
+        await asyncio.wait_for(self.ready.wait(), timeout)
+
+    async def health_check_loop(self):
+        failures = 0
+        while True:
+            try:
+                await self.mongo_client.admin.command('ping')
+                if not self.ready.is_set():
+                    print("Connected to MongoDB.")
+                    self.ready.set()
+                failures = 0
+                interval = MONGO_HEALTH_CHECK_INTERVAL
+            except Exception as e:
+                self.ready.clear()
+                if failures == 0:
+                    print(f"MongoDB unavailable, retrying: {type(e).__name__}: {str(e).split(',')[0]}")
+                failures += 1
+                # 연결이 끊긴 동안에는 짧은 주기로 확인
+                interval = min(MONGO_HEALTH_CHECK_INTERVAL, 2)
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            self.health_task = None
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+            self.mongo_client = None
+        self.ready.clear()
+
+    async def initialize_redis_connection(self):
+        """Initialize the Redis connection. REDIS_URL가 없으면 캐시 없이 MongoDB만 사용"""
+        redis_url = os.getenv("REDIS_URL")
+        if not redis_url:
+            return
+
+        # Redis connection
         try:
-            self.mongo_client = AsyncIOMotorClient(mongo_uri)
-            self.db = self.mongo_client[database_name]
-
-            # Check if the collection exists; if not, create it
-            existing_collections = await self.db.list_collection_names()
-            if collection_service_name not in existing_collections:
-                self.collection = await self.db.create_collection(collection_service_name)
-                print(f"Collection '{collection_service_name}' created.")
-            else:
-                self.collection = self.db[collection_service_name]
-                # print(f"Collection '{collection_name}' already exists.")
-
+            self.redis_client = aioredis.from_url(
+                redis_url, encoding='utf-8', decode_responses=True
+            )
+            # Test the connection
+            await self.redis_client.ping()
+            print("Connected to Redis.")
         except Exception as e:
-            print(f"Error connecting to MongoDB: {e}")
-
-
-    async def initialize_user_connections(self):
-        """Initialize MongoDB and Redis connections asynchronously."""
-        # MongoDB connection
-
-        username = "root"
-        username = os.getenv("MONGO_INITDB_ROOT_USERNAME","root")
-        password = os.getenv("MONGO_INITDB_ROOT_PASSWORD","example")
-        mongo_host = "mongodb"  # hostname (can be localhost or a container name)
-        mongo_port = 27017
-        database_name = "database_scheduler"
-        collection_user_name = "user_collection"
-
-        mongo_uri = f"mongodb://{username}:{password}@{mongo_host}:{mongo_port}/?authSource=admin"
-
-        try:
-            self.mongo_client = AsyncIOMotorClient(mongo_uri)
-            self.db = self.mongo_client[database_name]
-
-            # Check if the collection exists; if not, create it
-            existing_collections = await self.db.list_collection_names()
-            if collection_user_name not in existing_collections:
-                self.collection = await self.db.create_collection(collection_user_name)
-                print(f"Collection '{collection_user_name}' created.")
-            else:
-                self.collection = self.db[collection_user_name]
-                # print(f"Collection '{collection_name}' already exists.")
-
-        except Exception as e:
-            print(f"Error connecting to MongoDB: {e}")
-
-        # # Redis connection
-        # try:
-        #     self.redis_client = await aioredis.from_url(
-        #         'redis://redis:6379', encoding='utf-8', decode_responses=True
-        #     )
-        #     # Test the connection
-        #     await self.redis_client.ping()
-        #     print("Connected to Redis.")
-        # except Exception as e:
-        #     print(f"Error connecting to Redis: {e}")
-        # finally:
-        #     if self.redis_client is None:
-        #         print("Redis 클라이언트가 None으로 설정되었습니다.")
+            print(f"Error connecting to Redis: {e}")
+            self.redis_client = None
+        finally:
+            if self.redis_client is None:
+                print("Redis 클라이언트가 None으로 설정되었습니다.")
 
     @property
     def get_db(self):
@@ -102,245 +169,375 @@ class Database:
 
     @property
     def get_service_collection(self):
-        collection_service_name = "service_collection"
-        return self.mongo_client['database_scheduler'][collection_service_name] 
+        return self.db[SERVICE_COLLECTION]
 
     @property
     def get_user_collection(self):
-        collection_user_name = "user_collection"
-        return self.mongo_client['database_scheduler'][collection_user_name] 
-    
-    # @property
-    # def get_redis(self):
-    #     return self.redis_client
+        return self.db[USER_COLLECTION]
 
+    @property
+    def get_redis(self):
+        return self.redis_client
 
-    async def inintialzie_service_data(self):
-        # Get the singleton instance of the AsyncDatabase class
+    @property
+    def get_migration_collection(self):
+        return self.db[MIGRATION_COLLECTION]
 
-        if self.get_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
+    @property
+    def get_state_collection(self):
+        return self.db[STATE_COLLECTION]
+
+    def watch_services(self, resume_after=None, max_await_time_ms:int=1000):
+        """service_collection의 추가/삭제/설정 변경 change stream (replica set 필요, async with로 사용)"""
+        return self.get_service_collection.watch(SERVICE_CHANGE_PIPELINE, full_document='updateLookup',
+                                                 resume_after=resume_after, max_await_time_ms=max_await_time_ms)
+
+    @observe_db
+    async def load_resume_token(self, name:str):
+        document = await self.get_state_collection.find_one({'_id': name})
+        return document.get('token') if document is not None else None
+
+    @observe_db
+    async def save_resume_token(self, name:str, token):
+        await self.get_state_collection.update_one({'_id': name}, {'$set': {'token': token, 'updated_at': datetime.now()}},
+                                                   upsert=True)
+
+    @observe_db
+    async def ensure_indexes(self):
+        """Create the indexes used by the scheduler and command lookups (no-op if they already exist)."""
+        service_indexes = [
+            ([('next_check_time', ASCENDING)], {'name': 'next_check_time'}),
+            ([('chat_id', ASCENDING), ('alias', ASCENDING)], {'name': 'chat_id_alias', 'unique': True}),
+            # /list 페이지 cursor (등록 순서)
+            ([('chat_id', ASCENDING), ('_id', ASCENDING)], {'name': 'chat_id_id'}),
+            # http(s) 서비스는 같은 host:port에 여러 URL을 등록할 수 있다 (tcp 서비스의 url은 None)
+            ([('chat_id', ASCENDING), ('host', ASCENDING), ('port', ASCENDING), ('url', ASCENDING)],
+             {'name': 'chat_id_host_port_url', 'unique': True}),
+        ]
+        user_indexes = [
+            ([('chat_id', ASCENDING)], {'name': 'chat_id', 'unique': True}),
+        ]
+        # url 필드가 추가되기 전의 (chat_id, host, port) unique 인덱스 제거
+        if 'chat_id_host_port' in await self.get_service_collection.index_information():
+            await self.get_service_collection.drop_index('chat_id_host_port')
+
+        for collection, indexes in ((self.get_service_collection, service_indexes),
+                                    (self.get_user_collection, user_indexes)):
+            for keys, options in indexes:
+                try:
+                    await collection.create_index(keys, **options)
+                except OperationFailure as e:
+                    # 기존 데이터에 중복이 있으면 unique 인덱스 생성이 실패한다
+                    print(f"Error creating index {options['name']} on {collection.name}: {e}")
+
+    @observe_db
+    async def migrate_datetime_fields(self):
+        """One-shot migration: ISO string check times -> BSON dates."""
+        migration_name = "datetime_fields"
+        migration_collection = self.get_migration_collection
+        if await migration_collection.find_one({'_id': migration_name}) is not None:
+            return
 
-        # Use the shared MongoDB collection and Redis client
         collection = self.get_service_collection
-        # redis_client = self.get_redis
-
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            results = collection.find()
-            async for result in results:
-                service_info_json = dict()
-
-    async def insert_service_data(self, chat_id:str, service_info:ServiceDataModel):
-        # Get the singleton instance of the AsyncDatabase class
+        requests = list()
+        results = collection.find({'$or': [{'next_check_time': {'$type': 'string'}},
+                                           {'last_check_time': {'$type': 'string'}}]},
+                                  {'next_check_time': 1, 'last_check_time': 1})
+        async for result in results:
+            fields = dict()
+            for field in ('next_check_time', 'last_check_time'):
+                if isinstance(result.get(field), str):
+                    fields[field] = datetime.fromisoformat(result[field])
+            requests.append(UpdateOne({'_id': result['_id']}, {'$set': fields}))
+            if len(requests) >= 1000:
+                await collection.bulk_write(requests, ordered=False)
+                requests = list()
+        if requests:
+            await collection.bulk_write(requests, ordered=False)
+
+        await migration_collection.insert_one({'_id': migration_name, 'applied_at': datetime.now()})
+        print(f"Migration '{migration_name}' applied.")
+
+
+    @observe_db
+    async def migrate_chat_summaries(self):
+        """One-shot migration: rebuild host_cnt and the services index of every chat summary from the services."""
+        migration_name = "chat_summaries"
+        migration_collection = self.get_migration_collection
+        if await migration_collection.find_one({'_id': migration_name}) is not None:
+            return
+
+        pipeline = [{'$group': {'_id': '$chat_id', 'host_cnt': {'$sum': 1},
+                                'services': {'$push': {'_id': '$_id', 'alias': '$alias',
+                                                       'target': {'$ifNull': ['$url', {'$concat': [
+                                                           '$host', ':', {'$toString': '$port'}]}]}}}}}]
+        # 서비스가 없는 chat은 0으로 초기화
+        await self.get_user_collection.update_many({}, {'$set': {'host_cnt': 0, 'services': []}})
+        requests = list()
+        async for result in self.get_service_collection.aggregate(pipeline):
+            requests.append(UpdateOne({'chat_id': result['_id']},
+                                      {'$set': {'host_cnt': result['host_cnt'], 'services': result['services']},
+                                       '$setOnInsert': {'user_type': DEFAULT_USER_TYPE}}, upsert=True))
+            if len(requests) >= 1000:
+                await self.get_user_collection.bulk_write(requests, ordered=False)
+                requests = list()
+        if requests:
+            await self.get_user_collection.bulk_write(requests, ordered=False)
+
+        await migration_collection.insert_one({'_id': migration_name, 'applied_at': datetime.now()})
+        print(f"Migration '{migration_name}' applied.")
 
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
+    async def inintialzie_service_data(self):
+        collection = self.get_service_collection
 
-        # Use the shared MongoDB collection and Redis client
+        results = collection.find()
+        async for result in results:
+            service_info_json = dict()
+
+    @observe_db
+    async def insert_service_data(self, chat_id:str, service_info:ServiceDataModel, host_limit:int=None):
+        """
+        Upsert a service by (chat_id, host, port, url) and keep the chat summary (user document) in sync.
+        The summary slot is reserved first with a conditional $inc, so concurrent /add commands cannot exceed host_limit.
+        Returns the stored document, or None when the chat is at its quota.
+        """
         collection = self.get_service_collection
-        # redis_client = self.get_redis
-
-        datetime_now = datetime.now() 
-        datetime_add_timedelta = datetime_now + timedelta(seconds=service_info.interval)
-        
-        service_flag = None
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            filter = {'chat_id':chat_id, 'host': service_info.host, 'port':service_info.port}
-            value = {'chat_id':chat_id, 'host': service_info.host, 'port':service_info.port, 
-                     'status':service_info.status,
-                     'last_check_time': datetime_now.isoformat(),
-                     'next_check_time': datetime_add_timedelta.isoformat(),
-                     'interval':service_info.interval, 'alias':service_info.alias }
-
-            update_result = await collection.replace_one(filter, value, upsert=True)
-            if update_result.matched_count == 0:
-                user_info = await self.get_user_by_chat_id(chat_id)
-                user_info = user_info['host_cnt'] + 1
-                await self.insert_user_data(chat_id, user_info)
-            print("Sample document inserted into MongoDB.")
-            return update_result
+        datetime_now = datetime.now()
+
+        filter = {'chat_id':chat_id, 'host': service_info.host, 'port':service_info.port,
+                  'url': service_info.url}
+        value = service_document(chat_id, service_info, datetime_now)
 
+        service_id = ObjectId()
+        entry = summary_entry(service_id, value)
+        if not await self.reserve_summary_entry(chat_id, entry, host_limit):
+            return None
 
+        try:
+            # 같은 대상을 다시 등록하면 설정을 덮어쓰고 이전 상태/lease 필드는 지운다
+            update_result = await collection.update_one(
+                filter, {'$set': value, '$setOnInsert': {'_id': service_id},
+                         '$unset': {field: "" for field in RESET_FIELDS}}, upsert=True)
+        except Exception:
+            await self.release_summary_entry(chat_id, service_id)
+            raise
+
+        if update_result.upserted_id is not None:
+            value['_id'] = update_result.upserted_id
+        else:
+            # 기존 서비스를 갱신한 경우: 예약한 슬롯을 돌려주고 요약의 alias를 갱신
+            value['_id'] = (await collection.find_one(filter, {'_id': 1}))['_id']
+            await self.release_summary_entry(chat_id, service_id)
+            await self.get_user_collection.update_one(
+                {'chat_id': chat_id, 'services._id': value['_id']},
+                {'$set': {'services.$': summary_entry(value['_id'], value)}})
+        print("Sample document inserted into MongoDB.")
+        return value
+
+    @observe_db
+    async def bulk_insert_services(self, chat_id:str, service_infos:list, host_limit:int=None) -> tuple:
+        """
+        /import: insert new services with one unordered insert_many after reserving all summary slots at once.
+        Rows rejected by the unique indexes (duplicate alias or target) give their slots back.
+        Returns (inserted documents, {index in service_infos: error message}).
+        """
+        datetime_now = datetime.now()
+        documents = [dict(service_document(chat_id, service_info, datetime_now), _id=ObjectId())
+                     for service_info in service_infos]
+        entries = [summary_entry(document['_id'], document) for document in documents]
+        if not await self.reserve_summary_entries(chat_id, entries, host_limit):
+            return list(), {index: "service limit reached" for index in range(len(documents))}
+
+        errors = dict()
+        try:
+            await self.get_service_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if not e.details['writeErrors']:
+                raise
+            for write_error in e.details['writeErrors']:
+                errors[write_error['index']] = ("service already exists (same alias or target)"
+                                                if write_error['code'] == 11000 else write_error['errmsg'])
+        if errors:
+            await self.release_summary_entries(chat_id, [documents[index]['_id'] for index in errors])
+        return [document for index, document in enumerate(documents) if index not in errors], errors
+
+    async def reserve_summary_entry(self, chat_id:str, entry:dict, host_limit:int=None) -> bool:
+        return await self.reserve_summary_entries(chat_id, [entry], host_limit)
+
+    @observe_db
+    async def reserve_summary_entries(self, chat_id:str, entries:list, host_limit:int=None) -> bool:
+        """
+        Atomically count new services in the chat summary: $inc host_cnt and $push the index entries.
+        With host_limit the update only matches while there is room for all entries; the upsert then collides
+        with the unique chat_id index, which means the quota is used up.
+        """
+        filter = {'chat_id': chat_id}
+        if host_limit:
+            filter['host_cnt'] = {'$lte': host_limit - len(entries)}
+        try:
+            await self.get_user_collection.update_one(
+                filter, {'$inc': {'host_cnt': len(entries)}, '$push': {'services': {'$each': entries}},
+                         '$setOnInsert': {'user_type': DEFAULT_USER_TYPE}}, upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @observe_db
+    async def release_summary_entry(self, chat_id:str, service_id):
+        await self.get_user_collection.update_one(
+            {'chat_id': chat_id, 'services._id': service_id},
+            {'$inc': {'host_cnt': -1}, '$pull': {'services': {'_id': service_id}}})
+
+    @observe_db
+    async def release_summary_entries(self, chat_id:str, service_ids:list):
+        """방금 예약한 항목들을 되돌린다 (모두 summary에 있는 _id여야 함)"""
+        await self.get_user_collection.update_one(
+            {'chat_id': chat_id},
+            {'$inc': {'host_cnt': -len(service_ids)}, '$pull': {'services': {'_id': {'$in': service_ids}}}})
+
+    @observe_db
     async def insert_user_data(self, chat_id:str, user_info:UserModel):
-        # Get the singleton instance of the AsyncDatabase class
+        collection = self.get_user_collection
+        filter = {'chat_id': chat_id}
+        value = {'chat_id':chat_id, 'host_cnt': user_info.host_cnt, 'user_type': user_info.user_type}
+        # services(요약 인덱스)는 유지
+        update_result = await collection.update_one(filter, {'$set': value}, upsert=True)
+        print("Sample document inserted into MongoDB.")
+        return update_result
 
-        if self.get_user_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_user_connections()
+    @observe_db
+    async def bulk_update_service_data(self, updates:dict):
+        """updates: _id -> $set fields. Unordered bulk_write so one bad document does not stop the batch."""
 
-        # Use the shared MongoDB collection and Redis client
-        collection = self.get_user_collection
-        # redis_client = self.get_redis
-        
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            filter = {'chat_id': chat_id}
-            value = {'chat_id':chat_id, 'host_cnt': user_info.host_cnt, 'user_type': user_info.user_type}
-            update_result = await collection.replace_one(filter, value, upsert=True)
-            print("Sample document inserted into MongoDB.")
-            return update_result
-
-
-    async def update_service_data(self, chat_id:str, service_info:ServiceDataModel):
-        # Get the singleton instance of the AsyncDatabase class
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
-
-        # Use the shared MongoDB collection and Redis client
-        collection = self.get_service_collection
-        # redis_client = self.get_redis
-        
-        service_flag = None
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            filter = {'chat_id':chat_id, 'host': service_info.host, 'port':service_info.port}
-            
-            service_info.chat_id = chat_id
-
-            service_flag = await collection.replace_one(filter, service_info.model_dump(), upsert=True)
-            print("Sample document inserted into MongoDB.")
-
-        # # Example operation: Set a value in Redis
-        # if redis_client is not None:
-        #     datetime_now_str = datetime_now.strftime("%Y-%m-%d %H:%M:%S")
-        #     datetime_add_timedelta_str = datetime_add_timedelta.strftime("%Y-%m-%d %H:%M:%S")
-        #     service_info_key = f"{service_info.host}:{service_info.port}"
-        #     service_data_model_info = ServiceDataModel(chat_id=chat_id,
-        #                                             host=service_info.host, 
-        #                                             port=service_info.port, 
-        #                                             alias=service_info.alias, 
-        #                                             )
-        #     service_info_text = await redis_client.get(chat_id)
-        #     service_info_json = dict()
-        #     if service_info_text:
-        #         service_info_json = json.loads(service_info_text)
-        #     service_info_json[service_info_key] = {"host":service_info.host, 
-        #                                             "port":service_info.port,
-        #                                             "alias":service_info.alias,
-        #                                             "time":datetime_now_str, 
-        #                                             "status":'init', 
-        #                                             "last_check_time":datetime_add_timedelta_str,
-        #                                             "interval": service_info.interval
-        #                                           }
-        #     service_info_text =json.dumps(service_info_json)
-        #     await redis_client.set(chat_id, service_info_text)
-        #     print("Sample key-value pair set in Redis.")
-
-
-    async def remove_service_data(self, chat_id:str, service_info:ServiceModel):
-        # Get the singleton instance of the AsyncDatabase class
-
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
-
-        # Use the shared MongoDB collection and Redis client
         collection = self.get_service_collection
-        # redis_client = self.get_redis
 
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            if service_info.alias is None:
-                await collection.delete_one({'chat_id': chat_id, 'host': service_info.host, 
-                                            'port':service_info.port})
-            else:
-                await collection.delete_one({'chat_id': chat_id, 'alias': service_info.alias})
+        if updates:
+            requests = [UpdateOne({'_id': service_id}, {'$set': fields})
+                        for service_id, fields in updates.items()]
+            return await collection.bulk_write(requests, ordered=False)
 
-            user_info = await self.get_user_by_chat_id(chat_id)
-            user_info = user_info['host_cnt'] - 1
-            await self.insert_user_data(chat_id, user_info)
-
-            print("Sample document delete into MongoDB.")
+    @observe_db
+    async def remove_service_data(self, chat_id:str, alias:str=None, host:str=None, port:int=None) -> dict:
+        collection = self.get_service_collection
+        if alias is None:
+            removed = await collection.find_one_and_delete({'chat_id': chat_id, 'host': host, 
+                                                           'port':port})
+        else:
+            removed = await collection.find_one_and_delete({'chat_id': chat_id, 'alias': alias})
 
-    async def remove_user_data(self, chat_id:str):
-        # Get the singleton instance of the AsyncDatabase class
+        if removed is not None:
+            await self.release_summary_entry(chat_id, removed['_id'])
 
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
+        print("Sample document delete into MongoDB.")
+        return removed
 
-        # Use the shared MongoDB collection and Redis client
+    @observe_db
+    async def remove_user_data(self, chat_id:str):
         collection = self.get_service_collection
-        # redis_client = self.get_redis
-
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            await collection.delete_one({'chat_id': chat_id})
-            print("Sample document delete into MongoDB.")
+        await collection.delete_one({'chat_id': chat_id})
+        print("Sample document delete into MongoDB.")
 
     # Update check Time routine 
-    async def get_services_by_time(self, datetime_range:datetime) -> list:
-        # Get the singleton instance of the AsyncDatabase class
+    @observe_db
+    async def get_services_by_time(self, datetime_range:datetime, projection:dict=None) -> list:
+        return [result async for result in self.iter_services_by_time(datetime_range, projection)]
+
+    async def iter_services_by_time(self, datetime_range:datetime, projection:dict=None, batch_size:int=DB_BATCH_SIZE):
+        """
+        next_check_time이 datetime_range 이전인 서비스를 오래 밀린 순서로 batch_size씩 받아 하나씩 넘긴다.
+        다음 batch는 호출한 쪽이 앞의 문서를 다 소비했을 때 읽으므로, 소비가 느리면 읽기도 멈춘다.
+        """
+        results = self.get_service_collection.find({'next_check_time': {'$lt': datetime_range}}, projection,
+                                                   batch_size=batch_size).sort('next_check_time', ASCENDING)
+        async for result in results:
+            yield result
+
+    @observe_db
+    async def claim_due_services(self, worker_id:str, datetime_now:datetime, lease_seconds:int, limit:int) -> list:
+        """
+        Atomically lease up to `limit` due services to worker_id.
+        A service can be claimed when it has no lease or its lease expired (e.g. the owner crashed).
+        """
         return_result = list()
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
 
-        # Use the shared MongoDB collection and Redis client
         collection = self.get_service_collection
 
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            results = collection.find({'next_check_time':{'$lt': datetime_range}})
-            async for result in results:
-                # print(result)
-                return_result.append(result)
+        claimable = {'next_check_time': {'$lte': datetime_now},
+                     '$or': [{'lease_expires': None}, {'lease_expires': {'$lt': datetime_now}}]}
+        candidates = collection.find(claimable, {'_id': 1}).sort('next_check_time', ASCENDING).limit(limit)
+        candidate_ids = [result['_id'] async for result in candidates]
+        if not candidate_ids:
+            return return_result
+
+        # 후보 중 다른 워커가 먼저 가져가지 않은 것만 이번 claim 토큰으로 표시 (문서 단위로 원자적)
+        claim_token = uuid.uuid4().hex
+        lease_expires = datetime_now + timedelta(seconds=lease_seconds)
+        await collection.update_many(dict(claimable, _id={'$in': candidate_ids}),
+                                     {'$set': {'lease_owner': worker_id, 'lease_expires': lease_expires,
+                                               'lease_token': claim_token}})
+        results = collection.find({'_id': {'$in': candidate_ids}, 'lease_token': claim_token}, SCHEDULE_PROJECTION)
+        async for result in results:
+            return_result.append(result)
 
         return return_result
 
-
-
-    async def get_services_by_chat_id(self, chat_id:str) -> dict:
-        # Get the singleton instance of the AsyncDatabase class
-        return_result = list()
-
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
+    @observe_db
+    async def renew_leases(self, worker_id:str, service_ids:list, lease_expires:datetime):
 
         collection = self.get_service_collection
 
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            results = collection.find({'chat_id': chat_id})
-            async for result in results:
-                # print(result)
-                return_result.append(result)
+        if service_ids:
+            return await collection.update_many({'_id': {'$in': service_ids}, 'lease_owner': worker_id},
+                                                {'$set': {'lease_expires': lease_expires}})
 
-        return return_result
-    
-
-    async def get_user_by_chat_id(self, chat_id:str) -> dict:
-        # Get the singleton instance of the AsyncDatabase class
-        return_result = dict()
-
-        if self.get_user_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_user_connections()
-
-        collection = self.get_user_collection
+    @observe_db
+    async def get_all_services(self, projection:dict=None) -> list:
+        return [result async for result in self.iter_all_services(projection)]
 
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            return_result = await collection.find_one({'chat_id': chat_id})
-        return return_result
+    async def iter_all_services(self, projection:dict=None, batch_size:int=DB_BATCH_SIZE):
+        """전체 서비스를 _id 순서로 batch_size씩 받아 하나씩 넘긴다 (스케줄러 로딩)"""
+        results = self.get_service_collection.find({}, projection, batch_size=batch_size).sort('_id', ASCENDING)
+        async for result in results:
+            yield result
 
-    async def get_service_by_chat_id_and_alias(self, chat_id:str, alias:str) -> dict:
-        # Get the singleton instance of the AsyncDatabase class
-        result = None
-        if self.get_service_collection is None:
-            # Initialize connections asynchronously
-            await self.initialize_service_connections()
+    @observe_db
+    async def get_services_by_chat_id(self, chat_id:str, projection:dict=None) -> list:
+        return [result async for result in self.iter_services_by_chat_id(chat_id, projection)]
+    
+    @observe_db
+    async def get_services_page(self, chat_id:str, after_id=None, before_id=None, limit:int=20) -> tuple:
+        """
+        One /list page ordered by _id, using the (chat_id, _id) index and LIST_PROJECTION.
+        after_id: page after that service, before_id: page before it. Returns (services, has_more).
+        """
 
         collection = self.get_service_collection
 
-        # Example operation: Insert a sample document into MongoDB
-        if collection is not None:
-            result = await collection.find_one({'chat_id': chat_id, 'alias': alias})
-        return result
+        filter = {'chat_id': chat_id}
+        direction = ASCENDING
+        if after_id is not None:
+            filter['_id'] = {'$gt': after_id}
+        elif before_id is not None:
+            filter['_id'] = {'$lt': before_id}
+            direction = DESCENDING
+        # 한 건을 더 읽어 다음 페이지가 있는지 확인
+        results = await collection.find(filter, LIST_PROJECTION).sort('_id', direction).limit(limit + 1).to_list(limit + 1)
+        has_more = len(results) > limit
+        results = results[:limit]
+        if direction == DESCENDING:
+            results.reverse()
+        return results, has_more
+
+    async def iter_services_by_chat_id(self, chat_id:str, projection:dict=None, batch_size:int=DB_BATCH_SIZE):
+        """chat의 서비스를 cursor로 하나씩 반환 (/export)"""
+        async for result in self.get_service_collection.find({'chat_id': chat_id}, projection,
+                                                             batch_size=batch_size).sort('_id', ASCENDING):
+            yield result
+
+    @observe_db
+    async def get_user_by_chat_id(self, chat_id:str) -> dict:
+        return await self.get_user_collection.find_one({'chat_id': chat_id})
 
+    @observe_db
+    async def get_service_by_chat_id_and_alias(self, chat_id:str, alias:str) -> dict:
+        return await self.get_service_collection.find_one({'chat_id': chat_id, 'alias': alias})
@@ -0,0 +1,142 @@
+import bisect
+import collections
+import os
+
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+from database.database import Database
+
+HISTORY_COLLECTION = "probe_history"
+
+# granularity -> (collection, retention seconds)
+RAW_RETENTION = int(os.getenv("HISTORY_RAW_RETENTION", 2 * 24 * 3600))
+ROLLUPS = {
+    '1m': ("probe_rollup_1m", int(os.getenv("HISTORY_1M_RETENTION", 7 * 24 * 3600))),
+    '1h': ("probe_rollup_1h", int(os.getenv("HISTORY_1H_RETENTION", 90 * 24 * 3600))),
+    '1d': ("probe_rollup_1d", int(os.getenv("HISTORY_1D_RETENTION", 2 * 365 * 24 * 3600))),
+}
+
+# flush되지 않은 raw point 최대 개수. MongoDB가 끊긴 동안에는 flush하지 않으므로
+# 넘치면 오래된 point부터 버린다 (그 point는 rollup에도 반영되지 않는다)
+HISTORY_BUFFER_LIMIT = int(os.getenv("HISTORY_BUFFER_LIMIT", 100000))
+
+# latency histogram 경계 (ms). 버킷 i = (LATENCY_BOUNDS[i-1], LATENCY_BOUNDS[i]], 마지막 버킷은 그 이상
+LATENCY_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def bucket_start(ts:datetime, granularity:str) -> datetime:
+    if granularity == '1m':
+        return ts.replace(second=0, microsecond=0)
+    if granularity == '1h':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def latency_bucket(latency:float) -> int:
+    return bisect.bisect_left(LATENCY_BOUNDS, latency)
+
+
+def latency_percentile(histogram:dict, percentile:float):
+    """histogram(버킷 index 문자열 -> count)에서 percentile 지연시간(ms)을 버킷 안 선형 보간으로 추정"""
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+    target = total * percentile
+    cumulative = 0
+    for index in range(len(LATENCY_BOUNDS) + 1):
+        count = histogram.get(str(index), 0)
+        if count and cumulative + count >= target:
+            lower = LATENCY_BOUNDS[index - 1] if index > 0 else 0
+            upper = LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else LATENCY_BOUNDS[-1] * 2
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return LATENCY_BOUNDS[-1]
+
+
+class ProbeHistory:
+    """
+    Per-check history: raw points in a MongoDB time-series collection plus 1m/1h/1d rollups.
+    Rollups are maintained with $inc upserts at flush time, so stats never scan raw points.
+    Every collection expires old data with a TTL.
+    Unflushed points are capped at HISTORY_BUFFER_LIMIT so a long MongoDB outage cannot grow memory without bound.
+    """
+
+    def __init__(self, buffer_limit:int=HISTORY_BUFFER_LIMIT):
+        self.database = Database()
+        self.buffer_limit = buffer_limit
+        self.points = collections.deque(maxlen=buffer_limit)
+        self.dropped = 0
+
+    def _collection(self, name:str):
+        return self.database.get_db[name]
+
+    async def ensure_collections(self):
+        db = self.database.get_db
+        try:
+            await db.create_collection(HISTORY_COLLECTION,
+                                       timeseries={'timeField': 'ts', 'metaField': 'service_id',
+                                                   'granularity': 'seconds'},
+                                       expireAfterSeconds=RAW_RETENTION)
+            print(f"Collection '{HISTORY_COLLECTION}' created.")
+        except (CollectionInvalid, OperationFailure):
+            pass  # already exists
+
+        for collection_name, retention in ROLLUPS.values():
+            collection = self._collection(collection_name)
+            await collection.create_index([('service_id', ASCENDING), ('bucket', ASCENDING)],
+                                          name='service_id_bucket', unique=True)
+            await collection.create_index([('bucket', ASCENDING)], name='bucket_ttl',
+                                          expireAfterSeconds=retention)
+
+    def record(self, service_id, probe_result):
+        if len(self.points) == self.buffer_limit:
+            self.dropped += 1
+        self.points.append({'ts': probe_result.checked_at, 'service_id': service_id,
+                            'up': probe_result.up, 'latency': probe_result.latency,
+                            'reason': probe_result.reason})
+
+    async def flush(self):
+        points, self.points = list(self.points), collections.deque(maxlen=self.buffer_limit)
+        if self.dropped:
+            print(f"Probe history buffer full, {self.dropped} points dropped.")
+            self.dropped = 0
+        if not points:
+            return
+
+        await self._collection(HISTORY_COLLECTION).insert_many(points, ordered=False)
+
+        for granularity, (collection_name, _) in ROLLUPS.items():
+            # 같은 (서비스, 버킷)의 점들을 먼저 합쳐서 버킷당 한 번만 upsert
+            rollups = dict()
+            for point in points:
+                key = (point['service_id'], bucket_start(point['ts'], granularity))
+                inc = rollups.setdefault(key, {'count': 0, 'up': 0})
+                inc['count'] += 1
+                if point['up']:
+                    inc['up'] += 1
+                if point['latency'] is not None:
+                    field = f"latency_hist.{latency_bucket(point['latency'])}"
+                    inc[field] = inc.get(field, 0) + 1
+                    inc['latency_sum'] = inc.get('latency_sum', 0) + point['latency']
+            requests = [UpdateOne({'service_id': service_id, 'bucket': bucket}, {'$inc': inc}, upsert=True)
+                        for (service_id, bucket), inc in rollups.items()]
+            await self._collection(collection_name).bulk_write(requests, ordered=False)
+
+    async def get_stats(self, service_id, granularity:str, since:datetime) -> dict:
+        """since 이후 rollup을 합쳐 uptime(%)과 p50/p95 latency(ms)를 계산"""
+        collection_name, _ = ROLLUPS[granularity]
+        count, up, histogram = 0, 0, dict()
+        results = self._collection(collection_name).find(
+            {'service_id': service_id, 'bucket': {'$gte': bucket_start(since, granularity)}},
+            {'count': 1, 'up': 1, 'latency_hist': 1})
+        async for result in results:
+            count += result.get('count', 0)
+            up += result.get('up', 0)
+            for index, bucket_count in result.get('latency_hist', {}).items():
+                histogram[index] = histogram.get(index, 0) + bucket_count
+
+        return {'count': count,
+                'uptime': up * 100 / count if count else None,
+                'p50': latency_percentile(histogram, 0.5),
+                'p95': latency_percentile(histogram, 0.95)}
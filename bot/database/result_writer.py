@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+import os
+import time
+
+from database.database import Database
+from database.probe_history import ProbeHistory
+from database.service_cache import ServiceCache
+
+RESULT_BATCH_SIZE = int(os.getenv("RESULT_BATCH_SIZE", 1000))
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", 1))
+# Redis 캐시를 사용할 때 MongoDB에 반영하는 주기(초)
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 10))
+# 상태 변화가 없는 체크의 timestamp만 반영하는 주기(초)
+TIMESTAMP_FLUSH_INTERVAL = float(os.getenv("TIMESTAMP_FLUSH_INTERVAL", 300))
+
+
+class ResultWriter:
+    """
+    Buffers probe results and writes them back as unordered bulk_write batches.
+    A batch is flushed when it reaches batch_size or every flush_interval seconds.
+    With the Redis cache enabled, results go to Redis every flush_interval and to MongoDB
+    write-behind every write_behind_interval.
+    Steady-state checks only touch() timestamps, which are written every timestamp_interval.
+    stop() ends run() after a final flush of everything still buffered.
+    """
+
+    def __init__(self, batch_size:int=RESULT_BATCH_SIZE, flush_interval:float=RESULT_FLUSH_INTERVAL,
+                 write_behind_interval:float=WRITE_BEHIND_INTERVAL,
+                 timestamp_interval:float=TIMESTAMP_FLUSH_INTERVAL):
+        self.database = Database()
+        self.cache = ServiceCache()
+        self.history = ProbeHistory()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_behind_interval = write_behind_interval
+        self.timestamp_interval = timestamp_interval
+        self.buffer = dict()  # _id -> $set fields (같은 서비스의 결과는 마지막 것만 남긴다)
+        self.cache_buffer = dict()
+        self.touch_buffer = dict()  # _id -> last/next check time (상태 변화 없음)
+        self.full_event = asyncio.Event()
+        self.stopping = False
+
+        self.last_flush_latency = 0.0
+        self.last_batch_size = 0
+        self.flush_count = 0
+        self.written_count = 0
+
+    def add(self, service_id, status:str, last_check_time, next_check_time, **extra_fields):
+        fields = {'status': status,
+                  'last_check_time': last_check_time,
+                  'next_check_time': next_check_time,
+                  **extra_fields}
+        self.touch_buffer.pop(service_id, None)
+        self.buffer[service_id] = fields
+        if self.cache.enabled:
+            self.cache_buffer[service_id] = fields
+        if len(self.buffer) >= self.batch_size:
+            self.full_event.set()
+
+    def touch(self, service_id, last_check_time, next_check_time, **extra_fields):
+        """상태 변화가 없는 체크: timestamp(와 breaker 등 부가 필드)만 모아 두었다가 timestamp_interval마다 반영"""
+        fields = {'last_check_time': last_check_time, 'next_check_time': next_check_time, **extra_fields}
+        if service_id in self.buffer:
+            # 아직 반영되지 않은 상태 변화가 있으면 그 항목의 timestamp를 갱신
+            self.buffer[service_id].update(fields)
+            if service_id in self.cache_buffer:
+                self.cache_buffer[service_id].update(fields)
+        else:
+            self.touch_buffer.setdefault(service_id, dict()).update(fields)
+
+    def merge_touches(self):
+        touches, self.touch_buffer = self.touch_buffer, dict()
+        for service_id, fields in touches.items():
+            self.buffer.setdefault(service_id, dict()).update(fields)
+            if self.cache.enabled:
+                self.cache_buffer.setdefault(service_id, dict()).update(fields)
+
+    def record_probe(self, service_id, probe_result):
+        """체크 기록은 다음 MongoDB flush 때 history/rollup에 함께 기록"""
+        self.history.record(service_id, probe_result)
+
+    def discard(self, service_id):
+        """삭제된 서비스의 대기 중인 결과를 버린다"""
+        self.buffer.pop(service_id, None)
+        self.cache_buffer.pop(service_id, None)
+        self.touch_buffer.pop(service_id, None)
+
+    def stats(self) -> dict:
+        return {'pending': len(self.buffer),
+                'pending_touches': len(self.touch_buffer),
+                'last_flush_latency': self.last_flush_latency,
+                'last_batch_size': self.last_batch_size,
+                'flush_count': self.flush_count,
+                'written_count': self.written_count}
+
+    async def flush_cache(self):
+        batch, self.cache_buffer = self.cache_buffer, dict()
+        try:
+            await self.cache.update_status(batch)
+        except Exception as e:
+            # MongoDB가 원본이므로 캐시 반영 실패는 다음 결과로 덮어쓴다
+            print(f"Error writing probe results to Redis: {e}")
+
+    async def flush_mongo(self):
+        try:
+            await self.history.flush()
+        except Exception as e:
+            print(f"Error flushing probe history: {e}")
+
+        while self.buffer:
+            batch = dict()
+            for service_id in list(itertools.islice(self.buffer, self.batch_size)):
+                batch[service_id] = self.buffer.pop(service_id)
+            started = time.perf_counter()
+            try:
+                await self.database.bulk_update_service_data(batch)
+            except Exception as e:
+                print(f"Error flushing probe results: {e}")
+                # 실패한 배치는 더 새로운 결과가 없는 항목만 다시 버퍼에 넣는다
+                for service_id, fields in batch.items():
+                    self.buffer.setdefault(service_id, fields)
+                return
+            self.last_flush_latency = time.perf_counter() - started
+            self.last_batch_size = len(batch)
+            self.flush_count += 1
+            self.written_count += len(batch)
+
+    async def flush(self):
+        self.merge_touches()
+        await self.flush_cache()
+        await self.flush_mongo()
+
+    def stop(self):
+        self.stopping = True
+        self.full_event.set()
+
+    async def run(self):
+        self.stopping = False
+        last_mongo_flush = last_touch_flush = time.monotonic()
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.full_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full_event.clear()
+            if time.monotonic() - last_touch_flush >= self.timestamp_interval:
+                self.merge_touches()
+                last_touch_flush = time.monotonic()
+            await self.flush_cache()
+            # MongoDB가 끊긴 동안에는 결과를 버퍼에 모아 두고 (서비스별로 합쳐짐) 복구 후 반영
+            if not self.database.ready.is_set():
+                continue
+            if (not self.cache.enabled or len(self.buffer) >= self.batch_size
+                    or time.monotonic() - last_mongo_flush >= self.write_behind_interval):
+                await self.flush_mongo()
+                last_mongo_flush = time.monotonic()
+        # graceful shutdown: 남은 결과(touch 포함)를 모두 반영
+        await self.flush()
@@ -0,0 +1,193 @@
+import json
+
+from datetime import datetime
+from bson import ObjectId
+from database.database import Database
+from scheduler.state_machine import STATE_FIELDS
+
+# Redis key layout
+#   service:{_id}           hash  chat_id, host, port, alias, interval, status, last_check_time, next_check_time,
+#                                 상태 머신 필드와 breaker (JSON)
+#   schedule                zset  _id -> next_check_time (epoch)
+#   cache:warm              flag  set after the warmup from MongoDB finished
+SCHEDULE_KEY = "schedule"
+WARM_KEY = "cache:warm"
+TIME_FIELDS = ('last_check_time', 'next_check_time')
+PROBE_FIELDS = ('url', 'expect_status', 'expect_body')  # http(s) 서비스에만 있는 필드
+# 재시작 후에도 flap 억제와 breaker backoff가 이어지도록 캐시에도 보관 (값마다 JSON)
+STATE_HASH_FIELDS = tuple(field for field in STATE_FIELDS if field != 'status') + ('breaker',)
+
+
+def _epoch(value):
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+def _datetime(value):
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+def _dump_state(field:str, value) -> str:
+    if field == 'state_since':
+        value = _epoch(value)
+    elif field == 'breaker' and value:
+        value = {**value, 'until': _epoch(value.get('until'))}
+    return json.dumps(value)
+
+
+def _load_state(field:str, raw:str):
+    value = json.loads(raw)
+    if field == 'state_since':
+        value = _datetime(value)
+    elif field == 'breaker' and value:
+        value['until'] = _datetime(value.get('until'))
+    return value
+
+
+def _service_key(service_id) -> str:
+    return f"service:{service_id}"
+
+
+def _to_hash(service_item:dict) -> dict:
+    value = {'chat_id': service_item['chat_id'], 'host': service_item['host'],
+             'port': service_item['port'], 'alias': service_item['alias'],
+             'interval': service_item['interval'], 'status': service_item.get('status', 'init'),
+             'probe_type': service_item.get('probe_type', 'tcp')}
+    for field in TIME_FIELDS:
+        if isinstance(service_item.get(field), datetime):
+            value[field] = service_item[field].timestamp()
+    for field in PROBE_FIELDS:
+        if service_item.get(field) is not None:
+            value[field] = service_item[field]
+    for field in STATE_HASH_FIELDS:
+        if field in service_item:
+            value[field] = _dump_state(field, service_item[field])
+    return value
+
+
+def _from_hash(service_id:str, value:dict) -> dict:
+    service_item = {'_id': ObjectId(service_id), 'chat_id': value['chat_id'], 'host': value['host'],
+                    'port': int(value['port']), 'alias': value['alias'],
+                    'interval': int(value['interval']), 'status': value.get('status', 'init'),
+                    'probe_type': value.get('probe_type', 'tcp'), 'url': value.get('url'),
+                    'expect_status': int(value['expect_status']) if 'expect_status' in value else None,
+                    'expect_body': value.get('expect_body')}
+    for field in TIME_FIELDS:
+        if field in value:
+            service_item[field] = datetime.fromtimestamp(float(value[field]))
+    for field in STATE_HASH_FIELDS:
+        if field in value:
+            service_item[field] = _load_state(field, value[field])
+    return service_item
+
+
+class ServiceCache:
+    """
+    Redis hot-state cache for per-service status and next check time.
+    MongoDB stays the source of truth; ResultWriter updates the cache first and MongoDB write-behind.
+    Every method is a no-op (or returns None) when Redis is not configured.
+    """
+
+    def __init__(self):
+        self.database = Database()
+
+    @property
+    def enabled(self) -> bool:
+        return self.database.get_redis is not None
+
+    async def is_warm(self) -> bool:
+        if not self.enabled:
+            return False
+        return bool(await self.database.get_redis.exists(WARM_KEY))
+
+    async def mark_warm(self, count:int):
+        """Cold start: MongoDB에서 읽은 서비스를 put_services로 모두 채운 뒤 호출"""
+        redis_client = self.database.get_redis
+        if redis_client is None:
+            return
+        await redis_client.set(WARM_KEY, datetime.now().timestamp())
+        print(f"Redis cache warmed with {count} services.")
+
+    def _put(self, pipe, service_item:dict):
+        service_id = str(service_item['_id'])
+        pipe.hset(_service_key(service_id), mapping=_to_hash(service_item))
+        next_check_time = service_item.get('next_check_time')
+        if not isinstance(next_check_time, datetime):
+            next_check_time = datetime.now()
+        pipe.zadd(SCHEDULE_KEY, {service_id: next_check_time.timestamp()})
+
+    async def put_service(self, service_item:dict):
+        """/add 시 호출"""
+        redis_client = self.database.get_redis
+        if redis_client is None:
+            return
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(_service_key(service_item['_id']))
+            self._put(pipe, service_item)
+            await pipe.execute()
+
+    async def put_services(self, services:list):
+        """/import와 cold start 시 호출 (한 번의 pipeline)"""
+        redis_client = self.database.get_redis
+        if redis_client is None or not services:
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for service_item in services:
+                self._put(pipe, service_item)
+            await pipe.execute()
+
+    async def remove_service(self, service_item:dict):
+        """/remove 시 호출 (explicit invalidation)"""
+        redis_client = self.database.get_redis
+        if redis_client is None:
+            return
+        service_id = str(service_item['_id'])
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(_service_key(service_id))
+            pipe.zrem(SCHEDULE_KEY, service_id)
+            await pipe.execute()
+
+    async def update_status(self, updates:dict):
+        """updates: _id -> {status, last_check_time, next_check_time, 상태 필드, breaker} (일부만 있는 항목도 가능)"""
+        redis_client = self.database.get_redis
+        if redis_client is None or not updates:
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for service_id, fields in updates.items():
+                service_id = str(service_id)
+                value = {'status': fields['status']} if 'status' in fields else dict()
+                for field in TIME_FIELDS:
+                    if field in fields:
+                        value[field] = fields[field].timestamp()
+                for field in STATE_HASH_FIELDS:
+                    if field in fields:
+                        value[field] = _dump_state(field, fields[field])
+                pipe.hset(_service_key(service_id), mapping=value)
+                if 'next_check_time' in fields:
+                    pipe.zadd(SCHEDULE_KEY, {service_id: value['next_check_time']})
+            await pipe.execute()
+
+    async def iter_all_services(self, batch_size:int=500):
+        """
+        schedule의 서비스를 batch_size개씩 읽어 하나씩 넘긴다.
+        로딩 중에도 체크 결과로 score가 바뀌므로 순위(ZRANGE) 대신 ZSCAN을 쓴다 (중복은 가능, 누락은 없음).
+        """
+        redis_client = self.database.get_redis
+        if redis_client is None:
+            return
+        cursor = 0
+        while True:
+            cursor, members = await redis_client.zscan(SCHEDULE_KEY, cursor, count=batch_size)
+            if members:
+                for service_item in await self._get_many([service_id for service_id, _ in members]):
+                    yield service_item
+            if cursor == 0:
+                return
+
+    async def _get_many(self, service_ids:list) -> list:
+        redis_client = self.database.get_redis
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for service_id in service_ids:
+                pipe.hgetall(_service_key(service_id))
+            values = await pipe.execute()
+        return [_from_hash(service_id, value) for service_id, value in zip(service_ids, values)
+                if value.get('chat_id') is not None]
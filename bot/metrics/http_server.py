@@ -0,0 +1,103 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from metrics.metrics import EVENT_LOOP_BLOCKED, EVENT_LOOP_LAG
+
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 8000))
+LOOP_LAG_INTERVAL = 0.5  # event loop 지연 측정 주기(초)
+HEALTH_CHECK_TIMEOUT = 2
+
+
+class HealthServer:
+    """
+    Singleton embedded HTTP endpoint.
+      /metrics  Prometheus text format
+      /healthz  liveness: every registered liveness check passes
+      /readyz   readiness: every registered readiness check passes
+    Checks are plain or async callables returning bool, registered by the component they describe.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(HealthServer, cls).__new__(cls)
+            cls._instance.server = None
+            cls._instance.checks = {'liveness': dict(), 'readiness': dict()}
+            cls._instance.loop_task = None
+        return cls._instance
+
+    def add_liveness_check(self, name:str, check):
+        self.checks['liveness'][name] = check
+
+    def add_readiness_check(self, name:str, check):
+        self.checks['readiness'][name] = check
+
+    async def start(self, host:str=METRICS_HOST, port:int=METRICS_PORT):
+        if self.server is not None:
+            return
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self.loop_task = asyncio.create_task(monitor_event_loop())
+        print(f"Metrics endpoint listening on {host}:{port}.")
+
+    async def stop(self):
+        if self.server is None:
+            return
+        self.loop_task.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        self.server = None
+
+    async def run_checks(self, kind:str) -> dict:
+        results = dict()
+        for name, check in self.checks[kind].items():
+            try:
+                result = check()
+                if inspect.isawaitable(result):
+                    result = await asyncio.wait_for(result, HEALTH_CHECK_TIMEOUT)
+                results[name] = bool(result)
+            except Exception as e:
+                print(f"{kind} check {name} failed: {e}")
+                results[name] = False
+        return results
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # 헤더는 읽고 버린다 (GET만 처리)
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode(errors="replace").split()
+            path = parts[1].split('?', 1)[0] if len(parts) >= 2 else ""
+
+            if path == "/metrics":
+                status, content_type, body = 200, CONTENT_TYPE_LATEST, generate_latest()
+            elif path in ("/healthz", "/readyz"):
+                results = await self.run_checks('liveness' if path == "/healthz" else 'readiness')
+                status = 200 if all(results.values()) else 503
+                content_type, body = "application/json", json.dumps(results).encode()
+            else:
+                status, content_type, body = 404, "text/plain", b"not found\n"
+
+            reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def monitor_event_loop(interval:float=LOOP_LAG_INTERVAL):
+    """sleep이 예정보다 늦게 깨어난 만큼을 event loop blocking 시간으로 기록"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(time.perf_counter() - started - interval, 0.0)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_BLOCKED.inc(lag)
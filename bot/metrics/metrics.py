@@ -0,0 +1,60 @@
+import functools
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# latency bucket (초): 로컬 connect(~ms)부터 probe timeout / 느린 Mongo 쿼리까지
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PROBE_LATENCY = Histogram('monitor_probe_duration_seconds', "Probe duration by result",
+                          ['result'], buckets=LATENCY_BUCKETS)
+PROBES_IN_FLIGHT = Gauge('monitor_probes_in_flight', "Probes currently running")
+
+SCHEDULER_LAG = Histogram('monitor_scheduler_lag_seconds', "Dispatch time minus scheduled time",
+                          buckets=LATENCY_BUCKETS + (30, 60))
+SCHEDULER_QUEUE_DEPTH = Gauge('monitor_scheduler_queue_depth', "Targets waiting in the deadline queue")
+SCHEDULER_IN_FLIGHT = Gauge('monitor_scheduler_in_flight', "Checks dispatched but not yet finished")
+SCHEDULER_PEAK_SLOT_LOAD = Gauge('monitor_scheduler_peak_slot_load', "Most targets queued in a single time slot")
+
+DB_LATENCY = Histogram('monitor_db_operation_seconds', "Database method latency",
+                       ['method', 'outcome'], buckets=LATENCY_BUCKETS)
+HANDLER_LATENCY = Histogram('monitor_handler_seconds', "Telegram update handler latency",
+                            ['handler', 'outcome'], buckets=LATENCY_BUCKETS)
+
+TELEGRAM_SEND_LATENCY = Histogram('monitor_telegram_send_seconds', "Telegram sendMessage latency by status",
+                                  ['status'], buckets=LATENCY_BUCKETS)
+TELEGRAM_RATE_LIMITED = Counter('monitor_telegram_rate_limited_total', "Telegram 429 responses")
+TELEGRAM_QUEUE_DEPTH = Gauge('monitor_telegram_queue_depth', "Messages waiting in the send queue")
+
+EVENT_LOOP_LAG = Histogram('monitor_event_loop_lag_seconds', "Event loop wake-up delay",
+                           buckets=LATENCY_BUCKETS)
+EVENT_LOOP_BLOCKED = Counter('monitor_event_loop_blocked_seconds_total', "Accumulated event loop blocking time")
+EVENT_LOOP_STALLS = Counter('monitor_event_loop_stalls_total', "Event loop stalls caught by the stall detector")
+
+
+def probe_result_label(reason:str) -> str:
+    """'http 503' 같은 reason은 label 수가 늘지 않도록 종류만 남긴다"""
+    return reason.split(' ', 1)[0]
+
+
+def observe_latency(histogram):
+    """async 함수 처리 시간을 함수 이름 / outcome 별로 histogram에 기록하는 decorator"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                histogram.labels(method.__name__, outcome).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# Database 메소드 / 텔레그램 handler 처리 시간
+observe_db = observe_latency(DB_LATENCY)
+observe_handler = observe_latency(HANDLER_LATENCY)
@@ -0,0 +1,249 @@
+import asyncio
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+
+from datetime import datetime
+
+from metrics.metrics import DB_LATENCY, EVENT_LOOP_STALLS, HANDLER_LATENCY
+
+# 모든 기능은 기본적으로 꺼져 있다: 켜기 전에는 thread도, tracemalloc hook도 없다
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# /debug 명령을 쓸 수 있는 chat id (쉼표 구분). 비어 있으면 명령 자체가 동작하지 않는다
+ADMIN_CHAT_IDS = {chat_id.strip() for chat_id in os.getenv("ADMIN_CHAT_IDS", "").split(",") if chat_id.strip()}
+# event loop가 이 시간(초) 이상 한 callback에 묶이면 stack을 남긴다 (0이면 시작 시 꺼짐)
+STALL_THRESHOLD = float(os.getenv("STALL_THRESHOLD", 0))
+PROFILE_SECONDS = float(os.getenv("PROFILE_SECONDS", 30))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+REPORT_LINES = 10
+
+
+def is_admin(chat_id) -> bool:
+    return str(chat_id) in ADMIN_CHAT_IDS
+
+
+def latency_summary(histogram, limit:int=REPORT_LINES) -> list:
+    """Histogram의 label별 호출 수 / 누적 시간 / 평균 (누적 시간 순)"""
+    totals = collections.defaultdict(lambda: [0, 0.0])
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            name = ",".join(sample.labels.values())
+            if sample.name.endswith("_count"):
+                totals[name][0] += sample.value
+            elif sample.name.endswith("_sum"):
+                totals[name][1] += sample.value
+    rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+    return [f"{name}: {int(count)} calls, {total:.3f}s total, {total / count * 1000:.1f}ms avg"
+            for name, (count, total) in rows if count]
+
+
+class StallDetector:
+    """
+    Watchdog thread for the event loop: a heartbeat task stamps the time on every loop turn it gets,
+    and when the stamp is older than the threshold the thread captures the loop thread's current stack
+    (sys._current_frames) while the loop is still blocked, then writes it to the log and PROFILE_DIR.
+    """
+
+    def __init__(self):
+        self.threshold = None
+        self.beat = 0.0
+        self.stalls = 0
+        self.loop_thread_id = None
+        self.heartbeat_task = None
+        self.stop_event = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold is not None
+
+    def start(self, threshold:float):
+        self.stop()
+        self.threshold = threshold
+        self.loop_thread_id = threading.get_ident()
+        self.beat = time.monotonic()
+        self.heartbeat_task = asyncio.get_running_loop().create_task(self.heartbeat())
+        self.stop_event = threading.Event()
+        threading.Thread(target=self.watch, args=(self.stop_event,), name="stall-detector", daemon=True).start()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.threshold = None
+        self.stop_event.set()
+        self.heartbeat_task.cancel()
+
+    async def heartbeat(self):
+        interval = self.threshold / 4
+        while True:
+            self.beat = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def watch(self, stop_event:threading.Event):
+        threshold = self.threshold
+        reported = None  # 같은 stall은 한 번만 기록
+        while not stop_event.wait(threshold / 4):
+            beat = self.beat
+            if time.monotonic() - beat < threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            self.stalls += 1
+            EVENT_LOOP_STALLS.inc()
+            stack = "".join(traceback.format_stack(frame))
+            header = f"Event loop blocked for more than {threshold}s at {time.strftime('%Y-%m-%d %H:%M:%S')}"
+            print(f"{header}\n{stack}", flush=True)
+            with open(os.path.join(ensure_profile_dir(), "stalls.log"), "a") as f:
+                f.write(f"{header}\n{stack}\n")
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack every PROFILE_SAMPLE_INTERVAL seconds from a separate thread
+    and writes the folded stacks (flamegraph.pl / speedscope format) to PROFILE_DIR.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    def run(self, thread_id:int, seconds:float, interval:float=PROFILE_SAMPLE_INTERVAL) -> collections.Counter:
+        stacks = collections.Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stacks[fold_stack(frame)] += 1
+            time.sleep(interval)
+        return stacks
+
+    async def profile(self, seconds:float=PROFILE_SECONDS) -> tuple:
+        """(파일 경로, 요약 줄 목록). 샘플링은 thread에서 하므로 loop는 그동안 평소대로 동작한다"""
+        if self.running:
+            raise RuntimeError("a CPU profile is already running")
+        self.running = True
+        try:
+            stacks = await asyncio.to_thread(self.run, threading.get_ident(), seconds)
+        finally:
+            self.running = False
+
+        path = profile_path("cpu", "folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # 각 샘플의 가장 안쪽 frame(self time) 기준 상위 함수
+        total = sum(stacks.values()) or 1
+        leaves = collections.Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        lines = [f"{count / total * 100:.1f}% {leaf}" for leaf, count in leaves.most_common(REPORT_LINES)]
+        return path, [f"{sum(stacks.values())} samples in {seconds:g}s"] + lines
+
+
+def fold_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class HeapProfiler:
+    """On-demand tracemalloc: start tracing, take snapshots (saved to PROFILE_DIR) and diff each against the previous one."""
+
+    def __init__(self):
+        self.previous = None
+
+    def start(self, frames:int=TRACEMALLOC_FRAMES):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self.previous = None
+
+    def snapshot(self) -> tuple:
+        """(파일 경로, 요약 줄 목록). 직전 snapshot이 있으면 증가량 순, 없으면 크기 순"""
+        if not tracemalloc.is_tracing():
+            self.start()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        path = profile_path("heap", "tracemalloc")
+        snapshot.dump(path)
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced {current / 1024 / 1024:.1f}MiB (peak {peak / 1024 / 1024:.1f}MiB)"]
+        if self.previous is None:
+            stats = snapshot.statistics('lineno')[:REPORT_LINES]
+        else:
+            stats = snapshot.compare_to(self.previous, 'lineno')[:REPORT_LINES]
+        lines += [str(stat) for stat in stats]
+        self.previous = snapshot
+        return path, lines
+
+
+def ensure_profile_dir() -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return PROFILE_DIR
+
+
+def profile_path(kind:str, extension:str) -> str:
+    """bot과 worker가 같은 PROFILE_DIR을 써도 겹치지 않도록 pid와 ms까지 넣는다"""
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3]
+    return os.path.join(ensure_profile_dir(), f"{kind}-{stamp}-{os.getpid()}.{extension}")
+
+
+class Profiler:
+    """
+    Opt-in diagnostics shared by the bot and the lease worker.
+    SIGUSR1 takes a PROFILE_SECONDS CPU profile, SIGUSR2 a tracemalloc snapshot (diffed against the last one);
+    admins can do the same and toggle stall detection with /debug.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(Profiler, cls).__new__(cls, *args, **kwargs)
+            cls._instance.stall_detector = StallDetector()
+            cls._instance.cpu = SamplingProfiler()
+            cls._instance.heap = HeapProfiler()
+        return cls._instance
+
+    def install(self):
+        """실행 중인 loop에서 호출: signal handler 등록, STALL_THRESHOLD가 설정되어 있으면 stall 감지 시작"""
+        if STALL_THRESHOLD > 0:
+            self.stall_detector.start(STALL_THRESHOLD)
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, lambda: loop.create_task(self.signal_cpu_profile()))
+            loop.add_signal_handler(signal.SIGUSR2, self.signal_heap_snapshot)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            # Windows이거나 main thread가 아닌 경우
+            pass
+
+    async def signal_cpu_profile(self):
+        try:
+            path, lines = await self.cpu.profile()
+        except RuntimeError as e:
+            print(f"CPU profile skipped: {e}")
+            return
+        print(f"CPU profile written to {path}\n" + "\n".join(lines))
+
+    def signal_heap_snapshot(self):
+        path, lines = self.heap.snapshot()
+        print(f"Heap snapshot written to {path}\n" + "\n".join(lines))
+
+    def timings(self) -> list:
+        return (["handlers:"] + latency_summary(HANDLER_LATENCY)
+                + ["database:"] + latency_summary(DB_LATENCY))
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+
+class ProbeResult:
+    """
+    단일 서비스 체크 결과.
+    체크마다 만들어지므로 pydantic 검증 없이 __slots__만 쓰는 가벼운 객체로 둔다.
+    """
+    __slots__ = ('host', 'port', 'up', 'latency', 'reason', 'checked_at', 'status_code', 'tls_latency')
+
+    def __init__(self, host:str, port:int, up:bool, checked_at:datetime, latency:float=None, reason:str="ok",
+                 status_code:int=None, tls_latency:float=None):
+        self.host = host
+        self.port = port
+        self.up = up
+        self.latency = latency  # connect latency (ms), HTTP는 응답까지의 시간. 실패 시 None
+        self.reason = reason  # ok / refused / timeout / dns / unreachable / error / tls / http <code> / body
+        self.checked_at = checked_at
+        self.status_code = status_code  # HTTP probe only
+        self.tls_latency = tls_latency  # TLS handshake (ms), 새 연결을 맺었을 때만
+
+    def __repr__(self):
+        return (f"ProbeResult(host={self.host!r}, port={self.port}, up={self.up}, latency={self.latency}, "
+                f"reason={self.reason!r}, checked_at={self.checked_at})")
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel, Field
 from bson import ObjectId
 
@@ -18,9 +19,13 @@ class ServiceModel(BaseModel):
     #id: PyObjectId
     chat_id: str
     host: str
-    port: int
+    port: int = Field(ge=1, le=65535)
     alias: str
-    interval: int
+    interval: int = Field(gt=0)  # 초. 0 이하면 위상 계산과 다음 체크 시각이 성립하지 않는다
+    probe_type: str = "tcp"  # tcp / http / https
+    url: Optional[str] = None  # http(s) probe 대상 URL
+    expect_status: Optional[int] = None  # 없으면 2xx/3xx를 정상으로 판단
+    expect_body: Optional[str] = None  # 응답 본문에 포함되어야 하는 문자열
 
     # class Config:
     #     arbitrary_types_allowed = True  # 임의 타입 허용
@@ -0,0 +1,36 @@
+from scheduler.state_machine import ServiceState
+
+
+class ServiceRecord:
+    """
+    Compact in-memory form of a scheduled service, built once from the raw Mongo/Redis document.
+    Pydantic models stay at the command and import boundary; the scheduler loop only touches these records.
+    Probe settings live on the shared Target, so a record keeps just what results and alerts need.
+    """
+    __slots__ = ('_id', 'chat_id', 'alias', 'host', 'port', 'url', 'interval', 'breaker', 'state')
+
+    def __init__(self, _id, chat_id:str, alias:str, host:str, port:int, url:str, interval:int,
+                 breaker:dict, state:ServiceState):
+        self._id = _id
+        self.chat_id = chat_id
+        self.alias = alias
+        self.host = host
+        self.port = port
+        self.url = url
+        self.interval = interval
+        self.breaker = breaker  # 마지막으로 저장한 breaker 필드 (바뀔 때만 다시 쓴다)
+        self.state = state
+
+    @classmethod
+    def from_document(cls, service_item:dict):
+        return cls(service_item['_id'], service_item['chat_id'], service_item['alias'], service_item['host'],
+                   service_item['port'], service_item.get('url'), service_item['interval'],
+                   service_item.get('breaker'), ServiceState.from_document(service_item))
+
+    @property
+    def status(self) -> str:
+        return self.state.status
+
+    @property
+    def target(self) -> str:
+        return self.url or f"{self.host}:{self.port}"
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List
 from pydantic import BaseModel, Field
 from bson import ObjectId
 
@@ -19,5 +20,6 @@ class UserModel(BaseModel):
     chat_id: str
     host_cnt: int
     user_type: str
+    services: List[dict] = Field(default_factory=list)  # chat summary: {_id, alias, target} (host_cnt와 함께 원자적으로 갱신)
 
 
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import random
+import time
+import httpx
+
+from metrics.metrics import TELEGRAM_QUEUE_DEPTH, TELEGRAM_RATE_LIMITED, TELEGRAM_SEND_LATENCY
+
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+# 로컬 가짜 Bot API 서버로 테스트할 때 변경 (예: http://127.0.0.1:8081)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Telegram 전송 제한: 전체 초당 약 30건, 채팅별 초당 약 1건
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', 1))
+SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', 8))
+SEND_QUEUE_SIZE = int(os.getenv('TELEGRAM_SEND_QUEUE_SIZE', 10000))
+MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', 5))
+# 다시 가득 찬 채팅별 bucket을 정리하는 주기(초)
+CHAT_BUCKET_SWEEP_INTERVAL = 60
+
+
+class TokenBucket:
+    """Token bucket with an optional hard pause (Telegram retry_after)."""
+
+    def __init__(self, rate:float, capacity:float=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds:float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self) -> float:
+        """토큰을 하나 가져온다. 0이면 바로 전송 가능, 아니면 기다려야 할 시간(초)을 반환"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self, now:float) -> bool:
+        """다시 가득 찼고 pause도 없으면 새 bucket과 같으므로 버려도 된다"""
+        return now >= self.paused_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class TelegramDispatcher:
+    """
+    Singleton outbound message queue for the Telegram Bot API.
+    One pooled HTTP client, global and per-chat token buckets, retry_after handling and retries with backoff.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TelegramDispatcher, cls).__new__(cls)
+            cls._instance.client = None
+            cls._instance.queue = None
+            cls._instance.workers = list()
+            cls._instance.deferred = set()  # 나중에 다시 큐에 들어갈 메시지 task
+            cls._instance.global_bucket = TokenBucket(GLOBAL_RATE)
+            cls._instance.chat_buckets = dict()
+            cls._instance.next_sweep = 0.0
+            cls._instance.metrics = {'sent': 0, 'failed': 0, 'retried': 0, 'rate_limited': 0, 'deferred': 0}
+        return cls._instance
+
+    async def start(self, token:str=TELEGRAM_BOT_TOKEN, api_url:str=TELEGRAM_API_URL):
+        if self.client is not None:
+            return
+        self.client = httpx.AsyncClient(base_url=f"{api_url}/bot{token}",
+                                        timeout=httpx.Timeout(10.0, connect=5.0),
+                                        limits=httpx.Limits(max_connections=SEND_WORKERS,
+                                                            max_keepalive_connections=SEND_WORKERS))
+        self.queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(SEND_WORKERS)]
+        TELEGRAM_QUEUE_DEPTH.set_function(self.queue_depth)
+
+    async def stop(self, timeout:float=10):
+        """큐에 남은 메시지를 timeout 동안 전송한 후 종료"""
+        if self.client is None:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Telegram queue not drained, {self.queue_depth() + len(self.deferred)} messages dropped.")
+        tasks = self.workers + list(self.deferred)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.aclose()
+        self.client = None
+        self.workers = list()
+        self.deferred = set()
+
+    async def _drain(self):
+        while True:
+            await self.queue.join()
+            if not self.deferred:
+                return
+            await asyncio.sleep(0.1)
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def stats(self) -> dict:
+        return dict(self.metrics, queue_depth=self.queue_depth(), deferred_depth=len(self.deferred))
+
+    async def send(self, chat_id, text:str, **kwargs):
+        """메시지를 큐에 넣는다. 큐가 가득 차면 빈 자리가 날 때까지 대기 (backpressure)"""
+        payload = dict(kwargs, chat_id=chat_id, text=text)
+        await self.queue.put((payload, 0))
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        now = time.monotonic()
+        if now >= self.next_sweep:
+            self.next_sweep = now + CHAT_BUCKET_SWEEP_INTERVAL
+            self.chat_buckets = {key: bucket for key, bucket in self.chat_buckets.items() if not bucket.idle(now)}
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(PER_CHAT_RATE)
+        return bucket
+
+    async def _requeue_later(self, item, delay:float):
+        await asyncio.sleep(delay)
+        await self.queue.put(item)
+
+    def _defer(self, item, delay:float):
+        # 다른 채팅의 메시지를 막지 않도록 워커를 점유하지 않고 나중에 다시 큐에 넣는다
+        self.metrics['deferred'] += 1
+        task = asyncio.create_task(self._requeue_later(item, delay))
+        self.deferred.add(task)
+        task.add_done_callback(self.deferred.discard)
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self._deliver(item)
+            except Exception as e:
+                self.metrics['failed'] += 1
+                print(f"Failed to send message: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, item):
+        payload, attempt = item
+        chat_bucket = self._chat_bucket(payload['chat_id'])
+        delay = chat_bucket.acquire()
+        if delay > 0:
+            self._defer(item, delay)
+            return
+        while (delay := self.global_bucket.acquire()) > 0:
+            await asyncio.sleep(delay)
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.post('/sendMessage', json=payload)
+        except httpx.TransportError as e:
+            TELEGRAM_SEND_LATENCY.labels("error").observe(time.perf_counter() - started)
+            self._retry(item, f"{type(e).__name__}")
+            return
+        TELEGRAM_SEND_LATENCY.labels(str(response.status_code)).observe(time.perf_counter() - started)
+
+        if response.status_code == 429:
+            self.metrics['rate_limited'] += 1
+            TELEGRAM_RATE_LIMITED.inc()
+            retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+            # flood wait는 bot 전체에 걸리므로 다른 채팅으로의 전송도 멈춘다
+            chat_bucket.pause(retry_after)
+            self.global_bucket.pause(retry_after)
+            self._defer(item, retry_after)
+        elif response.status_code >= 500:
+            self._retry(item, f"HTTP {response.status_code}")
+        elif response.status_code >= 400:
+            self.metrics['failed'] += 1
+            print(f"Failed to send message: HTTP {response.status_code} {response.text}")
+        else:
+            self.metrics['sent'] += 1
+
+    def _retry(self, item, reason:str):
+        payload, attempt = item
+        if attempt >= MAX_RETRIES:
+            self.metrics['failed'] += 1
+            print(f"Failed to send message after {attempt} retries: {reason}")
+            return
+        self.metrics['retried'] += 1
+        # exponential backoff with jitter
+        self._defer((payload, attempt + 1), min(2 ** attempt, 60) * random.uniform(0.5, 1.5))
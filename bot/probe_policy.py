@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import os
+import time
+
+from datetime import datetime
+
+# 같은 호스트(여러 포트/URL)에 동시에 여는 연결 수와 연결 시작 간 최소 간격(초)
+PROBE_HOST_CONCURRENCY = int(os.getenv("PROBE_HOST_CONCURRENCY", 4))
+PROBE_HOST_SPACING = float(os.getenv("PROBE_HOST_SPACING", 0.05))
+# 응답이 없는 실패(timeout 등)가 BREAKER_THRESHOLD번 연속되면 체크를 멈추고
+# BREAKER_BASE_BACKOFF초부터 두 배씩(최대 BREAKER_MAX_BACKOFF초) 기다린 뒤 한 번 재시도한다
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 3))
+BREAKER_BASE_BACKOFF = float(os.getenv("BREAKER_BASE_BACKOFF", 60))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", 1800))
+# refused / http 오류는 호스트가 살아 있다는 뜻이므로 breaker 대상이 아니다 (체크 비용도 작다)
+BREAKER_REASONS = ('timeout', 'unreachable', 'dns')
+
+
+class CircuitBreaker:
+    """
+    Per-target breaker: closed -> open after BREAKER_THRESHOLD silent failures,
+    half-open once the backoff has passed (the next check is the recovery probe),
+    closed again on any answer, open with a doubled backoff if the recovery probe fails.
+    """
+    __slots__ = ('failures', 'level', 'until')
+
+    def __init__(self, failures:int=0, level:int=0, until:float=None):
+        self.failures = failures
+        self.level = level  # 연속으로 열린 횟수 (backoff 지수)
+        self.until = until  # 다음 재시도 시각 (epoch), 닫혀 있으면 None
+
+    @classmethod
+    def from_document(cls, breaker:dict):
+        if not breaker:
+            return cls()
+        until = breaker.get('until')
+        return cls(breaker.get('failures', 0), breaker.get('level', 0),
+                   until.timestamp() if isinstance(until, datetime) else None)
+
+    def to_document(self) -> dict:
+        """서비스 문서의 breaker 필드 (닫혀 있고 실패도 없으면 None)"""
+        if not self.failures and self.until is None:
+            return None
+        return {'failures': self.failures, 'level': self.level,
+                'until': datetime.fromtimestamp(self.until) if self.until is not None else None}
+
+    def state(self, now:float) -> str:
+        if self.until is None:
+            return "closed"
+        return "open" if now < self.until else "half_open"
+
+    def allow(self, now:float) -> bool:
+        return self.until is None or now >= self.until
+
+    def record(self, probe_result):
+        if probe_result.reason not in BREAKER_REASONS:
+            self.failures, self.level, self.until = 0, 0, None
+            return
+        self.failures += 1
+        # half-open 재시도가 실패하면 바로 다시 연다
+        if self.failures >= BREAKER_THRESHOLD or self.level > 0:
+            self.level += 1
+            backoff = min(BREAKER_BASE_BACKOFF * 2 ** (self.level - 1), BREAKER_MAX_BACKOFF)
+            self.until = probe_result.checked_at.timestamp() + backoff
+
+
+class HostSlot:
+    __slots__ = ('semaphore', 'next_start', 'users')
+
+    def __init__(self, concurrency:int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.next_start = 0.0
+        self.users = 0
+
+
+class ProbePolicy:
+    """
+    Wraps ProbeEngine.probe_service with per-destination-host concurrency caps and spacing,
+    and a circuit breaker per probe target. probe() returns None when the breaker skips the check.
+    """
+
+    def __init__(self, probe_engine, host_concurrency:int=PROBE_HOST_CONCURRENCY,
+                 host_spacing:float=PROBE_HOST_SPACING):
+        self.probe_engine = probe_engine
+        self.host_concurrency = host_concurrency
+        self.host_spacing = host_spacing
+        self.hosts = dict()  # host -> HostSlot (대기/진행 중이거나 간격이 남은 호스트만)
+        self.breakers = dict()  # target key -> CircuitBreaker (닫혀 있고 실패가 없으면 제거)
+        self.skipped = 0
+        self.delayed = 0
+
+    def stats(self) -> dict:
+        now = time.time()
+        open_count = sum(1 for breaker in self.breakers.values() if breaker.state(now) == "open")
+        return {'hosts': len(self.hosts), 'breakers': len(self.breakers), 'open': open_count,
+                'skipped': self.skipped, 'delayed': self.delayed}
+
+    def restore(self, key, breaker:dict):
+        """문서에 저장된 breaker 상태로 복원 (재시작 / lease worker 간 인계)"""
+        if breaker:
+            self.breakers[key] = CircuitBreaker.from_document(breaker)
+        else:
+            self.breakers.pop(key, None)
+
+    def forget(self, key):
+        self.breakers.pop(key, None)
+
+    def retry_at(self, key) -> float:
+        breaker = self.breakers.get(key)
+        return breaker.until if breaker is not None else None
+
+    def breaker_document(self, key) -> dict:
+        breaker = self.breakers.get(key)
+        return breaker.to_document() if breaker is not None else None
+
+    @contextlib.asynccontextmanager
+    async def host_slot(self, host:str):
+        slot = self.hosts.get(host)
+        if slot is None:
+            slot = self.hosts[host] = HostSlot(self.host_concurrency)
+        slot.users += 1
+        try:
+            async with slot.semaphore:
+                now = time.monotonic()
+                start = max(now, slot.next_start)
+                slot.next_start = start + self.host_spacing
+                if start > now:
+                    self.delayed += 1
+                    await asyncio.sleep(start - now)
+                yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                # 간격이 지난 뒤에 정리해야 바로 다음 체크도 간격을 지킨다
+                delay = slot.next_start - time.monotonic()
+                if delay > 0:
+                    asyncio.get_running_loop().call_later(delay, self._release_host, host, slot)
+                else:
+                    del self.hosts[host]
+
+    def _release_host(self, host:str, slot:HostSlot):
+        if self.hosts.get(host) is slot and slot.users == 0:
+            del self.hosts[host]
+
+    async def probe(self, key, probe_spec:dict):
+        breaker = self.breakers.get(key)
+        if breaker is not None and not breaker.allow(time.time()):
+            self.skipped += 1
+            return None
+
+        async with self.host_slot(probe_spec['host']):
+            probe_result = await self.probe_engine.probe_service(probe_spec)
+
+        breaker = self.breakers.get(key) or CircuitBreaker()
+        breaker.record(probe_result)
+        if breaker.failures or breaker.until is not None:
+            self.breakers[key] = breaker
+        else:
+            self.breakers.pop(key, None)
+        return probe_result
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+from database.database import Database
+
+CHANGE_STREAM_ENABLED = os.getenv("CHANGE_STREAM_ENABLED", "true").lower() in ("1", "true", "yes")
+# resume token 저장 주기(초). 재시작하면 마지막 저장 이후의 변경을 다시 받는다 (적용은 idempotent)
+CHANGE_STREAM_TOKEN_INTERVAL = float(os.getenv("CHANGE_STREAM_TOKEN_INTERVAL", 5))
+CHANGE_STREAM_RETRY_INTERVAL = float(os.getenv("CHANGE_STREAM_RETRY_INTERVAL", 5))
+RESUME_TOKEN_NAME = "service_change_stream"
+
+NOT_REPLICA_SET = 40573  # "The $changeStream stage is only supported on replica sets"
+# oplog에서 token 위치가 사라졌거나 token을 쓸 수 없는 경우: 처음부터 다시 맞춰야 한다
+RESUME_FAILED = (260, 280, 286)  # InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+
+
+class ServiceChangeListener:
+    """
+    Applies inserts, deletes and config edits on service_collection to the Monitor as they happen,
+    so changes made by other processes (or directly in MongoDB) reach the scheduler without a rescan.
+    The resume token is saved every CHANGE_STREAM_TOKEN_INTERVAL seconds; a restart replays what it missed.
+    When the token can no longer be resumed, a new stream is opened and the Monitor does a full resync.
+    After a snapshot restore it resumes from the snapshot's token instead of the saved one.
+    Needs a replica set (a single-node one is enough); on a standalone server it stops after one warning
+    (and one resync if the Monitor was restored from a snapshot).
+    """
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.database = Database()
+        self.running = False
+        self.token = None  # 마지막으로 받은 resume token
+        self.restored = False  # snapshot의 token에서 시작
+        self.applied = 0
+        self.resyncs = 0
+
+    def stats(self) -> dict:
+        return {'running': self.running, 'applied': self.applied, 'resyncs': self.resyncs}
+
+    def resume_from(self, token):
+        self.token = token
+        self.restored = True
+
+    async def resync_restored(self):
+        """change stream 없이 snapshot에서 시작한 경우: snapshot 이후의 변경을 전체 resync로 맞춘다"""
+        if self.restored:
+            await self.database.wait_until_ready()
+            await self.monitor.resync()
+            self.resyncs += 1
+
+    async def run(self):
+        if not CHANGE_STREAM_ENABLED:
+            await self.resync_restored()
+            return
+        await self.database.wait_until_ready()
+        if not self.restored:
+            self.token = await self.database.load_resume_token(RESUME_TOKEN_NAME)
+        while True:
+            try:
+                await self.consume()
+            except OperationFailure as e:
+                if e.code == NOT_REPLICA_SET:
+                    print("MongoDB is not a replica set; change stream disabled.")
+                    await self.resync_restored()
+                    return
+                if e.code in RESUME_FAILED and self.token is not None:
+                    print(f"Change stream cannot resume ({e.code}), starting over with a full resync.")
+                    self.token = None
+                    await self.database.save_resume_token(RESUME_TOKEN_NAME, None)
+                    continue
+                print(f"Change stream error: {e}")
+            except PyMongoError as e:
+                # 연결 끊김 등: 마지막 token부터 다시 받는다
+                print(f"Change stream interrupted: {type(e).__name__}: {e}")
+            finally:
+                self.running = False
+            await asyncio.sleep(CHANGE_STREAM_RETRY_INTERVAL)
+            await self.database.wait_until_ready()
+
+    async def consume(self):
+        async with self.database.watch_services(self.token) as stream:
+            self.running = True
+            if self.token is None and self.monitor.loaded:
+                # 이 stream이 열린 뒤의 변경은 stream이, 그 전까지의 상태는 resync가 맞춘다
+                # (아직 로딩 중이면 로딩이 현재 상태를 읽으므로 resync가 필요 없다)
+                await self.monitor.resync()
+                self.resyncs += 1
+            saved_token, saved_at = self.token, time.monotonic()
+            while stream.alive:
+                change = await stream.try_next()
+                if change is not None:
+                    await self.monitor.apply_change(change)
+                    self.applied += 1
+                if stream.resume_token is not None:
+                    self.token = stream.resume_token
+                if self.token != saved_token and time.monotonic() - saved_at >= CHANGE_STREAM_TOKEN_INTERVAL:
+                    await self.database.save_resume_token(RESUME_TOKEN_NAME, self.token)
+                    saved_token, saved_at = self.token, time.monotonic()
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from datetime import datetime, timedelta
+from database.database import Database
+from database.result_writer import ResultWriter
+from metrics.metrics import SCHEDULER_IN_FLIGHT
+from notification.telegram_dispatcher import TelegramDispatcher
+from probe_policy import ProbePolicy
+from scheduler.spread import spread_due
+from scheduler.state_machine import ServiceState
+from scheduler.target_registry import target_key, target_label
+from socket_test import ProbeEngine
+
+# local: 봇 프로세스 안의 Monitor가 모든 서비스를 체크 (단일 컨테이너)
+# lease: 봇은 텔레그램 명령만 처리하고, worker.py 컨테이너들이 lease를 잡아 체크
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "local")
+
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", 60))
+CLAIM_BATCH_SIZE = int(os.getenv("CLAIM_BATCH_SIZE", 500))
+CLAIM_POLL_INTERVAL = float(os.getenv("CLAIM_POLL_INTERVAL", 1))
+# 종료 신호를 받은 뒤 진행 중인 체크를 기다리는 최대 시간(초) (Monitor.stop에도 사용)
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", 20))
+
+
+class LeaseWorker:
+    """
+    Probe worker for multi-container deployments.
+    Claims batches of due services with a lease, renews the leases while probing and releases
+    them with the result write-back. Leases of a crashed worker expire and are claimed again.
+    After stop() it claims nothing more, waits for in-flight checks and flushes their results (releasing the leases).
+    """
+
+    def __init__(self, lease_seconds:int=LEASE_SECONDS, batch_size:int=CLAIM_BATCH_SIZE):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.database = Database()
+        self.probe_engine = ProbeEngine()
+        self.policy = ProbePolicy(self.probe_engine)
+        self.result_writer = ResultWriter()
+        self.in_flight = dict()  # _id -> task
+        self.claimed_count = 0
+        self.stopping = False
+        SCHEDULER_IN_FLIGHT.set_function(lambda: len(self.in_flight))
+
+    async def run(self):
+        print(f"Lease worker {self.worker_id} started.")
+        writer_task = asyncio.create_task(self.result_writer.run())
+        renew_task = asyncio.create_task(self.renew_loop())
+        try:
+            while not self.stopping:
+                # 처리 중인 체크가 많으면 새로 claim하지 않는다 (backpressure)
+                if len(self.in_flight) >= self.probe_engine.concurrency:
+                    await asyncio.wait(list(self.in_flight.values()), return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                # MongoDB가 복구될 때까지 claim하지 않는다
+                await self.database.wait_until_ready()
+                limit = min(self.batch_size, self.probe_engine.concurrency - len(self.in_flight))
+                services_list = await self.database.claim_due_services(
+                    self.worker_id, datetime.now(), self.lease_seconds, limit)
+                if not services_list:
+                    await asyncio.sleep(CLAIM_POLL_INTERVAL)
+                    continue
+
+                self.claimed_count += len(services_list)
+                # 같은 배치 안에서 같은 대상을 보는 서비스들은 한 번만 체크하고 결과를 나눈다
+                targets = dict()
+                for service_item in services_list:
+                    targets.setdefault(target_key(service_item), list()).append(service_item)
+                for subscribers in targets.values():
+                    task = asyncio.create_task(self.check_target(subscribers))
+                    for service_item in subscribers:
+                        self.in_flight[service_item['_id']] = task
+                    task.add_done_callback(lambda _, subscribers=subscribers: self._done(subscribers))
+
+            # graceful shutdown: 체크가 끝나는 동안에도 renew_loop가 lease를 연장한다
+            if self.in_flight:
+                _, not_done = await asyncio.wait(set(self.in_flight.values()), timeout=SHUTDOWN_TIMEOUT)
+                if not_done:
+                    print(f"{len(not_done)} checks still running at shutdown, their leases will expire.")
+            self.result_writer.stop()
+            await writer_task
+            print(f"Lease worker {self.worker_id} stopped.")
+        finally:
+            for task in (writer_task, renew_task):
+                task.cancel()
+            await self.probe_engine.aclose()
+
+    def stop(self):
+        self.stopping = True
+
+    def _done(self, subscribers:list):
+        for service_item in subscribers:
+            self.in_flight.pop(service_item['_id'], None)
+
+    async def renew_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            # 체크 중이거나 아직 Mongo에 반영되지 않은 서비스의 lease를 연장
+            service_ids = list(self.in_flight) + list(self.result_writer.buffer)
+            if service_ids:
+                lease_expires = datetime.now() + timedelta(seconds=self.lease_seconds)
+                try:
+                    await self.database.renew_leases(self.worker_id, service_ids, lease_expires)
+                except Exception as e:
+                    print(f"Error renewing leases: {e}")
+
+    async def check_target(self, subscribers:list):
+        key = target_key(subscribers[0])
+        # breaker 상태는 문서에 저장되어 worker 간에 넘겨진다 (프로세스에는 체크 동안만 유지)
+        self.policy.restore(key, next((item['breaker'] for item in subscribers if item.get('breaker')), None))
+        try:
+            probe_result = await self.policy.probe(key, subscribers[0])
+            retry_at, breaker = self.policy.retry_at(key), self.policy.breaker_document(key)
+        finally:
+            self.policy.forget(key)
+
+        if probe_result is None:
+            # 다른 worker가 backoff 중에 잡은 경우: 체크 없이 재시도 시각으로 미루고 lease만 해제
+            for service_item in subscribers:
+                self.result_writer.add(service_item['_id'], service_item.get('status', 'init'),
+                                       service_item.get('last_check_time'), datetime.fromtimestamp(retry_at),
+                                       lease_owner=None, lease_expires=None)
+            return
+
+        checked_at = probe_result.checked_at.timestamp()
+        for service_item in subscribers:
+            # worker 간에 슬롯 부하를 공유하지 않으므로 대상별 위상 + bounded jitter로만 분산
+            next_due = max(spread_due(key, service_item['interval'], checked_at, checked_at), retry_at or 0)
+            next_check_time = datetime.fromtimestamp(next_due)
+            # 다음 체크는 다른 worker가 할 수 있으므로 상태는 문서에서 읽고 매번 함께 저장
+            state = ServiceState.from_document(service_item)
+            transition = state.observe(probe_result)
+            fields = state.to_fields()
+            # 결과 저장과 함께 lease를 해제
+            self.result_writer.add(service_item['_id'], fields.pop('status'), probe_result.checked_at, next_check_time,
+                                   lease_owner=None, lease_expires=None, breaker=breaker, **fields)
+            self.result_writer.record_probe(service_item['_id'], probe_result)
+            if transition is not None and transition.notify:
+                await TelegramDispatcher().send(service_item['chat_id'], transition.message(service_item['alias'], target_label(service_item)))
@@ -0,0 +1,383 @@
+import asyncio
+import os
+import time
+
+from datetime import datetime
+from database.database import DB_BATCH_SIZE, SCHEDULE_PROJECTION, Database
+from database.result_writer import ResultWriter
+from database.service_cache import ServiceCache
+from metrics.metrics import SCHEDULER_IN_FLIGHT, SCHEDULER_PEAK_SLOT_LOAD, SCHEDULER_QUEUE_DEPTH
+from model.probe_model import ProbeResult
+from notification.telegram_dispatcher import TelegramDispatcher
+from scheduler.change_listener import ServiceChangeListener
+from scheduler.scheduler import DeadlineScheduler
+from scheduler.snapshot import (SNAPSHOT_INTERVAL, SNAPSHOT_PATH, encode_service, iter_snapshot_services,
+                                load_snapshot, save_snapshot, snapshot_document)
+from scheduler.spread import aligned_due, jitter_bound, next_due
+from scheduler.target_registry import TargetRegistry, target_key
+from model.service_record import ServiceRecord
+from view.list_page_cache import ListPageCache
+from probe_policy import ProbePolicy
+from socket_test import PROBE_CONCURRENCY, ProbeEngine
+
+MAX_SLEEP = 60  # 등록된 서비스가 없을 때 최대 대기 시간(초)
+# dispatch 했지만 끝나지 않은 체크가 이만큼 쌓이면 새 dispatch와 로딩을 멈춘다 (backpressure)
+MAX_PENDING = int(os.getenv("MAX_PENDING", PROBE_CONCURRENCY * 2))
+
+
+class Monitor:
+    """
+    Singleton that owns the scheduling state and dispatches each target when it is due.
+    Services monitoring the same target share one probe job (TargetRegistry); its result is fanned out to every subscriber.
+    Each subscriber is kept as a compact ServiceRecord with its own ServiceState:
+    transitions are written and notified, steady-state checks only touch timestamps.
+    The scheduling state is snapshotted to disk periodically and on stop(); a restart resumes from the
+    snapshot and catches up on what changed since through the change stream (or a background resync).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Monitor, cls).__new__(cls)
+            cls._instance.database = Database()
+            cls._instance.probe_engine = ProbeEngine()
+            cls._instance.policy = ProbePolicy(cls._instance.probe_engine)
+            cls._instance.scheduler = DeadlineScheduler()
+            cls._instance.result_writer = ResultWriter()
+            cls._instance.cache = ServiceCache()
+            cls._instance.services = dict()  # _id -> ServiceRecord
+            cls._instance.registry = TargetRegistry()
+            cls._instance.tasks = set()  # 진행 중인 체크
+            cls._instance.background = set()  # change listener, 주기적 snapshot
+            cls._instance.writer_task = None
+            cls._instance.pending = 0  # dispatch 되었지만 끝나지 않은 체크 수
+            cls._instance.capacity = asyncio.Event()  # pending < MAX_PENDING 일 때 set
+            cls._instance.capacity.set()
+            cls._instance.loaded = False
+            cls._instance.stopping = False
+            cls._instance.snapshot_path = SNAPSHOT_PATH
+            cls._instance.listener = ServiceChangeListener(cls._instance)
+            SCHEDULER_QUEUE_DEPTH.set_function(lambda: len(cls._instance.scheduler))
+            SCHEDULER_IN_FLIGHT.set_function(lambda: cls._instance.pending)
+            SCHEDULER_PEAK_SLOT_LOAD.set_function(lambda: cls._instance.scheduler.peak_slot_load())
+        return cls._instance
+
+    async def load(self, batch_size:int=DB_BATCH_SIZE):
+        """
+        Redis 캐시(없으면 Mongo)에서 서비스를 batch 단위로 읽으며 스케줄러에 등록.
+        dispatch 루프와 함께 실행되므로 첫 batch가 등록되면 바로 체크가 시작되고,
+        체크가 밀리면(capacity) 다음 batch를 읽지 않는다.
+        """
+        warm = await self.cache.is_warm()
+        if warm:
+            services = self.cache.iter_all_services(batch_size)
+        else:
+            services = self.database.iter_all_services(SCHEDULE_PROJECTION, batch_size)
+        batch = list()
+        async for service_item in services:
+            # 로딩 중 /add로 먼저 등록되었거나 ZSCAN이 중복으로 돌려준 서비스
+            if service_item['_id'] not in self.services:
+                self.add_service(service_item)
+            batch.append(service_item)
+            if len(batch) >= batch_size:
+                if not warm:
+                    await self.cache.put_services(batch)
+                batch = list()
+                await self.capacity.wait()
+                await asyncio.sleep(0)
+                if self.stopping:
+                    return
+        if not warm:
+            await self.cache.put_services(batch)
+            await self.cache.mark_warm(len(self.services))
+        self.loaded = True
+        print(f"Scheduler loaded {len(self.services)} services.")
+
+    async def restore(self, snapshot:dict, batch_size:int=DB_BATCH_SIZE):
+        """
+        snapshot의 서비스를 load()처럼 batch 단위로 등록 (MongoDB를 읽지 않는다).
+        저장된 다음 체크 시각과 상태 / breaker를 그대로 쓰고, 밀린 서비스는 _first_due가 한 interval에 나눈다.
+        """
+        for index, service_item in enumerate(iter_snapshot_services(snapshot), 1):
+            if service_item['_id'] not in self.services:
+                self.add_service(service_item)
+            if index % batch_size == 0:
+                await self.capacity.wait()
+                await asyncio.sleep(0)
+                if self.stopping:
+                    return
+        self.loaded = True
+        print(f"Scheduler restored {len(self.services)} services from the snapshot "
+              f"taken {time.time() - snapshot['taken_at']:.0f}s ago.")
+
+    async def take_snapshot(self, clean:bool=False, batch_size:int=DB_BATCH_SIZE):
+        """
+        다음 체크 시각, 상태, breaker를 SNAPSHOT_PATH에 기록.
+        resume token을 먼저 잡아 두므로, 기록 중에 반영된 변경도 재시작 후 change stream으로 다시 받는다.
+        """
+        if not self.snapshot_path or not self.loaded:
+            return
+        started = time.perf_counter()
+        resume_token = self.listener.token
+        rows = list()
+        for index, service_id in enumerate(list(self.services), 1):
+            record = self.services.get(service_id)
+            target = self.registry.targets.get(self.registry.service_targets.get(service_id))
+            if record is not None and target is not None:
+                rows.append(encode_service({
+                    '_id': service_id, 'chat_id': record.chat_id, 'alias': record.alias, 'interval': record.interval,
+                    **target.probe_spec, 'next_check_time': target.due,
+                    'breaker': self.policy.breaker_document(target.key), **record.state.to_fields()}))
+            if index % batch_size == 0 and not clean:
+                await asyncio.sleep(0)
+        await save_snapshot(self.snapshot_path, snapshot_document(rows, resume_token, clean))
+        print(f"Scheduler snapshot of {len(rows)} services written in {time.perf_counter() - started:.2f}s.")
+
+    async def snapshot_loop(self, interval:float=SNAPSHOT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.take_snapshot()
+            except Exception as e:
+                print(f"Error writing scheduler snapshot: {e}")
+
+    def add_service(self, service_item:dict):
+        """서비스 문서를 ServiceRecord로 바꿔 등록 (문서 자체는 보관하지 않는다)"""
+        self.services[service_item['_id']] = ServiceRecord.from_document(service_item)
+        target, created = self.registry.subscribe(service_item)
+        if created:
+            self.policy.restore(target.key, service_item.get('breaker'))
+            self.probe_engine.retain(target.probe_spec)
+        due = self._first_due(target, service_item.get('next_check_time'))
+        if created or due < target.due:
+            # 더 짧은 interval의 구독이 추가되면 공유 체크를 앞당긴다
+            target.due = due
+            self.scheduler.schedule(target.key, due)
+
+    def _first_due(self, target, next_check_time) -> float:
+        """
+        저장된 next_check_time보다 늦지 않은 범위에서 대상의 위상에 맞춘 첫 체크 시각.
+        재시작 직후 밀린 서비스들도 한꺼번에 체크하지 않고 한 interval에 걸쳐 나눈다.
+        """
+        now = time.time()
+        bound = jitter_bound(target.interval)
+        stored = next_check_time.timestamp() if isinstance(next_check_time, datetime) else now
+        due = aligned_due(target.key, target.interval, max(now, stored - target.interval + bound))
+        return max(self.scheduler.place(due, bound, earliest=now), self.policy.retry_at(target.key) or 0)
+
+    def update_service(self, service_item:dict):
+        """
+        다른 곳에서 바뀐 서비스 문서를 반영 (change stream / resync).
+        대상과 interval이 같으면 record만 고치고, 다르면 다시 구독한다. 어느 쪽이든 메모리의 상태는 유지.
+        """
+        service_id = service_item['_id']
+        record = self.services.get(service_id)
+        if record is None:
+            self.add_service(service_item)
+            return
+        if self.registry.service_targets.get(service_id) == target_key(service_item) \
+                and record.interval == service_item['interval']:
+            record.chat_id, record.alias = service_item['chat_id'], service_item['alias']
+            return
+        target, removed = self.registry.unsubscribe(service_id)
+        if removed:
+            self.scheduler.cancel(target.key)
+            self.policy.forget(target.key)
+            self.probe_engine.release(target.probe_spec)
+        self.add_service(service_item)
+        self.services[service_id].state = record.state
+
+    async def apply_change(self, change:dict):
+        """
+        change stream 이벤트 하나를 스케줄러와 Redis 캐시에 반영 (같은 이벤트를 다시 받아도 결과가 같다).
+        캐시도 맞춰 두어야 재시작 시 warm cache에서 삭제된 서비스가 되살아나지 않는다.
+        """
+        if change['operationType'] == 'delete':
+            record = self.services.get(change['documentKey']['_id'])
+            if record is not None:
+                self.remove_service(record._id)
+                ListPageCache().invalidate(record.chat_id)
+                await self.cache.remove_service({'_id': record._id, 'chat_id': record.chat_id})
+            return
+        service_item = change.get('fullDocument')
+        if service_item is None:
+            # update 직후 삭제된 문서: delete 이벤트가 따로 온다
+            return
+        self.update_service(service_item)
+        ListPageCache().invalidate(service_item['chat_id'])
+        await self.cache.put_service(service_item)
+
+    async def resync(self, batch_size:int=DB_BATCH_SIZE):
+        """change stream을 이어 받을 수 없을 때: 전체 서비스를 다시 읽어 추가 / 변경 / 삭제를 맞춘다"""
+        known, seen, batch = set(self.services), set(), list()
+        async for service_item in self.database.iter_all_services(SCHEDULE_PROJECTION, batch_size):
+            seen.add(service_item['_id'])
+            self.update_service(service_item)
+            batch.append(service_item)
+            if len(batch) >= batch_size:
+                await self.cache.put_services(batch)
+                batch = list()
+                await self.capacity.wait()
+        await self.cache.put_services(batch)
+        # resync 도중 /add로 추가된 서비스는 known에 없으므로 지우지 않는다
+        for service_id in known - seen:
+            record = self.services.get(service_id)
+            if record is not None:
+                self.remove_service(service_id)
+                ListPageCache().invalidate(record.chat_id)
+                await self.cache.remove_service({'_id': service_id, 'chat_id': record.chat_id})
+        print(f"Scheduler resynced: {len(seen)} services, {len(known - seen)} removed.")
+
+    def remove_service(self, service_id):
+        self.services.pop(service_id, None)
+        target, removed = self.registry.unsubscribe(service_id)
+        if removed:
+            self.scheduler.cancel(target.key)
+            self.policy.forget(target.key)
+            self.probe_engine.release(target.probe_spec)
+        self.result_writer.discard(service_id)
+
+    def scheduling_lag(self) -> dict:
+        return self.scheduler.lag_stats()
+
+    def target_stats(self) -> dict:
+        return self.registry.stats()
+
+    def start_background(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def run(self):
+        self.stopping = False
+        self.writer_task = asyncio.create_task(self.result_writer.run())
+        self.start_background(self.snapshot_loop())
+        if self.loaded:
+            self.start_background(self.listener.run())
+            await self.dispatch()
+            return
+        snapshot = await load_snapshot(self.snapshot_path)
+        await asyncio.gather(self.start_up(snapshot), self.dispatch())
+
+    async def start_up(self, snapshot:dict):
+        if snapshot is None:
+            self.start_background(self.listener.run())
+            await self.load()
+            return
+        await self.restore(snapshot)
+        if self.loaded:
+            # snapshot 이후의 변경은 snapshot의 resume token부터 받는다 (없거나 이어 받을 수 없으면 resync)
+            self.listener.resume_from(snapshot['resume_token'])
+            self.start_background(self.listener.run())
+
+    async def stop(self, timeout:float):
+        """
+        Graceful shutdown: stop dispatching, give in-flight checks up to timeout seconds to finish,
+        write a snapshot, flush every buffered result to Redis / MongoDB and close the HTTP probe clients.
+        """
+        self.stopping = True
+        self.capacity.set()
+        self.scheduler.wake()
+        if self.tasks:
+            _, not_done = await asyncio.wait(list(self.tasks), timeout=timeout)
+            if not_done:
+                print(f"{len(not_done)} checks still running at shutdown, their results are dropped.")
+        # snapshot의 resume token이 더 움직이지 않도록 listener부터 멈춘다
+        background = list(self.background)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        try:
+            await self.take_snapshot(clean=True)
+        except Exception as e:
+            print(f"Error writing scheduler snapshot: {e}")
+        if self.writer_task is not None:
+            self.result_writer.stop()
+            await self.writer_task
+            self.writer_task = None
+        await self.probe_engine.aclose()
+
+    async def dispatch(self):
+        while True:
+            await self.capacity.wait()
+            await self.scheduler.wait(MAX_SLEEP)
+            if self.stopping:
+                return
+            # 도래했지만 capacity를 넘는 대상은 큐에 남겨 두었다가 체크가 끝나는 대로 꺼낸다
+            for key, due in self.scheduler.pop_due(time.time(), MAX_PENDING - self.pending):
+                self.pending += 1
+                task = asyncio.create_task(self.check_target(key, due))
+                self.tasks.add(task)
+                task.add_done_callback(self._done)
+            if self.pending >= MAX_PENDING:
+                self.capacity.clear()
+
+    def _done(self, task):
+        self.tasks.discard(task)
+        self.pending -= 1
+        if self.pending < MAX_PENDING:
+            self.capacity.set()
+
+    async def check_target(self, key, due:float):
+        target = self.registry.targets.get(key)
+        if target is None:
+            return
+
+        probe_result = None
+        try:
+            probe_result = await self.policy.probe(key, target.probe_spec)
+        except Exception as e:
+            # 예상하지 못한 probe 오류도 실패 결과로 기록하고 대상은 계속 스케줄한다
+            print(f"Error probing {target.key}: {e!r}")
+            probe_result = ProbeResult(host=target.probe_spec['host'], port=target.probe_spec['port'], up=False,
+                                       reason="error", checked_at=datetime.now())
+        finally:
+            # 체크 도중 모든 구독이 삭제된 대상은 다시 등록하지 않는다
+            next_check_time = self.reschedule(target, due) if self.registry.targets.get(key) is target else None
+        if next_check_time is None or probe_result is None:
+            return
+
+        try:
+            await self.fan_out(target, probe_result, next_check_time)
+        except Exception as e:
+            print(f"Error recording the result of {target.key}: {e!r}")
+
+    def reschedule(self, target, due:float) -> datetime:
+        """
+        다음 주기의 위상 시각을 기준으로, jitter 범위 안에서 덜 붐비는 슬롯에 배치.
+        breaker가 열려 있으면 재시도 시각까지 미룬다
+        """
+        now = time.time()
+        scheduled = self.scheduler.place(next_due(target.key, target.interval, due, now),
+                                         jitter_bound(target.interval), earliest=now)
+        scheduled = max(scheduled, self.policy.retry_at(target.key) or 0)
+        target.due = scheduled
+        self.scheduler.schedule(target.key, scheduled)
+        return datetime.fromtimestamp(scheduled)
+
+    async def fan_out(self, target, probe_result, next_check_time:datetime):
+        """결과를 모든 구독 서비스에 반영"""
+        breaker = self.policy.breaker_document(target.key)
+        for service_id in list(target.subscribers):
+            # 알림을 보내는 동안 /remove된 서비스는 건너뛴다
+            record = self.services.get(service_id)
+            if record is None:
+                continue
+            self.result_writer.record_probe(service_id, probe_result)
+            extra_fields = dict()
+            if record.breaker != breaker:
+                if (record.breaker or dict()).get('until') != (breaker or dict()).get('until'):
+                    # /list에 backoff 상태가 보이므로 열리고 닫힐 때 페이지 캐시를 비운다
+                    ListPageCache().invalidate(record.chat_id)
+                record.breaker = extra_fields['breaker'] = breaker
+            transition = record.state.observe(probe_result)
+            if transition is None:
+                self.result_writer.touch(service_id, probe_result.checked_at, next_check_time, **extra_fields)
+                continue
+
+            fields = record.state.to_fields()
+            ListPageCache().invalidate(record.chat_id)
+            self.result_writer.add(service_id, fields.pop('status'), probe_result.checked_at, next_check_time,
+                                   **fields, **extra_fields)
+            if transition.notify:
+                await TelegramDispatcher().send(record.chat_id, transition.message(record.alias, record.target))
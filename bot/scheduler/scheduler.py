@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+
+from collections import Counter
+from metrics.metrics import SCHEDULER_LAG
+from scheduler.spread import SCHEDULE_SLOT_SECONDS
+
+# 예정 슬롯의 부하가 주변 최소 부하보다 이만큼 넘게 많을 때만 다른 슬롯으로 옮긴다 (불필요한 이동 방지)
+SCHEDULE_REBALANCE_TOLERANCE = int(os.getenv("SCHEDULE_REBALANCE_TOLERANCE", 1))
+
+
+class DeadlineScheduler:
+    """
+    In-memory deadline scheduler (min-heap keyed by next check time).
+    Times are epoch seconds. Cancelled or rescheduled keys are dropped lazily when they reach the head.
+    Queued entries are also counted per time slot so that place() can move a check into a quieter slot nearby.
+    """
+
+    def __init__(self, slot_seconds:float=SCHEDULE_SLOT_SECONDS):
+        self._heap = []  # (due, seq, key)
+        self._entries = dict()  # key -> seq of the live heap entry
+        self._due = dict()  # key -> due of the live heap entry
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.slot_seconds = slot_seconds
+        self._slot_load = Counter()  # slot -> 예정된 항목 수
+        self.rebalanced = 0
+
+        # scheduling lag (실제 실행 시각 - 예정 시각, 초)
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_avg = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, due:float):
+        """key를 due 시각에 실행되도록 등록 (이미 있으면 시간만 갱신)"""
+        head = self.next_due()
+        seq = next(self._seq)
+        self._release_slot(key)
+        self._entries[key] = seq
+        self._due[key] = due
+        self._slot_load[int(due // self.slot_seconds)] += 1
+        heapq.heappush(self._heap, (due, seq, key))
+        if head is None or due < head:
+            self._wakeup.set()
+
+    def cancel(self, key):
+        self._release_slot(key)
+        self._entries.pop(key, None)
+
+    def _release_slot(self, key):
+        due = self._due.pop(key, None)
+        if due is None:
+            return
+        slot = int(due // self.slot_seconds)
+        self._slot_load[slot] -= 1
+        if self._slot_load[slot] <= 0:
+            del self._slot_load[slot]
+
+    def place(self, due:float, spread:float, earliest:float=None) -> float:
+        """
+        due ± spread 범위에서 예정된 항목이 가장 적은 슬롯의 시각을 반환 (같으면 due에 가까운 슬롯).
+        due의 슬롯이 충분히 한가하면 due를 그대로 쓴다.
+        """
+        home = int(due // self.slot_seconds)
+        width = int(spread // self.slot_seconds)
+        home_load = self._slot_load.get(home, 0)
+        if width == 0 or home_load <= SCHEDULE_REBALANCE_TOLERANCE:
+            return due
+        lowest = None if earliest is None else int(earliest // self.slot_seconds)
+        best, best_load = home, home_load
+        for distance in range(1, width + 1):
+            for slot in (home - distance, home + distance):
+                if lowest is not None and slot < lowest:
+                    continue
+                load = self._slot_load.get(slot, 0)
+                if load < best_load:
+                    best, best_load = slot, load
+            if best_load == 0:
+                break
+        if home_load - best_load <= SCHEDULE_REBALANCE_TOLERANCE:
+            return due
+        self.rebalanced += 1
+        return (best + random.random()) * self.slot_seconds
+
+    def peak_slot_load(self) -> int:
+        return max(self._slot_load.values(), default=0)
+
+    def _drop_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now:float, limit:int=None) -> list:
+        """now까지 도래한 (key, due) 목록을 꺼낸다 (limit이 있으면 가장 이른 것부터 limit개까지)"""
+        due_list = list()
+        while limit is None or len(due_list) < limit:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            due, seq, key = heapq.heappop(self._heap)
+            self._release_slot(key)
+            del self._entries[key]
+            due_list.append((key, due))
+            self._record_lag(now - due)
+        return due_list
+
+    def _record_lag(self, lag:float):
+        SCHEDULER_LAG.observe(max(lag, 0.0))
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        self.lag_avg = self.lag_avg * 0.99 + lag * 0.01
+
+    def lag_stats(self) -> dict:
+        return {'last': self.lag_last, 'max': self.lag_max, 'avg': self.lag_avg, 'queued': len(self),
+                'peak_slot_load': self.peak_slot_load(), 'rebalanced': self.rebalanced}
+
+    def wake(self):
+        """wait() 중인 루프를 바로 깨운다 (종료 시)"""
+        self._wakeup.set()
+
+    async def wait(self, max_sleep:float):
+        """다음 예정 시각까지(또는 더 이른 항목이 등록될 때까지) 대기"""
+        next_due = self.next_due()
+        timeout = max_sleep if next_due is None else min(max(next_due - time.time(), 0), max_sleep)
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,106 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+
+from datetime import datetime
+from bson import ObjectId
+from scheduler.state_machine import STATE_FIELDS
+
+# 스케줄러 상태 snapshot (gzip JSON). 비워 두면 snapshot을 쓰지도 읽지도 않는다
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "state/scheduler-snapshot.json.gz")
+# 주기적 snapshot 간격(초). 종료할 때도 한 번 기록한다
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 300))
+# 이보다 오래된 snapshot은 무시하고 MongoDB에서 다시 읽는다
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", 24 * 3600))
+SNAPSHOT_VERSION = 1
+
+# 행마다 dict 대신 이 순서의 list로 저장 (필드 이름을 한 번만 기록)
+SNAPSHOT_FIELDS = ('_id', 'chat_id', 'alias', 'host', 'port', 'url', 'interval', 'probe_type', 'expect_status',
+                   'expect_body', 'next_check_time', 'breaker') + STATE_FIELDS
+DATETIME_FIELDS = ('next_check_time', 'state_since')
+
+
+def _epoch(value):
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+def _datetime(value):
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+def encode_service(service_item:dict) -> list:
+    """SCHEDULE_PROJECTION 형태의 서비스 문서를 JSON으로 쓸 수 있는 행으로 변환"""
+    row = [service_item.get(field) for field in SNAPSHOT_FIELDS]
+    row[0] = str(row[0])
+    for field in DATETIME_FIELDS:
+        index = SNAPSHOT_FIELDS.index(field)
+        row[index] = _epoch(row[index])
+    breaker = service_item.get('breaker')
+    if breaker:
+        row[SNAPSHOT_FIELDS.index('breaker')] = {**breaker, 'until': _epoch(breaker.get('until'))}
+    return row
+
+
+def decode_service(fields:list, row:list) -> dict:
+    service_item = dict(zip(fields, row))
+    service_item['_id'] = ObjectId(service_item['_id'])
+    for field in DATETIME_FIELDS:
+        service_item[field] = _datetime(service_item.get(field))
+    breaker = service_item.get('breaker')
+    if breaker:
+        breaker['until'] = _datetime(breaker.get('until'))
+    return service_item
+
+
+def iter_snapshot_services(snapshot:dict):
+    fields = snapshot['fields']
+    for row in snapshot['services']:
+        yield decode_service(fields, row)
+
+
+def snapshot_document(rows:list, resume_token, clean:bool) -> dict:
+    return {'version': SNAPSHOT_VERSION, 'taken_at': time.time(), 'clean': clean, 'resume_token': resume_token,
+            'fields': SNAPSHOT_FIELDS, 'services': rows}
+
+
+def write_snapshot(path:str, snapshot:dict):
+    """임시 파일에 쓴 뒤 교체하므로 쓰는 도중 종료되어도 이전 snapshot이 남는다"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    # json.dump로 gzip 파일에 바로 쓰면 작은 write가 많아 몇 배 느리다
+    data = json.dumps(snapshot, separators=(',', ':')).encode()
+    with open(temp_path, 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=5))
+    os.replace(temp_path, path)
+
+
+def read_snapshot(path:str, max_age:float=SNAPSHOT_MAX_AGE) -> dict:
+    """쓸 수 있는 snapshot이 없으면 (없음 / 손상 / 버전 다름 / 너무 오래됨) None"""
+    try:
+        with gzip.open(path, 'rt') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Ignoring unreadable scheduler snapshot {path}: {e}")
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    age = time.time() - snapshot['taken_at']
+    if age > max_age:
+        print(f"Ignoring scheduler snapshot taken {age:.0f}s ago.")
+        return None
+    return snapshot
+
+
+async def save_snapshot(path:str, snapshot:dict):
+    # JSON 직렬화와 압축은 thread에서 (loop를 막지 않도록)
+    await asyncio.to_thread(write_snapshot, path, snapshot)
+
+
+async def load_snapshot(path:str) -> dict:
+    if not path:
+        return None
+    return await asyncio.to_thread(read_snapshot, path)
@@ -0,0 +1,38 @@
+import os
+import random
+import zlib
+
+# 같은 interval의 대상들이 같은 시각에 몰리지 않도록 대상마다 고정된 위상(phase)에 체크한다
+# jitter는 interval * SCHEDULE_JITTER_RATIO (최대 SCHEDULE_JITTER_MAX초) 안에서만 움직인다
+SCHEDULE_JITTER_RATIO = float(os.getenv("SCHEDULE_JITTER_RATIO", 0.05))
+SCHEDULE_JITTER_MAX = float(os.getenv("SCHEDULE_JITTER_MAX", 15))
+# 부하 분산에 쓰는 시간 슬롯 크기(초)
+SCHEDULE_SLOT_SECONDS = float(os.getenv("SCHEDULE_SLOT_SECONDS", 1))
+
+
+def phase_offset(key, interval:float) -> float:
+    """대상 key로 정해지는 [0, interval) 범위의 위상. 프로세스가 바뀌어도 같은 값 (hash()는 실행마다 달라짐)"""
+    return zlib.crc32(repr(key).encode()) % int(interval * 1000) / 1000
+
+
+def jitter_bound(interval:float) -> float:
+    return min(interval * SCHEDULE_JITTER_RATIO, SCHEDULE_JITTER_MAX)
+
+
+def aligned_due(key, interval:float, after:float) -> float:
+    """after 이후 처음 오는 phase + n * interval 시각"""
+    return after + (phase_offset(key, interval) - after) % interval
+
+
+def next_due(key, interval:float, due:float, now:float) -> float:
+    """
+    방금 체크한 due 다음 주기의 위상 시각. 밀린 경우에는 현재 시각 기준으로 다음 위상을 잡는다.
+    (due + interval/2 이후의 첫 위상 = 다음 주기, jitter로 앞뒤로 움직인 만큼은 여기서 흡수)
+    """
+    return aligned_due(key, interval, max(due, now) + interval / 2)
+
+
+def spread_due(key, interval:float, due:float, now:float) -> float:
+    """next_due에 bounded jitter를 더한 값 (부하 정보가 없는 lease worker용)"""
+    bound = jitter_bound(interval)
+    return next_due(key, interval, due, now) + random.uniform(-bound, bound)
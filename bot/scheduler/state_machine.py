@@ -0,0 +1,132 @@
+import os
+
+from datetime import datetime
+
+# 최근 CHECK_WINDOW번의 체크 중 FAIL_THRESHOLD번 이상 실패하면 down (N-of-M)
+CHECK_WINDOW = int(os.getenv("CHECK_WINDOW", 3))
+FAIL_THRESHOLD = int(os.getenv("FAIL_THRESHOLD", 2))
+# down/degraded에서 up으로 돌아오려면 연속 RECOVER_THRESHOLD번 정상이어야 한다 (hysteresis)
+RECOVER_THRESHOLD = int(os.getenv("RECOVER_THRESHOLD", 2))
+# 응답은 있지만 latency(ms)가 이 값보다 크면 slow. slow+실패가 FAIL_THRESHOLD 이상이면 degraded (0이면 사용 안 함)
+DEGRADED_LATENCY = float(os.getenv("DEGRADED_LATENCY", 0))
+# FLAP_WINDOW초 안에 상태 전환이 FLAP_THRESHOLD번 이상이면 flapping으로 보고 알림을 멈춘다
+FLAP_WINDOW = int(os.getenv("FLAP_WINDOW", 3600))
+FLAP_THRESHOLD = int(os.getenv("FLAP_THRESHOLD", 4))
+
+# check_window에 저장하는 결과 코드
+OK, SLOW, FAIL = "u", "s", "f"
+
+# 문서에 저장되는 상태 필드 (lease 모드에서는 worker 간에 상태를 넘기기 위해 매번 저장)
+STATE_FIELDS = ('status', 'reason', 'state_since', 'flapping', 'check_window', 'consecutive_ok', 'transitions')
+
+
+class Transition:
+    """A state change of one service that should be persisted and (unless suppressed) notified."""
+    __slots__ = ('previous', 'current', 'reason', 'notify', 'flapping')
+
+    def __init__(self, previous:str, current:str, reason:str, notify:bool, flapping:bool):
+        self.previous = previous
+        self.current = current
+        self.reason = reason
+        self.notify = notify
+        self.flapping = flapping
+
+    def message(self, alias:str, target:str) -> str:
+        name = f"{alias} ({target})"
+        if self.flapping:
+            return f"[FLAPPING] {name} is changing state too often, alerts paused. Last state: {self.current.upper()}"
+        if self.previous == "flapping":
+            return f"[STABLE] {name} stopped flapping, now {self.current.upper()}"
+        if self.current == "up":
+            return f"[UP] {name} recovered (was {self.previous})"
+        return f"[{self.current.upper()}] {name} - {self.reason}"
+
+
+class ServiceState:
+    """
+    Per-service state machine: init -> up / down / degraded.
+    Keeps the result window in memory; only transitions are returned to the caller.
+    """
+    __slots__ = STATE_FIELDS
+
+    def __init__(self, status:str="init", reason:str=None, state_since:datetime=None, flapping:bool=False,
+                 check_window:str="", consecutive_ok:int=0, transitions:list=None):
+        self.status = status
+        self.reason = reason
+        self.state_since = state_since
+        self.flapping = flapping
+        self.check_window = check_window
+        self.consecutive_ok = consecutive_ok
+        self.transitions = transitions or list()  # 최근 상태 전환 시각 (epoch)
+
+    @classmethod
+    def from_document(cls, service_item:dict):
+        status = service_item.get('status', 'init')
+        if status not in ("up", "down", "degraded"):
+            # 이전 버전은 실패 사유를 status에 저장했다
+            status = "init"
+        return cls(status=status, reason=service_item.get('reason'), state_since=service_item.get('state_since'),
+                   flapping=service_item.get('flapping', False), check_window=service_item.get('check_window', ""),
+                   consecutive_ok=service_item.get('consecutive_ok', 0),
+                   transitions=service_item.get('transitions'))
+
+    def to_fields(self) -> dict:
+        return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    def _classify(self, probe_result) -> str:
+        if not probe_result.up:
+            return FAIL
+        if DEGRADED_LATENCY and probe_result.latency is not None and probe_result.latency > DEGRADED_LATENCY:
+            return SLOW
+        return OK
+
+    def _evaluate(self, code:str) -> str:
+        failures = self.check_window.count(FAIL)
+        slow = self.check_window.count(SLOW)
+        if self.status == "init":
+            # 첫 결과는 threshold 없이 바로 반영
+            return {OK: "up", SLOW: "degraded", FAIL: "down"}[code]
+        if failures >= FAIL_THRESHOLD:
+            return "down"
+        if failures + slow >= FAIL_THRESHOLD:
+            return "degraded"
+        if self.status != "up" and self.consecutive_ok < RECOVER_THRESHOLD:
+            return self.status
+        return "up"
+
+    def observe(self, probe_result) -> Transition:
+        """체크 결과를 반영하고 상태가 바뀌었으면 Transition, 아니면 None을 반환"""
+        code = self._classify(probe_result)
+        self.check_window = (self.check_window + code)[-CHECK_WINDOW:]
+        self.consecutive_ok = self.consecutive_ok + 1 if code == OK else 0
+        if code == FAIL:
+            self.reason = probe_result.reason
+        elif code == SLOW:
+            self.reason = f"slow ({probe_result.latency:.0f}ms)"
+
+        now = probe_result.checked_at.timestamp()
+        self.transitions = [ts for ts in self.transitions if now - ts < FLAP_WINDOW]
+        status = self._evaluate(code)
+
+        if status == self.status:
+            # 전환이 줄어들면 flapping 해제 (해제 기준을 낮게 두어 경계에서 반복되지 않도록)
+            if self.flapping and len(self.transitions) <= FLAP_THRESHOLD // 2:
+                self.flapping = False
+                return Transition("flapping", status, self.reason, notify=True, flapping=False)
+            return None
+
+        previous, first_result = self.status, self.status == "init"
+        self.status = status
+        self.state_since = probe_result.checked_at
+        if not first_result:
+            self.transitions.append(now)
+        if status == "up":
+            self.reason = None
+
+        if self.flapping:
+            return Transition(previous, status, self.reason, notify=False, flapping=True)
+        if len(self.transitions) >= FLAP_THRESHOLD:
+            self.flapping = True
+            return Transition(previous, status, self.reason, notify=True, flapping=True)
+        # 새 서비스의 첫 결과가 up이면 알리지 않는다
+        return Transition(previous, status, self.reason, notify=not (first_result and status == "up"), flapping=False)
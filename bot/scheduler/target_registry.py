@@ -0,0 +1,77 @@
+def target_key(service_item:dict) -> tuple:
+    """
+    Canonical probe target of a service.
+    tcp: (tcp, host, port). http(s): 검사 조건이 같아야 결과를 공유할 수 있으므로 URL과 조건까지 포함.
+    """
+    probe_type = service_item.get('probe_type', 'tcp')
+    if probe_type in ('http', 'https'):
+        return (probe_type, service_item['url'], service_item.get('expect_status'), service_item.get('expect_body'))
+    return (probe_type, service_item['host'], service_item['port'])
+
+
+def target_label(service_item:dict) -> str:
+    """알림과 /list에 보여 주는 대상 표기"""
+    return service_item.get('url') or f"{service_item['host']}:{service_item['port']}"
+
+
+class Target:
+    """One probe job shared by every service (subscription) that monitors the same target."""
+    __slots__ = ('key', 'probe_spec', 'subscribers', 'interval', 'due')
+
+    def __init__(self, key:tuple, service_item:dict):
+        self.key = key
+        self.probe_spec = {field: service_item.get(field)
+                           for field in ('host', 'port', 'probe_type', 'url', 'expect_status', 'expect_body')}
+        self.subscribers = dict()  # service _id -> interval
+        self.interval = None
+        self.due = None  # 다음 체크 시각 (epoch)
+
+    @property
+    def refcount(self) -> int:
+        return len(self.subscribers)
+
+    def update_interval(self):
+        self.interval = min(self.subscribers.values()) if self.subscribers else None
+
+
+class TargetRegistry:
+    """Reference-counted map of unique probe targets, maintained on /add and /remove."""
+
+    def __init__(self):
+        self.targets = dict()  # key -> Target
+        self.service_targets = dict()  # service _id -> key
+
+    def __len__(self):
+        return len(self.targets)
+
+    def subscribe(self, service_item:dict):
+        """(target, created) 반환. 같은 대상이 이미 있으면 구독만 추가"""
+        service_id = service_item['_id']
+        key = target_key(service_item)
+        if self.service_targets.get(service_id) not in (None, key):
+            self.unsubscribe(service_id)
+
+        target = self.targets.get(key)
+        created = target is None
+        if created:
+            target = self.targets[key] = Target(key, service_item)
+        target.subscribers[service_id] = service_item['interval']
+        target.update_interval()
+        self.service_targets[service_id] = key
+        return target, created
+
+    def unsubscribe(self, service_id):
+        """(target, removed) 반환. 마지막 구독이 빠지면 대상도 제거"""
+        key = self.service_targets.pop(service_id, None)
+        if key is None:
+            return None, False
+        target = self.targets[key]
+        target.subscribers.pop(service_id, None)
+        if target.refcount == 0:
+            del self.targets[key]
+            return target, True
+        target.update_interval()
+        return target, False
+
+    def stats(self) -> dict:
+        return {'targets': len(self.targets), 'subscriptions': len(self.service_targets)}
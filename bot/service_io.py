@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+
+from datetime import datetime
+from urllib.parse import urlparse
+from model.service_model import ServiceDataModel
+
+# /export, /import 공통 컬럼 (status는 export 전용, import 시 무시)
+EXPORT_FIELDS = ('alias', 'host', 'port', 'interval', 'url', 'expect_status', 'expect_body', 'status')
+
+
+def detect_format(file_name:str, data:bytes) -> str:
+    """확장자로 판단하고, 없으면 첫 글자로 판단 (csv / json / jsonl)"""
+    extension = (file_name or "").rsplit('.', 1)[-1].lower()
+    if extension in ('csv', 'json', 'jsonl', 'ndjson'):
+        return 'jsonl' if extension == 'ndjson' else extension
+    head = data.lstrip()[:1]
+    return {b'[': 'json', b'{': 'jsonl'}.get(head, 'csv')
+
+
+def parse_rows(data:bytes, file_name:str=None):
+    """
+    Yield (row number, row dict, error message) from an uploaded CSV, JSON array or JSON lines document.
+    CSV and JSON lines are parsed row by row; a bad row does not stop the rest of the file.
+    """
+    text = data.decode('utf-8-sig', errors='replace')
+    file_format = detect_format(file_name, data)
+    if file_format == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            yield reader.line_num, {key.strip().lower(): value.strip() for key, value in row.items()
+                                    if key is not None and value is not None}, None
+    elif file_format == 'jsonl':
+        for row_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_no, None, f"invalid JSON ({e.msg})"
+                continue
+            yield (row_no, row, None) if isinstance(row, dict) else (row_no, None, "not an object")
+    else:
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            yield e.lineno, None, f"invalid JSON ({e.msg})"
+            return
+        if not isinstance(rows, list):
+            yield 1, None, "expected a JSON array of objects"
+            return
+        for row_no, row in enumerate(rows, 1):
+            yield (row_no, row, None) if isinstance(row, dict) else (row_no, None, "not an object")
+
+
+def row_to_model(chat_id:str, row:dict, default_interval:int) -> ServiceDataModel:
+    """/add와 같은 규칙으로 한 행을 ServiceDataModel로 변환 (ValueError / ValidationError 발생 가능)"""
+    url = row.get('url') or None
+    probe_type, host, port = "tcp", row.get('host') or None, row.get('port') or None
+    if url is not None:
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ('http', 'https') or not parsed_url.hostname:
+            raise ValueError(f"invalid url {url}")
+        probe_type = parsed_url.scheme
+        host = parsed_url.hostname
+        port = parsed_url.port or (443 if probe_type == "https" else 80)
+    elif host is None or port is None:
+        raise ValueError("host and port (or url) are required")
+
+    datetime_now = datetime.now()
+    return ServiceDataModel(chat_id=chat_id, host=host, port=port, interval=row.get('interval') or default_interval,
+                            alias=row.get('alias') or url or f"{host}/{port}", status='init',
+                            next_check_time=datetime_now, last_check_time=datetime_now,
+                            probe_type=probe_type, url=url, expect_status=row.get('expect_status') or None,
+                            expect_body=row.get('expect_body') or None)
+
+
+def format_error(error:Exception) -> str:
+    if hasattr(error, 'errors'):
+        # pydantic ValidationError: 첫 번째 필드 오류만
+        detail = error.errors()[0]
+        return f"{'.'.join(str(loc) for loc in detail['loc'])}: {detail['msg']}"
+    return str(error)
+
+
+def errors_csv(errors:list) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(('row', 'error'))
+    writer.writerows(errors)
+    return output.getvalue().encode()
+
+
+async def write_export(services, file_format:str) -> bytes:
+    """services(async iterator)를 읽는 대로 CSV 또는 JSON lines로 기록"""
+    output = io.StringIO()
+    if file_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        async for service_item in services:
+            writer.writerow({field: service_item.get(field) for field in EXPORT_FIELDS})
+    else:
+        async for service_item in services:
+            output.write(json.dumps({field: service_item.get(field) for field in EXPORT_FIELDS}) + "\n")
+    return output.getvalue().encode()
@@ -1,4 +1,38 @@
+import asyncio
+import collections
+import errno
+import ipaddress
+import os
 import socket
+import ssl
+import time
+import httpx
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from datetime import datetime
+from model.probe_model import ProbeResult
+from metrics.metrics import PROBE_LATENCY, PROBES_IN_FLIGHT, probe_result_label
+
+# 동시에 실행할 수 있는 최대 체크 개수와 체크별 타임아웃(초)
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 500))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", 1))
+
+UNREACHABLE_ERRNOS = (errno.EHOSTUNREACH, errno.ENETUNREACH, errno.EHOSTDOWN)
+
+# DNS 캐시: record TTL을 [DNS_MIN_TTL, DNS_MAX_TTL]로 제한, 실패한 조회는 DNS_NEGATIVE_TTL 동안 캐시
+DNS_MIN_TTL = int(os.getenv("DNS_MIN_TTL", 30))
+DNS_MAX_TTL = int(os.getenv("DNS_MAX_TTL", 3600))
+DNS_DEFAULT_TTL = int(os.getenv("DNS_DEFAULT_TTL", 300))  # TTL을 알 수 없는 getaddrinfo 결과
+DNS_NEGATIVE_TTL = int(os.getenv("DNS_NEGATIVE_TTL", 60))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", 2))
+
+# HTTP(S) probe: origin별 keep-alive 연결 수와 유지 시간(초), 본문 검사 시 읽을 최대 크기
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 4))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 600))
+HTTP_MAX_BODY = int(os.getenv("HTTP_MAX_BODY", 64 * 1024))
+
 
 def service_check(host:str, port:int) -> bool:
     # if type == "http" or type == "https":
@@ -12,11 +46,349 @@ def service_check(host:str, port:int) -> bool:
             return True
         except (socket.timeout, socket.error):
             return False
-        
+
+
+class DNSCache:
+    """
+    Async DNS cache for probe targets.
+    TTL-based expiry, negative caching of failed lookups and single-flight lookups
+    (concurrent resolves of the same name share one query).
+    """
+
+    def __init__(self, min_ttl:int=DNS_MIN_TTL, max_ttl:int=DNS_MAX_TTL, default_ttl:int=DNS_DEFAULT_TTL,
+                 negative_ttl:int=DNS_NEGATIVE_TTL, timeout:float=DNS_TIMEOUT):
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.entries = dict()  # host -> (expires, addresses), addresses가 None이면 negative entry
+        self.pending = dict()  # host -> Future (진행 중인 조회)
+        try:
+            self.resolver = dns.asyncresolver.Resolver()
+        except dns.resolver.NoResolverConfiguration:
+            self.resolver = None
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {'entries': len(self.entries), 'hits': self.hits, 'negative_hits': self.negative_hits,
+                'misses': self.misses, 'coalesced': self.coalesced}
+
+    async def resolve(self, host:str) -> list:
+        """host의 주소 목록을 반환. 조회 실패 시 socket.gaierror"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        entry = self.entries.get(host)
+        if entry is not None and entry[0] > time.monotonic():
+            if entry[1] is None:
+                self.negative_hits += 1
+                raise socket.gaierror(socket.EAI_NONAME, f"{host} (cached)")
+            self.hits += 1
+            return entry[1]
+
+        future = self.pending.get(host)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # 기다리는 쪽이 없을 때 'exception was never retrieved' 경고 방지
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.pending[host] = future
+        try:
+            addresses, ttl = await self._lookup(host)
+        except socket.gaierror as e:
+            self.entries[host] = (time.monotonic() + self.negative_ttl, None)
+            future.set_exception(e)
+            raise
+        except BaseException as e:
+            # timeout 등 일시적인 실패는 캐시하지 않는다
+            if isinstance(e, Exception):
+                future.set_exception(e)
+            else:
+                future.cancel()
+            raise
+        else:
+            self.entries[host] = (time.monotonic() + ttl, addresses)
+            future.set_result(addresses)
+            return addresses
+        finally:
+            del self.pending[host]
+
+    async def _lookup(self, host:str):
+        """(addresses, ttl). TTL은 DNS 응답에서, /etc/hosts 등 DNS가 아닌 이름은 getaddrinfo로 조회"""
+        if self.resolver is not None:
+            try:
+                answer = await self.resolver.resolve(host, 'A', lifetime=self.timeout)
+                ttl = min(max(answer.rrset.ttl, self.min_ttl), self.max_ttl)
+                return [record.address for record in answer], ttl
+            except dns.exception.Timeout:
+                raise asyncio.TimeoutError(f"DNS lookup timed out: {host}")
+            except dns.exception.DNSException:
+                pass
+
+        infos = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM), self.timeout)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        return addresses, self.default_ttl
+
+
+async def async_service_check(host:str, port:int, timeout:float=PROBE_TIMEOUT, address:str=None) -> ProbeResult:
+    """
+    Non-blocking TCP connect check.
+    Returns the connect latency on success and the failure reason otherwise.
+    address: 미리 조회한 IP (없으면 host를 그대로 사용)
+    """
+    loop = asyncio.get_running_loop()
+    checked_at = datetime.now()
+    started = time.perf_counter()
+    reason = "ok"
+    try:
+        transport, _ = await asyncio.wait_for(
+            loop.create_connection(asyncio.Protocol, address or host, port), timeout)
+    except asyncio.TimeoutError:
+        reason = "timeout"
+    except socket.gaierror:
+        reason = "dns"
+    except ConnectionRefusedError:
+        reason = "refused"
+    except OSError as e:
+        reason = "unreachable" if e.errno in UNREACHABLE_ERRNOS else "error"
+    except (OverflowError, ValueError):
+        # 0-65535 범위를 벗어난 port 등 잘못된 대상
+        reason = "error"
+    else:
+        latency = (time.perf_counter() - started) * 1000
+        transport.close()
+        return ProbeResult(host=host, port=port, up=True, latency=latency, reason=reason,
+                           checked_at=checked_at)
+
+    return ProbeResult(host=host, port=port, up=False, reason=reason, checked_at=checked_at)
+
+
+def _exception_chain(exception:BaseException) -> list:
+    """httpx/anyio가 감싼 원래 예외까지 (__cause__, __context__) 모두 펼친다"""
+    chain, stack = list(), [exception]
+    while stack:
+        current = stack.pop()
+        if current is None or any(current is seen for seen in chain):
+            continue
+        chain.append(current)
+        stack += [current.__cause__, current.__context__]
+    return chain
+
+
+class HTTPProbe:
+    """
+    HTTP(S) checks with one keep-alive pooled client per origin, so frequent checks of the
+    same origin reuse connections instead of re-handshaking.
+    Origins of scheduled targets are reference-counted (retain / release) and their client is closed with
+    the last target; clients of origins nobody retains (lease workers) are closed once idle past keepalive_expiry.
+    """
+
+    def __init__(self, timeout:float=PROBE_TIMEOUT, pool_size:int=HTTP_POOL_SIZE,
+                 keepalive_expiry:float=HTTP_KEEPALIVE_EXPIRY):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self.clients = dict()  # origin -> httpx.AsyncClient
+        self.last_used = dict()  # origin -> 마지막 체크 시각 (monotonic)
+        self.origin_refs = collections.Counter()  # origin -> 이 origin을 쓰는 대상 수
+        self.next_sweep = time.monotonic() + keepalive_expiry
+        self.closing = set()  # 닫는 중인 client의 aclose task
+
+    @staticmethod
+    def _origin(request_url:httpx.URL) -> str:
+        port = request_url.port or (443 if request_url.scheme == "https" else 80)
+        return f"{request_url.scheme}://{request_url.host}:{port}"
+
+    def _client(self, origin:str) -> httpx.AsyncClient:
+        client = self.clients.get(origin)
+        if client is None:
+            client = self.clients[origin] = httpx.AsyncClient(
+                timeout=self.timeout, follow_redirects=False,
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size,
+                                    keepalive_expiry=self.keepalive_expiry))
+        now = time.monotonic()
+        self.last_used[origin] = now
+        if now >= self.next_sweep:
+            self.next_sweep = now + self.keepalive_expiry
+            for idle_origin, used in list(self.last_used.items()):
+                if now - used > self.keepalive_expiry and not self.origin_refs[idle_origin]:
+                    self._close(idle_origin)
+        return client
+
+    def _close(self, origin:str):
+        self.last_used.pop(origin, None)
+        client = self.clients.pop(origin, None)
+        if client is not None:
+            task = asyncio.get_running_loop().create_task(client.aclose())
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+
+    def retain(self, url:str):
+        """스케줄에 대상이 추가될 때 호출"""
+        try:
+            self.origin_refs[self._origin(httpx.URL(url))] += 1
+        except httpx.InvalidURL:
+            pass
+
+    def release(self, url:str):
+        """대상이 빠질 때 호출. origin을 쓰는 마지막 대상이면 client와 keep-alive 연결을 닫는다"""
+        try:
+            origin = self._origin(httpx.URL(url))
+        except httpx.InvalidURL:
+            return
+        self.origin_refs[origin] -= 1
+        if self.origin_refs[origin] <= 0:
+            del self.origin_refs[origin]
+            self._close(origin)
+
+    async def aclose(self):
+        clients, self.clients = self.clients, dict()
+        self.last_used.clear()
+        await asyncio.gather(*(client.aclose() for client in clients.values()), *self.closing,
+                             return_exceptions=True)
+
+    async def check(self, url:str, expect_status:int=None, expect_body:str=None) -> ProbeResult:
+        checked_at = datetime.now()
+        timings = dict()
+
+        async def trace(event_name, info):
+            timings[event_name] = time.perf_counter()
+
+        started = time.perf_counter()
+        host, port, status_code = url, None, None
+        try:
+            request_url = httpx.URL(url)
+            host = request_url.host
+            port = request_url.port or (443 if request_url.scheme == "https" else 80)
+            client = self._client(self._origin(request_url))
+            async with client.stream("GET", request_url, extensions={"trace": trace}) as response:
+                status_code = response.status_code
+                body_found = expect_body is None
+                # keep-alive 재사용을 위해 본문을 끝까지 읽는다 (HTTP_MAX_BODY까지만)
+                received, read_size = b"", 0
+                async for chunk in response.aiter_bytes():
+                    if not body_found:
+                        received = (received + chunk)[-HTTP_MAX_BODY:]
+                        body_found = expect_body.encode() in received
+                    read_size += len(chunk)
+                    if read_size >= HTTP_MAX_BODY:
+                        break
+            latency = (time.perf_counter() - started) * 1000
+        except httpx.TimeoutException:
+            reason = "timeout"
+        except httpx.ConnectError as e:
+            causes = _exception_chain(e)
+            if any(isinstance(cause, socket.gaierror) for cause in causes):
+                reason = "dns"
+            elif any(isinstance(cause, ssl.SSLError) for cause in causes):
+                reason = "tls"
+            elif any(isinstance(cause, ConnectionRefusedError) for cause in causes):
+                reason = "refused"
+            else:
+                reason = "unreachable"
+        except (httpx.HTTPError, httpx.InvalidURL):
+            # InvalidURL: 저장된 URL을 해석할 수 없음 (예: http://[::1)
+            reason = "error"
+        else:
+            tls_latency = None
+            if "connection.start_tls.complete" in timings and "connection.start_tls.started" in timings:
+                tls_latency = (timings["connection.start_tls.complete"] - timings["connection.start_tls.started"]) * 1000
+
+            if expect_status is not None:
+                status_ok = status_code == expect_status
+            else:
+                status_ok = 200 <= status_code < 400
+            if not status_ok:
+                reason = f"http {status_code}"
+            elif not body_found:
+                reason = "body"
+            else:
+                reason = "ok"
+            return ProbeResult(host=host, port=port, up=reason == "ok", latency=latency, reason=reason,
+                               checked_at=checked_at, status_code=status_code, tls_latency=tls_latency)
+
+        return ProbeResult(host=host, port=port, up=False, reason=reason, checked_at=checked_at,
+                           status_code=status_code)
+
+
+class ProbeEngine:
+    """Run many service checks concurrently on the event loop with a global concurrency limit."""
+
+    def __init__(self, concurrency:int=PROBE_CONCURRENCY, timeout:float=PROBE_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.dns_cache = DNSCache()
+        self.http_probe = HTTPProbe(timeout)
+        self.in_flight = 0
+        PROBES_IN_FLIGHT.set_function(lambda: self.in_flight)
+
+    def retain(self, service_item:dict):
+        """스케줄에 추가된 대상 (HTTP(S)면 origin의 client를 대상이 남아 있는 동안 유지)"""
+        if service_item.get('probe_type', 'tcp') in ('http', 'https'):
+            self.http_probe.retain(service_item['url'])
+
+    def release(self, service_item:dict):
+        if service_item.get('probe_type', 'tcp') in ('http', 'https'):
+            self.http_probe.release(service_item['url'])
+
+    async def aclose(self):
+        await self.http_probe.aclose()
+
+    async def probe_service(self, service_item:dict) -> ProbeResult:
+        """서비스 문서의 probe_type에 맞는 체크를 실행"""
+        if service_item.get('probe_type', 'tcp') in ('http', 'https'):
+            async with self.semaphore:
+                self.in_flight += 1
+                started = time.perf_counter()
+                try:
+                    probe_result = await self.http_probe.check(service_item['url'], service_item.get('expect_status'),
+                                                               service_item.get('expect_body'))
+                finally:
+                    self.in_flight -= 1
+            PROBE_LATENCY.labels(probe_result_label(probe_result.reason)).observe(time.perf_counter() - started)
+            return probe_result
+        return await self.probe(service_item['host'], service_item['port'])
+
+    async def probe(self, host:str, port:int) -> ProbeResult:
+        async with self.semaphore:
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                try:
+                    addresses = await self.dns_cache.resolve(host)
+                except (socket.gaierror, asyncio.TimeoutError):
+                    probe_result = ProbeResult(host=host, port=port, up=False, reason="dns", checked_at=datetime.now())
+                else:
+                    probe_result = await async_service_check(host, port, self.timeout, addresses[0])
+            finally:
+                self.in_flight -= 1
+        PROBE_LATENCY.labels(probe_result_label(probe_result.reason)).observe(time.perf_counter() - started)
+        return probe_result
+
+    async def probe_many(self, targets:list) -> list:
+        """targets: (host, port) 튜플 리스트. 결과는 입력 순서대로 반환"""
+        return await asyncio.gather(*(self.probe(host, port) for host, port in targets))
+
+
 def alive_check(host:str="localhost", port:int=8080) -> bool:
-    return service_check(host, port, "tcp" )
+    return service_check(host, port)
 
 if __name__ == "__main__":
     print(alive_check())
     print(service_check("127.0.0.1", 443))
-    print(service_check("proxy2.wynd.network", 4444))
\ No newline at end of file
+    print(service_check("proxy2.wynd.network", 4444))
+    print(asyncio.run(async_service_check("127.0.0.1", 443)))
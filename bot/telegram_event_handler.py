@@ -1,18 +1,29 @@
 import asyncio
-import httpx
 import redis.asyncio as aioredis
 import os
 import threading
 import prettytable as pt
 
-import tracemalloc
 from datetime import datetime, timedelta
-from socket_test import service_check, alive_check
-from database.database import Database
+from urllib.parse import urlparse
+from database.database import Database, host_limit
+from database.probe_history import ProbeHistory
+from database.service_cache import ServiceCache
+from scheduler.monitor import Monitor
+from scheduler.lease_worker import SCHEDULER_MODE, SHUTDOWN_TIMEOUT
+from notification.telegram_dispatcher import TelegramDispatcher
+from metrics.http_server import HealthServer
+from metrics.metrics import observe_handler
+from metrics.profiler import PROFILE_SECONDS, Profiler, is_admin
 from model.service_model import ServiceModel, ServiceDataModel
-from telegram import ReplyKeyboardMarkup, Update, LabeledPrice
+from view.list_page_cache import LIST_PAGE_SIZE, ListPageCache
+from bson import ObjectId
+from pydantic import ValidationError
+from service_io import EXPORT_FIELDS, errors_csv, format_error, parse_rows, row_to_model, write_export
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, Update, LabeledPrice
 from telegram.constants import ParseMode
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackContext, Updater, PreCheckoutQueryHandler
+from telegram.error import BadRequest
+from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters, CallbackContext, Updater, PreCheckoutQueryHandler
 
 
 # 텔레그램 봇 API 토큰과 채팅 ID 설정
@@ -21,59 +32,22 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 PAYMENT_PROVIDER_TOKEN = os.getenv('YOUR_PAYMENT_PROVIDER_TOKEN')  # 예: Stripe 토큰
 
 INTERVAL = 5 * 60
+IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', 5 * 1024 * 1024))
+IMPORT_BATCH_SIZE = 500
+IMPORT_ERROR_LINES = 20  # 이보다 많으면 오류 목록을 파일로 전송
 
-async def send_telegram_message(message):
+async def send_telegram_message(message, chat_id=TELEGRAM_CHAT_ID):
     """
-    텔레그램으로 메시지를 전송하는 비동기 함수
+    텔레그램으로 메시지를 전송하는 비동기 함수 (TelegramDispatcher 큐를 통해 전송)
     """
-    url = f'https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage'
-    payload = {
-        'chat_id': TELEGRAM_CHAT_ID,
-        'text': message
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()  # 요청 오류가 있는 경우 예외 발생
-            print(f"Message sent: {message}")
-        except httpx.HTTPStatusError as e:
-            print(f"Failed to send message: {e}")
+    await TelegramDispatcher().send(chat_id, message)
 
 
 
 async def greet_every_interval():
-
-    event_occurred = True  # 실제 이벤트 조건에 따라 설정
-    database = Database()
-    # 예시 이벤트 로직
-    while True:
-        if event_occurred:
-            datetime_now = datetime.now()
-            services_list = await database.get_services_by_time(datetime_now)
-            datetime_now_isoformat = datetime_now.isoformat()
-            if services_list is not None:
-                for service_item in services_list:
-                    # print(service_item['host'], service_item['port'], flush=True)
-                    service_check(service_item['host'], service_item['port'])
-                    datetime_add_timedelta = datetime_now + timedelta(seconds=service_item['interval'])
-                    datetime_add_timedelta_isoformat = datetime_add_timedelta.isoformat()
-
-                    service_model = ServiceDataModel(chat_id=service_item['chat_id'],
-                                                host=service_item['host'], port=service_item['port'], 
-                                                alias=service_item['alias'],
-                                                next_check_time=datetime_now_isoformat,
-                                                last_check_time=datetime_add_timedelta_isoformat,
-                                                interval=service_item['interval'], status="init" )
-
-                    ### Redis Key?를 시간 tick으로 갈것인지 chat_id로 갈것인지... 고민중...
-                    await database.update_service_data(service_model.chat_id, service_model)
-
-        #     # 이벤트 발생 시 텔레그램으로 메시지 전송
-        #     await send_telegram_message("An event has occurred!")
-        #     event_occurred = False
-        # else:
-        #     await send_telegram_message("An event has not occurred!")
-        await asyncio.sleep(INTERVAL)
+    """서비스별 interval에 맞춰 체크를 실행 (Monitor 스케줄러 루프)"""
+    # run()이 로딩과 dispatch를 함께 실행 (첫 batch부터 체크 시작)
+    await Monitor().run()
 
 async def run_async_tasks():
     """비동기 작업 실행"""
@@ -85,12 +59,30 @@ async def run_async_tasks():
 
 
     # # Initialize connections asynchronously
-    await database.initialize_service_connections()
-    await database.initialize_user_connections()
+    await database.initialize_connection()
+    await database.initialize_redis_connection()
+    await database.ensure_indexes()
+    await ProbeHistory().ensure_collections()
+    await database.migrate_datetime_fields()
+    await database.migrate_chat_summaries()
+
+    await TelegramDispatcher().start(TELEGRAM_BOT_TOKEN)
 
     # await database.inintialzie_service_data()
 
-    asyncio.create_task(greet_every_interval())
+    # /metrics, /healthz, /readyz (port 8000)
+    health_server = HealthServer()
+    health_server.add_readiness_check('mongo', database.ready.is_set)
+    health_server.add_readiness_check('telegram_dispatcher', lambda: TelegramDispatcher().client is not None)
+    # SIGUSR1 / SIGUSR2 프로파일링, STALL_THRESHOLD 설정 시 stall 감지
+    Profiler().install()
+
+    # lease 모드에서는 worker.py 컨테이너들이 체크를 담당
+    if SCHEDULER_MODE == "local":
+        monitor_task = asyncio.create_task(greet_every_interval())
+        health_server.add_liveness_check('monitor', lambda: not monitor_task.done())
+        health_server.add_readiness_check('monitor_loaded', lambda: Monitor().loaded)
+    await health_server.start()
 
     # 다른 비동기 작업도 추가 가능
     # await asyncio.sleep(60)  # 예시로 60초 후 종료
@@ -99,6 +91,14 @@ async def main_async(application):
     # 비동기 작업 실행
     await asyncio.create_task(run_async_tasks())
 
+async def shutdown(application):
+    """run_polling 종료 시 (SIGTERM / SIGINT): 진행 중인 체크와 쓰기, 알림 전송을 마치고 snapshot을 남긴다"""
+    if SCHEDULER_MODE == "local":
+        await Monitor().stop(SHUTDOWN_TIMEOUT)
+    await TelegramDispatcher().stop()
+    await Database().close()
+
+@observe_handler
 async def start(update: Update, context: CallbackContext) -> None:
     """
     /start 명령어를 처리하는 함수
@@ -116,6 +116,7 @@ async def start(update: Update, context: CallbackContext) -> None:
 
     # await update.message.reply_text('안녕하세요! 이 봇은 당신의 chat_id를 응답합니다. 아무 메시지나 보내보세요!')
 
+@observe_handler
 async def donate(update: Update, context: CallbackContext) -> None:
     title = "Support Our Bot!"
     description = "If you enjoy using this bot, please consider making a donation."
@@ -137,6 +138,7 @@ async def donate(update: Update, context: CallbackContext) -> None:
     )
 
 
+@observe_handler
 async def precheckout_callback(update: Update, context: CallbackContext) -> None:
     query = update.pre_checkout_query
     if query.invoice_payload != "Custom-Payload":
@@ -145,10 +147,12 @@ async def precheckout_callback(update: Update, context: CallbackContext) -> None
     else:
         query.answer(ok=True)
 
+@observe_handler
 async def successful_payment_callback(update: Update, context: CallbackContext) -> None:
     update.message.reply_text("Thank you for your donation!")
 
 
+@observe_handler
 async def chat_id(update: Update, context: CallbackContext) -> None:
     """
     사용자가 메시지를 보낼 때 chat_id를 응답하는 함수
@@ -162,6 +166,15 @@ async def stop_bot(update: Update, context: CallbackContext):
     await context.bot.send_message(chat_id=update.effective_chat.id, text="봇을 중지합니다.")
 
 
+def status_label(service_item:dict) -> str:
+    """status + circuit breaker 상태 (backoff 중이면 다음 재시도 시각)"""
+    status = service_item['status']
+    retry_at = (service_item.get('breaker') or dict()).get('until')
+    if retry_at is not None and retry_at > datetime.now():
+        return f"{status} (retry {retry_at:%H:%M})"
+    return status
+
+
 def send_table(table_content:list, update: Updater, context: CallbackContext):
     table = pt.PrettyTable(['Host', 'Port', 'Alias', 'Status', 'Interval'])
     table.align['Host'] = 'c'
@@ -171,82 +184,350 @@ def send_table(table_content:list, update: Updater, context: CallbackContext):
     table.align['Interval'] = 'l'
 
     for table_dict in table_content:
-        table.add_row([table_dict['host'], f'{str(table_dict['port'])}', table_dict['alias'], table_dict['status'], f'{str(table_dict['interval'])}'])
+        table.add_row([table_dict['host'], f'{str(table_dict['port'])}', table_dict['alias'], status_label(table_dict), f'{str(table_dict['interval'])}'])
     return table
 
+async def render_list_page(chat_id:str, cursor:str) -> tuple:
+    """
+    /list 페이지 (text, reply_markup). cursor: "" (첫 페이지), "n:<_id>:<page>" (다음), "p:<_id>:<page>" (이전)
+    렌더링 결과는 ListPageCache에 저장하고 서비스/상태가 바뀌면 무효화된다.
+    """
+    page_cache = ListPageCache()
+    cached = page_cache.get(chat_id, cursor)
+    if cached is not None:
+        return cached
+
+    database = Database()
+    direction, service_id, page = cursor.split(':') if cursor else (None, None, 1)
+    page = int(page)
+    after_id = ObjectId(service_id) if direction == 'n' else None
+    before_id = ObjectId(service_id) if direction == 'p' else None
+    services, has_more = await database.get_services_page(chat_id, after_id, before_id, LIST_PAGE_SIZE)
+    if not services and page > 1:
+        # 보던 페이지의 서비스가 모두 삭제된 경우 첫 페이지로
+        page, direction = 1, None
+        services, has_more = await database.get_services_page(chat_id, limit=LIST_PAGE_SIZE)
+    has_next = has_more if direction != 'p' else True
+    has_prev = page > 1 and (has_more if direction == 'p' else True)
+
+    if SCHEDULER_MODE == "local":
+        # 스케줄러가 가진 최신 상태 (Mongo 반영은 write-behind)
+        monitor_services = Monitor().services
+        for service_item in services:
+            record = monitor_services.get(service_item['_id'])
+            if record is not None:
+                service_item['status'] = record.status
+                service_item['breaker'] = record.breaker
+
+    # 헤더는 chat summary 한 번 읽기로 만든다
+    summary = await database.get_user_by_chat_id(chat_id) or dict()
+    limit = host_limit(summary.get('user_type'))
+    header = f"{summary.get('host_cnt', 0)}/{limit or 'unlimited'} services ({summary.get('user_type', 'free')}) - page {page}"
+
+    buttons = list()
+    if has_prev:
+        buttons.append(InlineKeyboardButton("< Prev", callback_data=f"list:p:{services[0]['_id']}:{page - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Next >", callback_data=f"list:n:{services[-1]['_id']}:{page + 1}"))
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+
+    table_text = send_table(services, None, None)
+    text = f'{header}\n<pre>{table_text}</pre>'
+    page_cache.put(chat_id, cursor, text, reply_markup)
+    return text, reply_markup
+
+
 # 파라미터를 처리하는 명령어 함수
+@observe_handler
 async def list_service(update: Update, context: CallbackContext) -> None:
-    # 명령어의 파라미터(인수) 가져오기
-    database = Database()
+    chat_id = str(update.message.chat_id)
+    text, reply_markup = await render_list_page(chat_id, "")
+    await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
 
-    chat_id = update.message.chat_id
-    print(context.args)
-    time = INTERVAL
 
-    input_list = await database.get_services_by_chat_id(chat_id)
-    output_list = []
-    for source in input_list:
-        output = source 
-        output_list.append(output)
+@observe_handler
+async def list_page_callback(update: Update, context: CallbackContext) -> None:
+    """/list의 이전/다음 버튼 처리: 같은 메시지를 해당 페이지로 수정"""
+    query = update.callback_query
+    await query.answer()
+    chat_id = str(query.message.chat_id)
+    text, reply_markup = await render_list_page(chat_id, query.data.removeprefix("list:"))
+    try:
+        await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=reply_markup)
+    except BadRequest as e:
+        # 같은 내용으로 수정하면 "message is not modified" 오류
+        if "not modified" not in str(e):
+            raise
 
-    table_text = send_table(input_list, update, context)
-    await update.message.reply_text(f'<pre>{table_text}</pre>', parse_mode=ParseMode.HTML)
 
-    # await update.message.reply_text(f"{str(output_list)}")
+
+# 파라미터를 처리하는 명령어 함수
+@observe_handler
+async def stats_service(update: Update, context: CallbackContext) -> None:
+    database = Database()
+    chat_id = str(update.message.chat_id)
+    if len(context.args) != 1:
+        await update.message.reply_text("Please provide alias after the command, e.g., /stats [alias].")
+        return
+
+    alias = context.args[0]
+    service_item = await database.get_service_by_chat_id_and_alias(chat_id, alias)
+    if service_item is None:
+        await update.message.reply_text(f"{alias} not found.")
+        return
+
+    # 기간별로 해당 단위의 rollup만 읽는다 (raw 기록은 읽지 않음)
+    history = ProbeHistory()
+    datetime_now = datetime.now()
+    lines = [f"{alias} ({service_item['host']}:{service_item['port']})"]
+    for label, granularity, period in (('1h', '1m', timedelta(hours=1)),
+                                       ('24h', '1h', timedelta(days=1)),
+                                       ('30d', '1d', timedelta(days=30))):
+        stats = await history.get_stats(service_item['_id'], granularity, datetime_now - period)
+        if stats['count'] == 0:
+            lines.append(f"{label}: no data")
+            continue
+        p50 = f"{stats['p50']:.1f}ms" if stats['p50'] is not None else "-"
+        p95 = f"{stats['p95']:.1f}ms" if stats['p95'] is not None else "-"
+        lines.append(f"{label}: uptime {stats['uptime']:.2f}% ({stats['count']} checks), p50 {p50}, p95 {p95}")
+    await update.message.reply_text('\n'.join(lines))
 
 
 
 # 파라미터를 처리하는 명령어 함수
+@observe_handler
 async def add_service(update: Update, context: CallbackContext) -> None:
     database = Database()
     # 명령어의 파라미터(인수) 가져오기
-    chat_id = update.message.chat_id
+    chat_id = str(update.message.chat_id)
     print(context.args)
     interval = INTERVAL
-    if len(context.args) == 2:
+    # http(s) 검사 옵션: status=200 body=text
+    options = dict(arg.split('=', 1) for arg in context.args if arg.startswith(('status=', 'body=')))
+    args = [arg for arg in context.args if not arg.startswith(('status=', 'body='))]
+    probe_type, url = "tcp", None
+    if len(args) in (1, 2, 3) and args[0].startswith(('http://', 'https://')):
+        url = args[0]
+        try:
+            parsed_url = urlparse(url)
+            probe_type = parsed_url.scheme
+            host = parsed_url.hostname
+            port = parsed_url.port or (443 if probe_type == "https" else 80)
+        except ValueError as e:
+            # 범위를 벗어난 port, 닫히지 않은 IPv6 괄호 등
+            await update.message.reply_text(f"Invalid URL {url}: {e}")
+            return
+        interval = args[1] if len(args) >= 2 else interval
+        alias = args[2] if len(args) == 3 else url
+    elif len(args) == 2:
         #name = ' '.join(context.args)  # 여러 파라미터를 하나의 문자열로 연결
-        host, port = context.args[0], context.args[1]
+        host, port = args[0], args[1]
         alias = f"{host}/{port}"
-    elif len(context.args) == 4:
-        host, port, interval, alias = context.args[0], context.args[1], context.args[2], context.args[3]
-    elif len(context.args) == 3:
-        host, port, interval = context.args[0], context.args[1], context.args[2]
+    elif len(args) == 4:
+        host, port, interval, alias = args[0], args[1], args[2], args[3]
+    elif len(args) == 3:
+        host, port, interval = args[0], args[1], args[2]
         alias = f"{host}/{port}"
     else:
-        await update.message.reply_text("Please provide IP and port after the command, e.g., /add IP [Domain] [port] [interval] (alias).")
-
-    ### check alias
-    if await database.get_service_by_chat_id_and_alias(chat_id, alias) is None:
-        await update.message.reply_text(f"Added IP={host}, Port={str(port)}, Interval(default=300)={interval}, Alias={alias}")
-        service_model = ServiceDataModel(chat_id=chat_id, host=host, port=int(port), interval=int(interval), alias=alias, status='init', next_check_time=datetime.now(), last_check_time=datetime.now())
-        await database.insert_service_data(chat_id, service_model)
-    else:
+        await update.message.reply_text("Please provide IP and port after the command, e.g., /add IP [Domain] [port] [interval] (alias) "
+                                        "or /add [URL] [interval] (alias) (status=200) (body=text).")
+        return
+
+    ### check alias / quota (chat summary 한 번 읽기)
+    summary = await database.get_user_by_chat_id(chat_id) or dict()
+    limit = host_limit(summary.get('user_type'))
+    if any(entry['alias'] == alias for entry in summary.get('services', list())):
         await update.message.reply_text(f"Alias({alias}) already exist. ")
+        return
+    if limit and summary.get('host_cnt', 0) >= limit:
+        await update.message.reply_text(f"Service limit reached ({limit}). Remove a service before adding another.")
+        return
+
+    try:
+        service_model = ServiceDataModel(chat_id=chat_id, host=host, port=port, interval=interval, alias=alias, status='init', next_check_time=datetime.now(), last_check_time=datetime.now(),
+                                         probe_type=probe_type, url=url, expect_status=options.get('status'), expect_body=options.get('body'))
+    except ValidationError as e:
+        await update.message.reply_text(f"Invalid service: {format_error(e)}")
+        return
+    service_item = await database.insert_service_data(chat_id, service_model, limit)
+    if service_item is None:
+        # 동시에 들어온 /add가 먼저 마지막 슬롯을 가져간 경우
+        await update.message.reply_text(f"Service limit reached ({limit}). Remove a service before adding another.")
+        return
+    ListPageCache().invalidate(chat_id)
+    await update.message.reply_text(f"Added IP={host}, Port={str(port)}, Interval(default=300)={interval}, Alias={alias}")
+    if SCHEDULER_MODE == "local":
+        Monitor().add_service(service_item)
+    await ServiceCache().put_service(service_item)
+
+
+
+# /import: CSV / JSON 파일을 캡션 /import로 보내거나, 보낸 파일에 /import로 답장
+@observe_handler
+async def import_services(update: Update, context: CallbackContext) -> None:
+    message = update.message
+    document = message.document or (message.reply_to_message.document if message.reply_to_message else None)
+    if document is None:
+        await update.message.reply_text("Send a CSV or JSON file with the caption /import, or reply /import to a file. "
+                                        "Columns: alias, host, port, interval, url, expect_status, expect_body.")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text(f"File is too large (max {IMPORT_MAX_BYTES // 1024} KB).")
+        return
 
+    database = Database()
+    chat_id = str(message.chat_id)
+    data = bytes(await (await document.get_file()).download_as_bytearray())
+
+    # alias 중복과 quota는 chat summary 한 번 읽기로 미리 확인 (최종 확인은 DB의 unique 인덱스 / 조건부 $inc)
+    summary = await database.get_user_by_chat_id(chat_id) or dict()
+    limit = host_limit(summary.get('user_type'))
+    remaining = limit - summary.get('host_cnt', 0) if limit else None
+    aliases = {entry['alias'] for entry in summary.get('services', list())}
+
+    errors = list()  # (row number, message)
+    imported_count = 0
+    batch = list()  # (row number, ServiceDataModel)
+
+    async def flush_batch():
+        nonlocal imported_count
+        inserted, failed = await database.bulk_insert_services(chat_id, [model for _, model in batch], limit)
+        errors.extend((batch[index][0], error) for index, error in failed.items())
+        if SCHEDULER_MODE == "local":
+            monitor = Monitor()
+            for service_item in inserted:
+                monitor.add_service(service_item)
+        await ServiceCache().put_services(inserted)
+        imported_count += len(inserted)
+        batch.clear()
+
+    for row_count, (row_no, row, error) in enumerate(parse_rows(data, document.file_name), 1):
+        if error is None:
+            try:
+                service_model = row_to_model(chat_id, row, INTERVAL)
+                if service_model.alias in aliases:
+                    error = f"alias {service_model.alias} already exists"
+                elif remaining is not None and remaining <= 0:
+                    error = f"service limit reached ({limit})"
+            except (ValidationError, ValueError) as e:
+                error = format_error(e)
+        if error is not None:
+            errors.append((row_no, error))
+        else:
+            aliases.add(service_model.alias)
+            if remaining is not None:
+                remaining -= 1
+            batch.append((row_no, service_model))
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush_batch()
+        if row_count % IMPORT_BATCH_SIZE == 0:
+            # 큰 파일을 파싱하는 동안 다른 채팅의 명령도 처리되도록 양보
+            await asyncio.sleep(0)
+    if batch:
+        await flush_batch()
+    if imported_count:
+        ListPageCache().invalidate(chat_id)
+
+    errors.sort()
+    lines = [f"Imported {imported_count} services, {len(errors)} rows failed."]
+    lines += [f"row {row_no}: {error}" for row_no, error in errors[:IMPORT_ERROR_LINES]]
+    await update.message.reply_text('\n'.join(lines))
+    if len(errors) > IMPORT_ERROR_LINES:
+        await update.message.reply_document(document=errors_csv(errors), filename="import-errors.csv")
+
+
+# /export [csv|json]: chat의 서비스를 파일로 전송 (/import 형식과 같음)
+@observe_handler
+async def export_services(update: Update, context: CallbackContext) -> None:
+    file_format = context.args[0].lower() if context.args else 'csv'
+    if file_format not in ('csv', 'json'):
+        await update.message.reply_text("Usage: /export [csv|json]")
+        return
+    chat_id = str(update.message.chat_id)
+    services = Database().iter_services_by_chat_id(chat_id, {field: 1 for field in EXPORT_FIELDS})
+    data = await write_export(services, file_format)
+    extension = 'csv' if file_format == 'csv' else 'jsonl'
+    await update.message.reply_document(document=data, filename=f"services-{chat_id}.{extension}")
 
 
 # 파라미터를 처리하는 명령어 함수
+@observe_handler
 async def remove_service(update: Update, context: CallbackContext) -> None:
     # 명령어의 파라미터(인수) 가져오기
     database = Database()
 
-    chat_id = update.message.chat_id
+    chat_id = str(update.message.chat_id)
     print(context.args)
     if len(context.args) == 1:
         #name = ' '.join(context.args)  # 여러 파라미터를 하나의 문자열로 연결
         alias = context.args[0]
-        await update.message.reply_text(f"Removed, {alias}!")
-    if len(context.args) == 2:
+        removed = await database.remove_service_data(chat_id, alias=alias)
+        target = alias
+    elif len(context.args) == 2 and context.args[1].isdigit():
         #name = ' '.join(context.args)  # 여러 파라미터를 하나의 문자열로 연결
         host, port = context.args[0], context.args[1]
-        await update.message.reply_text(f"Removed, {host} / {port}!")
+        removed = await database.remove_service_data(chat_id, host=host, port=int(port))
+        target = f"{host} / {port}"
     else:
         await update.message.reply_text("Please provide host and port after the command, e.g., /remove [Host] [port] or /remove [alias].")
-
-    if len(context.args) >= 2:
-        service_model = ServiceDataModel(host=host, port=port, alias=alias)
-        await database.remove_service_data(chat_id, service_model)
-
+        return
+
+    if removed is None:
+        await update.message.reply_text(f"{target} not found.")
+        return
+
+    ListPageCache().invalidate(chat_id)
+    if SCHEDULER_MODE == "local":
+        Monitor().remove_service(removed['_id'])
+    await ServiceCache().remove_service(removed)
+    await update.message.reply_text(f"Removed, {target}!")
+
+
+
+DEBUG_USAGE = ("Usage: /debug timings | /debug stalls [seconds|off] | /debug heap [start|stop] "
+               "| /debug profile [seconds]")
+
+
+# /debug: ADMIN_CHAT_IDS 전용 진단 명령 (다른 chat에는 응답하지 않음)
+async def debug_command(update: Update, context: CallbackContext) -> None:
+    if not is_admin(update.message.chat_id):
+        return
+    profiler = Profiler()
+    command = context.args[0].lower() if context.args else None
+    argument = context.args[1].lower() if len(context.args) > 1 else None
+    try:
+        if command == 'timings':
+            await update.message.reply_text('\n'.join(profiler.timings()))
+        elif command == 'stalls':
+            detector = profiler.stall_detector
+            if argument == 'off':
+                detector.stop()
+            elif argument is not None:
+                detector.start(float(argument))
+            state = f"on ({detector.threshold}s)" if detector.enabled else "off"
+            await update.message.reply_text(f"Stall detection {state}, {detector.stalls} stalls caught.")
+        elif command == 'heap':
+            if argument == 'stop':
+                profiler.heap.stop()
+                await update.message.reply_text("tracemalloc stopped.")
+            elif argument == 'start':
+                profiler.heap.start()
+                await update.message.reply_text("tracemalloc started.")
+            else:
+                path, lines = profiler.heap.snapshot()
+                await update.message.reply_text('\n'.join([path] + lines)[:4000])
+        elif command == 'profile':
+            seconds = float(argument) if argument else PROFILE_SECONDS
+            await update.message.reply_text(f"Profiling for {seconds:.0f}s...")
+            path, lines = await profiler.cpu.profile(seconds)
+            await update.message.reply_text('\n'.join(lines)[:4000])
+            with open(path, 'rb') as f:
+                await update.message.reply_document(document=f, filename=os.path.basename(path))
+        else:
+            await update.message.reply_text(DEBUG_USAGE)
+    except (ValueError, RuntimeError) as e:
+        await update.message.reply_text(f"{e}\n{DEBUG_USAGE}")
 
 
 def database_example():
@@ -278,8 +559,6 @@ def database_example():
 
 def main():
 
-    tracemalloc.start()
-
     # # Use the shared MongoDB collection and Redis client
     # collection = database.get_collection
     # redis_client = database.get_redis
@@ -287,7 +566,7 @@ def main():
 
     # 애플리케이션 빌더를 사용해 봇 생성
     # print(TELEGRAM_BOT_TOKEN, flush=True)
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_shutdown(shutdown).build()
 
     # /start 명령어 처리기 등록
     application.add_handler(CommandHandler('start', start))
@@ -295,6 +574,14 @@ def main():
     application.add_handler(CommandHandler('add', add_service))  # /stop 명령어 처리기 추가
     application.add_handler(CommandHandler('remove', remove_service))  # /stop 명령어 처리기 추가
     application.add_handler(CommandHandler('list', list_service))  # /stop 명령어 처리기 추가
+    application.add_handler(CallbackQueryHandler(list_page_callback, pattern=r'^list:'))
+    application.add_handler(CommandHandler('stats', stats_service))
+    # 큰 파일 처리 중에도 다른 업데이트를 처리하도록 block=False
+    application.add_handler(CommandHandler('import', import_services, block=False))
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r'^/import\b'), import_services, block=False))
+    application.add_handler(CommandHandler('export', export_services, block=False))
+    # profile은 수십 초 걸리므로 block=False
+    application.add_handler(CommandHandler('debug', debug_command, block=False))
     # application.add_handler(CommandHandler('donate', donate))
 
 
@@ -318,8 +605,6 @@ def main():
 
     application.run_polling()
 
-    tracemalloc.stop()
-
     
 
 # 메인 로직
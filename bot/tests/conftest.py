@@ -0,0 +1,15 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from database.database import Database
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """mongomock 위의 Database singleton (Redis 없이, 연결된 상태)"""
+    monkeypatch.setattr(Database, "_instance", None)
+    database = Database()
+    database.mongo_client = AsyncMongoMockClient()
+    database.db = database.mongo_client['monitor_test']
+    database.ready.set()
+    return database
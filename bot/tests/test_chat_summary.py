@@ -0,0 +1,89 @@
+import asyncio
+
+from datetime import datetime
+
+import pytest
+
+from database import database as database_module
+from database.database import host_limit
+from model.service_model import ServiceDataModel
+
+
+def model(alias:str, port:int=80) -> ServiceDataModel:
+    now = datetime.now()
+    return ServiceDataModel(chat_id="42", host="example.com", port=port, alias=alias, interval=60, status='init',
+                            next_check_time=now, last_check_time=now)
+
+
+async def summary(database) -> dict:
+    return await database.get_user_by_chat_id("42")
+
+
+def test_insert_and_remove_keep_the_summary_in_sync(database):
+    async def scenario():
+        await database.ensure_indexes()
+        first = await database.insert_service_data("42", model("web", 80))
+        await database.insert_service_data("42", model("api", 8080))
+        added = await summary(database)
+        await database.remove_service_data("42", alias="web")
+        return first, added, await summary(database)
+
+    first, added, removed = asyncio.run(scenario())
+    assert added['host_cnt'] == 2
+    assert [entry['alias'] for entry in added['services']] == ["web", "api"]
+    assert added['services'][0] == {'_id': first['_id'], 'alias': "web", 'target': "example.com:80"}
+    assert removed['host_cnt'] == 1 and [entry['alias'] for entry in removed['services']] == ["api"]
+
+
+def test_quota_is_enforced_by_the_reservation(database):
+    async def scenario():
+        await database.ensure_indexes()
+        results = [await database.insert_service_data("42", model(f"s{port}", port), host_limit=2)
+                   for port in (1, 2, 3)]
+        return results, await summary(database)
+
+    results, stored = asyncio.run(scenario())
+    assert [result is not None for result in results] == [True, True, False]
+    assert stored['host_cnt'] == 2
+    assert asyncio.run(database.get_service_collection.count_documents({})) == 2
+
+
+def test_removing_frees_a_slot(database):
+    async def scenario():
+        await database.ensure_indexes()
+        await database.insert_service_data("42", model("a", 1), host_limit=1)
+        await database.remove_service_data("42", host="example.com", port=1)
+        return await database.insert_service_data("42", model("b", 2), host_limit=1)
+
+    assert asyncio.run(scenario()) is not None
+
+
+def test_re_adding_a_target_does_not_use_another_slot(database):
+    async def scenario():
+        await database.ensure_indexes()
+        first = await database.insert_service_data("42", model("old", 80), host_limit=2)
+        second = await database.insert_service_data("42", model("new", 80), host_limit=2)
+        return first, second, await summary(database)
+
+    first, second, stored = asyncio.run(scenario())
+    assert second['_id'] == first['_id']
+    assert stored['host_cnt'] == 1 and [entry['alias'] for entry in stored['services']] == ["new"]
+
+
+def test_failed_insert_gives_the_slot_back(database):
+    async def scenario():
+        await database.ensure_indexes()
+        await database.insert_service_data("42", model("web", 80))
+        # 다른 대상이지만 같은 alias: unique 인덱스에 걸린다
+        with pytest.raises(Exception):
+            await database.insert_service_data("42", model("web", 81))
+        return await summary(database)
+
+    assert asyncio.run(scenario())['host_cnt'] == 1
+
+
+def test_no_quota_by_default(monkeypatch):
+    assert host_limit("free") is None
+    assert host_limit(None) is None
+    monkeypatch.setattr(database_module, "HOST_LIMITS", {'free': 20})
+    assert host_limit(None) == 20
@@ -0,0 +1,123 @@
+import asyncio
+import socket
+
+import pytest
+
+import socket_test
+from socket_test import DNSCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeLookup:
+    """DNSCache._lookup 대신: 결과(또는 예외)를 순서대로 돌려주고 호출 횟수를 센다"""
+
+    def __init__(self, *outcomes, delay:float=0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, host:str):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(socket_test, "time", clock)
+    return clock
+
+
+def cache_with(lookup:FakeLookup) -> DNSCache:
+    cache = DNSCache(negative_ttl=60)
+    cache._lookup = lookup
+    return cache
+
+
+def test_ip_literal_skips_lookup():
+    lookup = FakeLookup()
+    cache = cache_with(lookup)
+    assert asyncio.run(cache.resolve("10.0.0.1")) == ["10.0.0.1"]
+    assert asyncio.run(cache.resolve("::1")) == ["::1"]
+    assert lookup.calls == 0
+
+
+def test_positive_entry_until_ttl(clock):
+    lookup = FakeLookup((["10.0.0.1"], 30), (["10.0.0.2"], 30))
+    cache = cache_with(lookup)
+
+    async def scenario():
+        first = await cache.resolve("example.com")
+        clock.now += 29
+        cached = await cache.resolve("example.com")
+        clock.now += 1
+        refreshed = await cache.resolve("example.com")
+        return first, cached, refreshed
+
+    assert asyncio.run(scenario()) == (["10.0.0.1"], ["10.0.0.1"], ["10.0.0.2"])
+    assert (cache.hits, cache.misses, lookup.calls) == (1, 2, 2)
+
+
+def test_concurrent_resolves_share_one_lookup():
+    lookup = FakeLookup((["10.0.0.1"], 30), delay=0.01)
+    cache = cache_with(lookup)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.resolve("example.com") for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [["10.0.0.1"]] * 10
+    assert (lookup.calls, cache.misses, cache.coalesced) == (1, 1, 9)
+    assert cache.pending == {}
+
+
+def test_failed_lookup_is_cached_negatively(clock):
+    lookup = FakeLookup(socket.gaierror(socket.EAI_NONAME, "nx"), (["10.0.0.1"], 30))
+    cache = cache_with(lookup)
+
+    async def scenario():
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("missing.example")
+        clock.now += 59
+        with pytest.raises(socket.gaierror):
+            await cache.resolve("missing.example")
+        clock.now += 1
+        return await cache.resolve("missing.example")
+
+    assert asyncio.run(scenario()) == ["10.0.0.1"]
+    assert (lookup.calls, cache.negative_hits) == (2, 1)
+
+
+def test_concurrent_waiters_share_the_failure():
+    lookup = FakeLookup(socket.gaierror(socket.EAI_NONAME, "nx"), delay=0.01)
+    cache = cache_with(lookup)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.resolve("missing.example") for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert all(isinstance(error, socket.gaierror) for error in asyncio.run(scenario()))
+    assert lookup.calls == 1
+
+
+def test_timeout_is_not_cached():
+    lookup = FakeLookup(asyncio.TimeoutError("slow"), (["10.0.0.1"], 30))
+    cache = cache_with(lookup)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await cache.resolve("slow.example")
+        return await cache.resolve("slow.example")
+
+    assert asyncio.run(scenario()) == ["10.0.0.1"]
+    assert lookup.calls == 2 and cache.negative_hits == 0
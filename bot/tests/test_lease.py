@@ -0,0 +1,64 @@
+import asyncio
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+NOW = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def service(next_check_minutes:int, **fields) -> dict:
+    return {'_id': ObjectId(), 'chat_id': "42", 'host': "example.com", 'port': 80, 'alias': str(ObjectId()),
+            'interval': 60, 'next_check_time': NOW + timedelta(minutes=next_check_minutes), **fields}
+
+
+def test_claims_due_services_oldest_first(database):
+    services = [service(-1), service(-5), service(-3), service(10)]
+
+    async def scenario():
+        await database.get_service_collection.insert_many(services)
+        return await database.claim_due_services("worker-a", NOW, 60, limit=2)
+
+    claimed = asyncio.run(scenario())
+    assert [item['_id'] for item in claimed] == [services[1]['_id'], services[2]['_id']]
+
+
+def test_leased_services_are_not_claimed_twice(database):
+    services = [service(-1), service(-2)]
+
+    async def scenario():
+        await database.get_service_collection.insert_many(services)
+        first = await database.claim_due_services("worker-a", NOW, 60, limit=10)
+        second = await database.claim_due_services("worker-b", NOW, 60, limit=10)
+        stored = await database.get_service_collection.find_one({'_id': services[0]['_id']})
+        return first, second, stored
+
+    first, second, stored = asyncio.run(scenario())
+    assert len(first) == 2 and second == list()
+    assert (stored['lease_owner'], stored['lease_expires']) == ("worker-a", NOW + timedelta(seconds=60))
+
+
+def test_expired_lease_is_claimed_by_another_worker(database):
+    expired = service(-10, lease_owner="crashed", lease_expires=NOW - timedelta(seconds=1))
+    held = service(-10, lease_owner="worker-a", lease_expires=NOW + timedelta(seconds=30))
+
+    async def scenario():
+        await database.get_service_collection.insert_many([expired, held])
+        return await database.claim_due_services("worker-b", NOW, 60, limit=10)
+
+    assert [item['_id'] for item in asyncio.run(scenario())] == [expired['_id']]
+
+
+def test_renew_only_extends_own_leases(database):
+    services = [service(-1), service(-2)]
+    renewed_until = NOW + timedelta(minutes=5)
+
+    async def scenario():
+        await database.get_service_collection.insert_many(services)
+        await database.claim_due_services("worker-a", NOW, 60, limit=1)
+        await database.claim_due_services("worker-b", NOW, 60, limit=1)
+        await database.renew_leases("worker-a", [item['_id'] for item in services], renewed_until)
+        return {item['lease_owner']: item['lease_expires']
+                async for item in database.get_service_collection.find({})}
+
+    assert asyncio.run(scenario()) == {"worker-b": NOW + timedelta(seconds=60), "worker-a": renewed_until}
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from model.probe_model import ProbeResult
+from notification.telegram_dispatcher import TelegramDispatcher
+from scheduler.monitor import Monitor
+from scheduler.target_registry import target_key
+
+
+@pytest.fixture
+def monitor(database, monkeypatch):
+    monkeypatch.setattr(Monitor, "_instance", None)
+    monitor = Monitor()
+    monitor.sent = list()
+
+    async def send(dispatcher, chat_id, text, **kwargs):
+        monitor.sent.append((chat_id, text))
+
+    monkeypatch.setattr(TelegramDispatcher, "send", send)
+    return monitor
+
+
+def service(port:int=80, **fields) -> dict:
+    return {'_id': ObjectId(), 'chat_id': "42", 'alias': f"web{port}", 'host': "127.0.0.1", 'port': port,
+            'interval': 60, 'probe_type': "tcp", 'next_check_time': datetime.now(), **fields}
+
+
+def test_probe_error_is_recorded_and_the_target_stays_scheduled(monitor, monkeypatch):
+    service_item = service()
+    key = target_key(service_item)
+
+    async def broken_probe(key, probe_spec):
+        raise RuntimeError("probe bug")
+
+    async def scenario():
+        monitor.add_service(service_item)
+        monitor.scheduler.cancel(key)
+        monkeypatch.setattr(monitor.policy, "probe", broken_probe)
+        await monitor.check_target(key, time.time())
+
+    asyncio.run(scenario())
+    assert key in monitor.scheduler and monitor.scheduler.next_due() > time.time()
+    record = monitor.services[service_item['_id']]
+    assert (record.status, record.state.reason) == ("down", "error")
+    assert monitor.result_writer.buffer[service_item['_id']]['status'] == "down"
+    assert len(monitor.sent) == 1
+
+
+def test_subscriber_removed_during_fan_out_is_skipped(monitor, monkeypatch):
+    first, second = service(alias="first"), service(alias="second")
+    key = target_key(first)
+
+    async def send(dispatcher, chat_id, text, **kwargs):
+        # 알림을 보내는 동안 다른 구독이 /remove 된다
+        monitor.sent.append(text)
+        monitor.remove_service(second['_id'])
+
+    async def refused(key, probe_spec):
+        return ProbeResult(probe_spec['host'], probe_spec['port'], False, datetime.now(), reason="refused")
+
+    async def scenario():
+        monitor.add_service(first)
+        monitor.add_service(second)
+        monkeypatch.setattr(TelegramDispatcher, "send", send)
+        monkeypatch.setattr(monitor.policy, "probe", refused)
+        await monitor.check_target(key, time.time())
+
+    asyncio.run(scenario())
+    assert len(monitor.sent) == 1
+    assert second['_id'] not in monitor.services and second['_id'] not in monitor.result_writer.buffer
+    assert key in monitor.scheduler
+
+
+def test_removed_target_is_not_rescheduled(monitor, monkeypatch):
+    service_item = service()
+    key = target_key(service_item)
+
+    async def slow_probe(key, probe_spec):
+        monitor.remove_service(service_item['_id'])
+        raise RuntimeError("probe bug")
+
+    async def scenario():
+        monitor.add_service(service_item)
+        monkeypatch.setattr(monitor.policy, "probe", slow_probe)
+        await monitor.check_target(key, time.time())
+
+    asyncio.run(scenario())
+    assert key not in monitor.scheduler and monitor.sent == list()
+
+
+def test_change_events_are_applied_idempotently(monitor):
+    service_item = service(interval=300)
+    insert = {'operationType': "insert", 'fullDocument': service_item, 'documentKey': {'_id': service_item['_id']}}
+    update = {'operationType': "update", 'fullDocument': dict(service_item, interval=60, alias="renamed"),
+              'documentKey': {'_id': service_item['_id']}}
+    delete = {'operationType': "delete", 'documentKey': {'_id': service_item['_id']}}
+    key = target_key(service_item)
+
+    async def scenario():
+        await monitor.apply_change(insert)
+        await monitor.apply_change(insert)
+        assert monitor.registry.stats() == {'targets': 1, 'subscriptions': 1}
+        state = monitor.services[service_item['_id']].state
+        await monitor.apply_change(update)
+        record = monitor.services[service_item['_id']]
+        assert (record.alias, record.interval, monitor.registry.targets[key].interval) == ("renamed", 60, 60)
+        assert record.state is state
+        await monitor.apply_change(delete)
+        await monitor.apply_change(delete)
+        # update 직후 삭제된 문서는 fullDocument가 없다
+        await monitor.apply_change({'operationType': "update", 'fullDocument': None,
+                                    'documentKey': {'_id': service_item['_id']}})
+
+    asyncio.run(scenario())
+    assert monitor.services == dict() and len(monitor.registry) == 0 and key not in monitor.scheduler
+
+
+def test_target_change_moves_the_subscription(monitor):
+    service_item = service(port=80)
+    moved = dict(service_item, port=8080)
+
+    async def scenario():
+        await monitor.apply_change({'operationType': "insert", 'fullDocument': service_item})
+        await monitor.apply_change({'operationType': "replace", 'fullDocument': moved})
+
+    asyncio.run(scenario())
+    assert list(monitor.registry.targets) == [target_key(moved)]
+    assert target_key(service_item) not in monitor.scheduler and target_key(moved) in monitor.scheduler
+
+
+def test_url_change_releases_the_old_origin(monitor):
+    service_item = service(probe_type="https", url="https://old.example/health", expect_status=200)
+    moved = dict(service_item, url="https://new.example/health")
+
+    async def scenario():
+        await monitor.apply_change({'operationType': "insert", 'fullDocument': service_item})
+        await monitor.apply_change({'operationType': "replace", 'fullDocument': moved})
+
+    asyncio.run(scenario())
+    assert dict(monitor.probe_engine.http_probe.origin_refs) == {"https://new.example:443": 1}
+
+
+def test_resync_adds_updates_and_removes(monitor, database):
+    kept, changed, deleted, added = service(80), service(81), service(82), service(83)
+
+    async def scenario():
+        for service_item in (kept, changed, deleted):
+            monitor.add_service(service_item)
+        await database.get_service_collection.insert_many([kept, dict(changed, interval=30), added])
+        await monitor.resync()
+
+    asyncio.run(scenario())
+    assert set(monitor.services) == {kept['_id'], changed['_id'], added['_id']}
+    assert monitor.services[changed['_id']].interval == 30
+    assert target_key(deleted) not in monitor.scheduler and target_key(added) in monitor.scheduler
@@ -0,0 +1,81 @@
+import asyncio
+
+from socket_test import HTTPProbe, ProbeEngine
+
+
+def test_out_of_range_port_is_an_error_result():
+    async def scenario():
+        engine = ProbeEngine()
+        return await engine.probe("127.0.0.1", 99999), await engine.probe("127.0.0.1", -1)
+
+    for probe_result in asyncio.run(scenario()):
+        assert (probe_result.up, probe_result.reason) == (False, "error")
+
+
+def test_refused_port():
+    async def scenario():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        return await ProbeEngine().probe("127.0.0.1", port)
+
+    probe_result = asyncio.run(scenario())
+    assert (probe_result.up, probe_result.reason) == (False, "refused")
+
+
+def test_open_port_reports_latency():
+    async def scenario():
+        server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+        async with server:
+            return await ProbeEngine().probe("127.0.0.1", server.sockets[0].getsockname()[1])
+
+    probe_result = asyncio.run(scenario())
+    assert probe_result.up and probe_result.reason == "ok" and probe_result.latency >= 0
+
+
+def test_malformed_url_is_an_error_result():
+    probe_result = asyncio.run(HTTPProbe().check("http://[::1"))
+    assert (probe_result.up, probe_result.reason, probe_result.host) == (False, "error", "http://[::1")
+
+
+def test_client_is_closed_with_the_last_target_of_its_origin():
+    async def scenario():
+        http_probe = HTTPProbe()
+        http_probe.retain("https://example.com/a")
+        http_probe.retain("https://example.com:443/b")
+        client = http_probe._client("https://example.com:443")
+        http_probe.release("https://example.com/a")
+        assert http_probe.clients == {"https://example.com:443": client}
+        http_probe.release("https://example.com/b")
+        assert http_probe.clients == dict()
+        await asyncio.gather(*http_probe.closing)
+        return client
+
+    assert asyncio.run(scenario()).is_closed
+
+
+def test_unretained_clients_are_closed_when_idle():
+    async def scenario():
+        http_probe = HTTPProbe(keepalive_expiry=0)
+        idle = http_probe._client("http://idle.example:80")
+        http_probe.retain("http://kept.example/")
+        kept = http_probe._client("http://kept.example:80")
+        await asyncio.sleep(0.01)
+        http_probe._client("http://other.example:80")
+        assert set(http_probe.clients) == {"http://kept.example:80", "http://other.example:80"}
+        await http_probe.aclose()
+        return idle, kept
+
+    idle, kept = asyncio.run(scenario())
+    assert idle.is_closed and kept.is_closed
+
+
+def test_engine_retains_only_http_targets():
+    engine = ProbeEngine()
+    engine.retain({'probe_type': "tcp", 'host': "example.com", 'port': 22})
+    engine.retain({'probe_type': "https", 'url': "https://example.com/"})
+    assert dict(engine.http_probe.origin_refs) == {"https://example.com:443": 1}
+    engine.release({'probe_type': "tcp", 'host': "example.com", 'port': 22})
+    engine.release({'probe_type': "https", 'url': "https://example.com/"})
+    assert dict(engine.http_probe.origin_refs) == dict()
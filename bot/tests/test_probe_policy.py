@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import probe_policy
+from model.probe_model import ProbeResult
+from probe_policy import CircuitBreaker
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def backoff(monkeypatch):
+    monkeypatch.setattr(probe_policy, "BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(probe_policy, "BREAKER_BASE_BACKOFF", 60)
+    monkeypatch.setattr(probe_policy, "BREAKER_MAX_BACKOFF", 1800)
+
+
+def result(reason:str, minute:int=0) -> ProbeResult:
+    up = reason == "ok"
+    return ProbeResult("h", 80, up, START + timedelta(minutes=minute), 5.0 if up else None, reason)
+
+
+def epoch(minute:int) -> float:
+    return (START + timedelta(minutes=minute)).timestamp()
+
+
+def test_opens_after_threshold_silent_failures():
+    breaker = CircuitBreaker()
+    breaker.record(result("timeout", 0))
+    breaker.record(result("unreachable", 1))
+    assert breaker.state(epoch(1)) == "closed" and breaker.allow(epoch(1))
+    breaker.record(result("dns", 2))
+    assert breaker.until == epoch(2) + 60
+    assert breaker.state(epoch(2)) == "open" and not breaker.allow(epoch(2))
+    assert breaker.state(epoch(3)) == "half_open" and breaker.allow(epoch(3))
+
+
+def test_answering_failures_do_not_count():
+    breaker = CircuitBreaker()
+    for minute, reason in enumerate(("timeout", "timeout", "refused", "timeout", "timeout")):
+        breaker.record(result(reason, minute))
+    assert breaker.state(epoch(5)) == "closed"
+    assert breaker.failures == 2
+
+
+def test_failed_recovery_probe_doubles_backoff_up_to_max():
+    breaker = CircuitBreaker()
+    for minute in range(3):
+        breaker.record(result("timeout", minute))
+    backoffs = []
+    for minute in range(10, 20):
+        breaker.record(result("timeout", minute))
+        backoffs.append(breaker.until - epoch(minute))
+    assert backoffs == [120, 240, 480, 960, 1800, 1800, 1800, 1800, 1800, 1800]
+
+
+def test_any_answer_closes():
+    breaker = CircuitBreaker()
+    for minute in range(4):
+        breaker.record(result("timeout", minute))
+    breaker.record(result("ok", 10))
+    assert (breaker.failures, breaker.level, breaker.until) == (0, 0, None)
+    assert breaker.to_document() is None
+
+
+def test_document_round_trip():
+    breaker = CircuitBreaker()
+    assert breaker.to_document() is None
+    breaker.record(result("timeout", 0))
+    assert breaker.to_document() == {'failures': 1, 'level': 0, 'until': None}
+    for minute in range(1, 3):
+        breaker.record(result("timeout", minute))
+    document = breaker.to_document()
+    assert document['until'] == START + timedelta(minutes=3)
+    restored = CircuitBreaker.from_document(document)
+    assert (restored.failures, restored.level, restored.until) == (3, 1, breaker.until)
+    assert CircuitBreaker.from_document(None).until is None
@@ -0,0 +1,115 @@
+import asyncio
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from database.result_writer import ResultWriter
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def minute(count:int) -> datetime:
+    return START + timedelta(minutes=count)
+
+
+async def insert_services(database, count:int) -> list:
+    service_ids = [ObjectId() for _ in range(count)]
+    await database.get_service_collection.insert_many(
+        [{'_id': service_id, 'status': "init"} for service_id in service_ids])
+    return service_ids
+
+
+def test_results_of_one_service_are_coalesced(database):
+    async def scenario():
+        [service_id] = await insert_services(database, 1)
+        writer = ResultWriter()
+        writer.add(service_id, "down", minute(0), minute(1))
+        writer.add(service_id, "up", minute(1), minute(2))
+        assert len(writer.buffer) == 1
+        await writer.flush()
+        return await database.get_service_collection.find_one({'_id': service_id}), writer
+
+    document, writer = asyncio.run(scenario())
+    assert (document['status'], document['next_check_time']) == ("up", minute(2))
+    assert (writer.flush_count, writer.written_count, writer.buffer) == (1, 1, dict())
+
+
+def test_flush_writes_in_batches(database):
+    async def scenario():
+        service_ids = await insert_services(database, 5)
+        writer = ResultWriter(batch_size=2)
+        for service_id in service_ids:
+            writer.add(service_id, "up", minute(0), minute(1))
+        assert writer.full_event.is_set()
+        await writer.flush()
+        return await database.get_service_collection.count_documents({'status': "up"}), writer
+
+    updated, writer = asyncio.run(scenario())
+    assert updated == 5
+    assert (writer.flush_count, writer.last_batch_size) == (3, 1)
+
+
+def test_failed_batch_keeps_newer_results(database, monkeypatch):
+    async def fail(updates):
+        # 쓰는 도중 같은 서비스의 새 결과가 들어온다
+        writer.add(service_ids[0], "down", minute(2), minute(3))
+        raise ConnectionError("mongo down")
+
+    async def scenario():
+        service_ids.extend(await insert_services(database, 2))
+        for service_id in service_ids:
+            writer.add(service_id, "up", minute(0), minute(1))
+        monkeypatch.setattr(database, "bulk_update_service_data", fail)
+        await writer.flush()
+
+    service_ids = list()
+    writer = ResultWriter()
+    asyncio.run(scenario())
+    assert writer.buffer[service_ids[0]]['status'] == "down"
+    assert writer.buffer[service_ids[1]]['status'] == "up"
+
+
+def test_discard_drops_pending_results():
+    writer = ResultWriter()
+    service_id = ObjectId()
+    writer.add(service_id, "up", minute(0), minute(1))
+    writer.touch(ObjectId(), minute(0), minute(1))
+    writer.discard(service_id)
+    assert writer.buffer == dict() and len(writer.touch_buffer) == 1
+
+
+def test_touches_wait_for_merge(database):
+    async def scenario():
+        [service_id] = await insert_services(database, 1)
+        writer = ResultWriter()
+        writer.touch(service_id, minute(0), minute(1))
+        writer.touch(service_id, minute(1), minute(2))
+        assert writer.buffer == dict() and len(writer.touch_buffer) == 1
+        await writer.flush_mongo()
+        unchanged = await database.get_service_collection.find_one({'_id': service_id})
+        await writer.flush()
+        return unchanged, await database.get_service_collection.find_one({'_id': service_id})
+
+    unchanged, document = asyncio.run(scenario())
+    assert 'last_check_time' not in unchanged
+    assert (document['status'], document['last_check_time'], document['next_check_time']) == \
+        ("init", minute(1), minute(2))
+
+
+def test_touch_updates_a_pending_transition():
+    writer = ResultWriter()
+    service_id = ObjectId()
+    writer.add(service_id, "down", minute(0), minute(1), reason="timeout")
+    writer.touch(service_id, minute(1), minute(2))
+    assert writer.touch_buffer == dict()
+    assert writer.buffer[service_id] == {'status': "down", 'last_check_time': minute(1), 'next_check_time': minute(2),
+                                         'reason': "timeout"}
+
+
+def test_transition_replaces_pending_touch():
+    writer = ResultWriter()
+    service_id = ObjectId()
+    writer.touch(service_id, minute(0), minute(1))
+    writer.add(service_id, "down", minute(1), minute(2))
+    assert writer.touch_buffer == dict() and writer.buffer[service_id]['status'] == "down"
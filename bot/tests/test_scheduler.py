@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+import scheduler.scheduler as scheduler_module
+from scheduler.scheduler import DeadlineScheduler
+from scheduler.spread import aligned_due, jitter_bound, next_due, phase_offset, spread_due
+
+
+def test_pop_due_in_deadline_order():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule("b", 20.0)
+    scheduler.schedule("a", 10.0)
+    scheduler.schedule("c", 30.0)
+    assert scheduler.pop_due(25.0) == [("a", 10.0), ("b", 20.0)]
+    assert len(scheduler) == 1 and "c" in scheduler
+    assert scheduler.next_due() == 30.0
+
+
+def test_pop_due_limit_keeps_the_rest_queued():
+    scheduler = DeadlineScheduler()
+    for index in range(5):
+        scheduler.schedule(index, float(index))
+    assert [key for key, _ in scheduler.pop_due(10.0, limit=2)] == [0, 1]
+    assert [key for key, _ in scheduler.pop_due(10.0)] == [2, 3, 4]
+
+
+def test_reschedule_replaces_the_previous_entry():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule("a", 10.0)
+    scheduler.schedule("a", 50.0)
+    assert scheduler.pop_due(20.0) == []
+    assert scheduler.pop_due(60.0) == [("a", 50.0)]
+    assert len(scheduler) == 0
+
+
+def test_cancel_drops_the_entry():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule("a", 10.0)
+    scheduler.schedule("b", 20.0)
+    scheduler.cancel("a")
+    assert scheduler.next_due() == 20.0
+    assert scheduler.pop_due(30.0) == [("b", 20.0)]
+
+
+def test_lag_is_recorded():
+    scheduler = DeadlineScheduler()
+    scheduler.schedule("a", 10.0)
+    scheduler.pop_due(12.5)
+    stats = scheduler.lag_stats()
+    assert stats['last'] == 2.5 and stats['max'] == 2.5 and stats['queued'] == 0
+
+
+def test_earlier_schedule_wakes_the_waiter():
+    async def scenario():
+        scheduler = DeadlineScheduler()
+        waiter = asyncio.create_task(scheduler.wait(60))
+        await asyncio.sleep(0)
+        scheduler.schedule("a", 0.0)
+        await asyncio.wait_for(waiter, 1)
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def tolerance(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "SCHEDULE_REBALANCE_TOLERANCE", 1)
+
+
+def crowd(scheduler, slot, count):
+    for index in range(count):
+        scheduler.schedule((slot, index), slot + 0.5)
+
+
+def test_place_keeps_due_when_the_slot_is_quiet(tolerance):
+    scheduler = DeadlineScheduler(slot_seconds=1)
+    crowd(scheduler, 100, 1)
+    assert scheduler.place(100.25, spread=10) == 100.25
+    assert scheduler.rebalanced == 0
+
+
+def test_place_moves_to_the_nearest_empty_slot(tolerance):
+    scheduler = DeadlineScheduler(slot_seconds=1)
+    crowd(scheduler, 100, 5)
+    crowd(scheduler, 99, 5)
+    placed = scheduler.place(100.25, spread=10)
+    assert 101 <= placed < 102
+    assert scheduler.rebalanced == 1
+
+
+def test_place_never_moves_before_earliest(tolerance):
+    scheduler = DeadlineScheduler(slot_seconds=1)
+    crowd(scheduler, 100, 5)
+    crowd(scheduler, 101, 5)
+    placed = scheduler.place(100.25, spread=10, earliest=100)
+    assert 102 <= placed < 103
+
+
+def test_place_stays_within_spread(tolerance):
+    scheduler = DeadlineScheduler(slot_seconds=1)
+    for slot in range(97, 104):
+        crowd(scheduler, slot, 5)
+    assert scheduler.place(100.25, spread=3) == 100.25
+    assert scheduler.peak_slot_load() == 5
+
+
+def test_slot_load_follows_reschedule_and_cancel():
+    scheduler = DeadlineScheduler(slot_seconds=1)
+    scheduler.schedule("a", 10.5)
+    scheduler.schedule("b", 10.7)
+    assert scheduler.peak_slot_load() == 2
+    scheduler.schedule("a", 20.5)
+    scheduler.cancel("b")
+    assert scheduler.peak_slot_load() == 1
+
+
+def test_phase_offset_is_stable_and_within_interval():
+    offsets = [phase_offset(("chat", index), 60) for index in range(100)]
+    assert offsets == [phase_offset(("chat", index), 60) for index in range(100)]
+    assert all(0 <= offset < 60 for offset in offsets)
+    assert len(set(offsets)) > 50
+
+
+def test_aligned_due_lands_on_the_phase():
+    offset = phase_offset("a", 60)
+    due = aligned_due("a", 60, 1000.0)
+    assert 1000.0 <= due < 1060.0
+    assert round(due - offset, 6) % 60 == 0
+
+
+def test_next_due_advances_one_period():
+    due = aligned_due("a", 60, 1000.0)
+    assert next_due("a", 60, due, due + 1) == pytest.approx(due + 60)
+    # 한참 밀린 경우에는 현재 시각 이후의 위상으로
+    late = next_due("a", 60, due, due + 600)
+    assert due + 600 < late <= due + 660
+
+
+def test_jitter_is_bounded():
+    assert jitter_bound(60) == pytest.approx(3)
+    assert jitter_bound(3600) == 15
+    due = aligned_due("a", 60, 1000.0)
+    for _ in range(100):
+        assert abs(spread_due("a", 60, due, due) - (due + 60)) <= 3
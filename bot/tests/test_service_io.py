@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from service_io import detect_format, errors_csv, format_error, parse_rows, row_to_model, write_export
+
+
+@pytest.mark.parametrize("file_name, data, expected", [
+    ("services.csv", b"[]", "csv"),
+    ("services.JSON", b"alias", "json"),
+    ("services.ndjson", b"", "jsonl"),
+    (None, b"  [{}]", "json"),
+    (None, b'{"host": "a"}', "jsonl"),
+    ("upload", b"alias,host", "csv"),
+])
+def test_detect_format(file_name, data, expected):
+    assert detect_format(file_name, data) == expected
+
+
+def test_parse_csv_normalizes_headers_and_values():
+    data = "﻿Alias , Host,PORT\n web , example.com , 80\nshort\n".encode()
+    rows = list(parse_rows(data, "services.csv"))
+    assert rows[0] == (2, {'alias': 'web', 'host': 'example.com', 'port': '80'}, None)
+    # 컬럼이 모자란 행은 있는 값만
+    assert rows[1] == (3, {'alias': 'short'}, None)
+
+
+def test_parse_jsonl_reports_bad_lines_and_continues():
+    data = b'{"host": "a", "port": 1}\n\nnot json\n[1]\n{"host": "b", "port": 2}\n'
+    rows = list(parse_rows(data, "services.jsonl"))
+    assert [(row_no, row) for row_no, row, _ in rows] == [
+        (1, {'host': 'a', 'port': 1}), (3, None), (4, None), (5, {'host': 'b', 'port': 2})]
+    assert rows[1][2].startswith("invalid JSON")
+    assert rows[2][2] == "not an object"
+
+
+def test_parse_json_array():
+    rows = list(parse_rows(b'[{"host": "a", "port": 1}, 5]'))
+    assert rows == [(1, {'host': 'a', 'port': 1}, None), (2, None, "not an object")]
+    assert list(parse_rows(b'{"host": "a"}', "services.json")) == [(1, None, "expected a JSON array of objects")]
+    [(_, row, error)] = parse_rows(b'[{"host": ', "services.json")
+    assert row is None and error.startswith("invalid JSON")
+
+
+def test_row_to_model_tcp():
+    service = row_to_model("42", {'host': 'example.com', 'port': '22'}, 60)
+    assert (service.probe_type, service.host, service.port, service.interval) == ("tcp", "example.com", 22, 60)
+    assert service.alias == "example.com/22" and service.status == "init"
+
+
+def test_row_to_model_url():
+    service = row_to_model("42", {'url': 'https://example.com/health', 'interval': '30', 'alias': 'api',
+                                  'expect_status': '204'}, 60)
+    assert (service.probe_type, service.host, service.port) == ("https", "example.com", 443)
+    assert (service.alias, service.interval, service.expect_status) == ("api", 30, 204)
+    assert row_to_model("42", {'url': 'http://example.com:8080/'}, 60).port == 8080
+    assert row_to_model("42", {'url': 'http://example.com/'}, 60).alias == "http://example.com/"
+
+
+@pytest.mark.parametrize("row, message", [
+    ({'url': 'ftp://example.com'}, "invalid url"),
+    ({'url': 'http://'}, "invalid url"),
+    ({'host': 'example.com'}, "host and port (or url) are required"),
+    ({'port': '80'}, "host and port (or url) are required"),
+])
+def test_row_to_model_rejects_incomplete_rows(row, message):
+    with pytest.raises(ValueError) as error:
+        row_to_model("42", row, 60)
+    assert str(error.value).startswith(message)
+
+
+@pytest.mark.parametrize("port", ["0", "99999", "abc"])
+def test_row_to_model_rejects_bad_ports(port):
+    with pytest.raises(ValidationError) as error:
+        row_to_model("42", {'host': 'example.com', 'port': port}, 60)
+    assert format_error(error.value).startswith("port: ")
+
+
+def test_row_to_model_validation_error_is_formatted():
+    with pytest.raises(ValidationError) as error:
+        row_to_model("42", {'host': 'example.com', 'port': '80', 'interval': '0'}, 60)
+    assert format_error(error.value).startswith("interval: ")
+    assert format_error(ValueError("host and port (or url) are required")) == "host and port (or url) are required"
+
+
+def test_errors_csv():
+    assert errors_csv([(3, "invalid url x")]) == b"row,error\r\n3,invalid url x\r\n"
+
+
+def test_export_round_trips_through_import():
+    services = [{'alias': 'web', 'host': 'example.com', 'port': 80, 'interval': 60, 'status': 'up'}]
+
+    async def iterate():
+        for service_item in services:
+            yield service_item
+
+    for file_format in ('csv', 'jsonl'):
+        data = asyncio.run(write_export(iterate(), file_format))
+        [(_, row, error)] = parse_rows(data, f"export.{file_format}")
+        service = row_to_model("42", row, 300)
+        assert error is None
+        assert (service.alias, service.host, service.port, service.interval) == ("web", "example.com", 80, 60)
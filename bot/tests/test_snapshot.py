@@ -0,0 +1,79 @@
+import gzip
+import json
+import time
+
+from datetime import datetime
+
+from bson import ObjectId
+
+from scheduler.snapshot import (SNAPSHOT_FIELDS, encode_service, iter_snapshot_services, read_snapshot,
+                                snapshot_document, write_snapshot)
+
+
+def service(**overrides) -> dict:
+    service_item = {'_id': ObjectId(), 'chat_id': "42", 'alias': "web", 'host': "example.com", 'port': 443,
+                    'url': "https://example.com/", 'interval': 60, 'probe_type': "https", 'expect_status': None,
+                    'expect_body': None, 'next_check_time': datetime(2026, 1, 1, 12, 0, 30, 250000),
+                    'breaker': None, 'status': "down", 'reason': "timeout",
+                    'state_since': datetime(2026, 1, 1, 11, 59), 'flapping': False,
+                    'check_window': [True, False, False], 'consecutive_ok': 0, 'transitions': [1767268740.0]}
+    service_item.update(overrides)
+    return service_item
+
+
+def round_trip(rows:list) -> list:
+    # 파일에 쓰는 것과 같은 JSON 변환을 거친다
+    snapshot = json.loads(json.dumps(snapshot_document(rows, None, True)))
+    return list(iter_snapshot_services(snapshot))
+
+
+def test_encode_is_json_row():
+    service_item = service()
+    row = encode_service(service_item)
+    assert len(row) == len(SNAPSHOT_FIELDS)
+    assert row[0] == str(service_item['_id'])
+    assert row[SNAPSHOT_FIELDS.index('next_check_time')] == service_item['next_check_time'].timestamp()
+    json.dumps(row)
+
+
+def test_round_trip():
+    service_item = service()
+    assert round_trip([encode_service(service_item)]) == [service_item]
+
+
+def test_round_trip_with_breaker_and_missing_fields():
+    breaker = {'failures': 3, 'level': 1, 'until': datetime(2026, 1, 1, 12, 5)}
+    service_item = service(breaker=breaker)
+    legacy_item = {'_id': ObjectId(), 'chat_id': "42", 'alias': "db", 'host': "10.0.0.1", 'port': 5432,
+                   'interval': 30, 'next_check_time': datetime(2026, 1, 1, 12, 0)}
+    decoded, legacy = round_trip([encode_service(service_item), encode_service(legacy_item)])
+    assert decoded['breaker'] == breaker
+    assert legacy['_id'] == legacy_item['_id'] and legacy['state_since'] is None and legacy['status'] is None
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "state" / "snapshot.json.gz")
+    snapshot = snapshot_document([encode_service(service())], {'_data': "token"}, True)
+    write_snapshot(path, snapshot)
+    assert read_snapshot(path) == json.loads(json.dumps(snapshot))
+    assert not (tmp_path / "state" / "snapshot.json.gz.tmp").exists()
+
+
+def test_unusable_snapshots_are_ignored(tmp_path):
+    path = str(tmp_path / "snapshot.json.gz")
+    assert read_snapshot(path) is None
+
+    with open(path, 'wb') as f:
+        f.write(b"not gzip")
+    assert read_snapshot(path) is None
+
+    with open(path, 'wb') as f:
+        f.write(gzip.compress(b'{"version": 1, "taken_at"'))
+    assert read_snapshot(path) is None
+
+    write_snapshot(path, {**snapshot_document([], None, True), 'version': 0})
+    assert read_snapshot(path) is None
+
+    write_snapshot(path, {**snapshot_document([], None, True), 'taken_at': time.time() - 120})
+    assert read_snapshot(path, max_age=60) is None
+    assert read_snapshot(path, max_age=600) is not None
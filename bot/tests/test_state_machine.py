@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from model.probe_model import ProbeResult
+from scheduler import state_machine
+from scheduler.state_machine import ServiceState
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    # 환경 변수와 관계없이 기본값으로 고정
+    monkeypatch.setattr(state_machine, "CHECK_WINDOW", 3)
+    monkeypatch.setattr(state_machine, "FAIL_THRESHOLD", 2)
+    monkeypatch.setattr(state_machine, "RECOVER_THRESHOLD", 2)
+    monkeypatch.setattr(state_machine, "DEGRADED_LATENCY", 0)
+    monkeypatch.setattr(state_machine, "FLAP_WINDOW", 3600)
+    monkeypatch.setattr(state_machine, "FLAP_THRESHOLD", 4)
+
+
+def result(up:bool, minute:int=0, latency:float=5.0, reason:str=None) -> ProbeResult:
+    return ProbeResult("h", 80, up, START + timedelta(minutes=minute), latency if up else None,
+                       reason or ("ok" if up else "timeout"))
+
+
+def feed(state:ServiceState, pattern:str, start:int=0) -> list:
+    """pattern의 u/f 순서대로 1분 간격 체크를 넣고 Transition 목록을 반환"""
+    return [state.observe(result(code == "u", start + index)) for index, code in enumerate(pattern)]
+
+
+def test_first_up_result_is_silent():
+    state = ServiceState()
+    transition = state.observe(result(True))
+    assert (transition.previous, transition.current, transition.notify) == ("init", "up", False)
+    assert state.status == "up" and state.state_since == START
+
+
+def test_first_down_result_notifies():
+    state = ServiceState()
+    transition = state.observe(result(False))
+    assert (transition.current, transition.notify, transition.reason) == ("down", True, "timeout")
+
+
+def test_single_failure_does_not_go_down():
+    state = ServiceState(status="up")
+    assert feed(state, "ufu") == [None, None, None]
+    assert state.status == "up"
+
+
+def test_n_of_m_failures_go_down():
+    state = ServiceState(status="up")
+    transitions = feed(state, "uff")
+    assert transitions[:2] == [None, None]
+    assert (transitions[2].previous, transitions[2].current, transitions[2].notify) == ("up", "down", True)
+    assert state.check_window == "uff"
+
+
+def test_recovery_needs_consecutive_ok(monkeypatch):
+    monkeypatch.setattr(state_machine, "RECOVER_THRESHOLD", 3)
+    state = ServiceState(status="down", check_window="fff")
+    # 두 번째 성공 후 window의 실패는 1개지만 연속 성공이 RECOVER_THRESHOLD 미만이라 down 유지
+    assert feed(state, "uu") == [None, None]
+    assert state.status == "down"
+    transition = feed(state, "u", 2)[0]
+    assert (transition.previous, transition.current, transition.notify) == ("down", "up", True)
+    assert state.reason is None
+
+
+def test_failure_resets_recovery_streak():
+    state = ServiceState(status="down", check_window="ffu", consecutive_ok=1)
+    assert feed(state, "fu") == [None, None]
+    # window의 실패는 1개뿐이지만 실패로 연속 성공이 다시 0부터 시작
+    assert (state.status, state.check_window, state.consecutive_ok) == ("down", "ufu", 1)
+    assert feed(state, "u", 2)[0].current == "up"
+
+
+def test_slow_responses_degrade(monkeypatch):
+    monkeypatch.setattr(state_machine, "DEGRADED_LATENCY", 100)
+    state = ServiceState(status="up")
+    assert state.observe(result(True, 0, latency=500)) is None
+    transition = state.observe(result(True, 1, latency=500))
+    assert transition.current == "degraded"
+    assert state.reason == "slow (500ms)"
+
+
+def test_flapping_pauses_alerts_and_recovers():
+    state = ServiceState(status="up")
+    transitions = [t for t in feed(state, "ffuuffuuff") if t is not None]
+    assert [(t.current, t.notify, t.flapping) for t in transitions] == [
+        ("down", True, False), ("up", True, False), ("down", True, False),
+        ("up", True, True),  # 네 번째 전환: flapping 알림 한 번
+        ("down", False, True)]
+    assert state.flapping
+    assert transitions[3].message("api", "h:80").startswith("[FLAPPING] api (h:80)")
+
+    # flapping 중 전환은 기록만 하고 알리지 않는다
+    later = [t for t in feed(state, "uu", 10) if t is not None]
+    assert [(t.current, t.notify) for t in later] == [("up", False)]
+
+    # FLAP_WINDOW가 지나 전환 기록이 줄면 한 번 [STABLE] 알림
+    stable = [t for t in feed(state, "uu", 120) if t is not None]
+    assert len(stable) == 1 and stable[0].previous == "flapping" and stable[0].notify
+    assert not state.flapping
+
+
+def test_legacy_status_is_treated_as_init():
+    state = ServiceState.from_document({'status': 'Connection refused'})
+    assert state.status == "init"
+
+
+def test_fields_round_trip():
+    state = ServiceState(status="up")
+    feed(state, "uff")
+    restored = ServiceState.from_document(state.to_fields())
+    assert restored.to_fields() == state.to_fields()
+
+
+def test_messages():
+    down = ServiceState(status="up", check_window="uuf")
+    transition = down.observe(result(False, reason="refused"))
+    assert transition.message("db", "h:5432") == "[DOWN] db (h:5432) - refused"
+    up = ServiceState(status="down", check_window="fuu", consecutive_ok=1)
+    assert up.observe(result(True)).message("db", "h:5432") == "[UP] db (h:5432) recovered (was down)"
@@ -0,0 +1,50 @@
+from scheduler.target_registry import TargetRegistry, target_key, target_label
+
+
+def service(service_id, interval:int=60, **fields) -> dict:
+    return {'_id': service_id, 'host': "example.com", 'port': 443, 'interval': interval, **fields}
+
+
+def test_target_key():
+    assert target_key(service(1)) == ("tcp", "example.com", 443)
+    http_item = service(1, probe_type="https", url="https://example.com/", expect_status=204)
+    assert target_key(http_item) == ("https", "https://example.com/", 204, None)
+    assert target_label(service(1)) == "example.com:443"
+    assert target_label(http_item) == "https://example.com/"
+
+
+def test_same_target_is_shared():
+    registry = TargetRegistry()
+    target, created = registry.subscribe(service(1, interval=300))
+    shared, shared_created = registry.subscribe(service(2, interval=60))
+    assert created and not shared_created and shared is target
+    assert (target.refcount, target.interval) == (2, 60)
+    assert registry.stats() == {'targets': 1, 'subscriptions': 2}
+
+
+def test_different_conditions_are_different_targets():
+    registry = TargetRegistry()
+    registry.subscribe(service(1, probe_type="https", url="https://example.com/"))
+    registry.subscribe(service(2, probe_type="https", url="https://example.com/", expect_body="ok"))
+    registry.subscribe(service(3))
+    assert len(registry) == 3
+
+
+def test_last_unsubscribe_removes_the_target():
+    registry = TargetRegistry()
+    target, _ = registry.subscribe(service(1, interval=60))
+    registry.subscribe(service(2, interval=300))
+    assert registry.unsubscribe(1) == (target, False)
+    assert target.interval == 300
+    assert registry.unsubscribe(2) == (target, True)
+    assert len(registry) == 0 and registry.stats()['subscriptions'] == 0
+    assert registry.unsubscribe(2) == (None, False)
+
+
+def test_resubscribe_with_a_new_target_moves_the_subscription():
+    registry = TargetRegistry()
+    old, _ = registry.subscribe(service(1))
+    new, created = registry.subscribe(service(1, port=8443))
+    assert created and new is not old
+    assert old.key not in registry.targets
+    assert registry.service_targets[1] == new.key
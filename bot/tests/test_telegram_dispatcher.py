@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+
+from notification import telegram_dispatcher
+from notification.telegram_dispatcher import TelegramDispatcher, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(telegram_dispatcher, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    monkeypatch.setattr(TelegramDispatcher, "_instance", None)
+    return TelegramDispatcher()
+
+
+def test_burst_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+
+
+def test_capacity_defaults_to_at_least_one():
+    assert TokenBucket(rate=30).capacity == 30
+    assert TokenBucket(rate=0.5).capacity == 1
+
+
+def test_refills_at_rate(clock):
+    bucket = TokenBucket(rate=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(1.0)
+    clock.now += 0.4
+    assert bucket.acquire() == pytest.approx(0.6)
+    clock.now += 0.6
+    assert bucket.acquire() == 0.0
+
+
+def test_refill_is_capped(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_pause_blocks_until_it_ends(clock):
+    bucket = TokenBucket(rate=30)
+    bucket.pause(5)
+    assert bucket.acquire() == pytest.approx(5)
+    clock.now += 2
+    bucket.pause(1)  # 더 짧은 pause로 줄어들지 않는다
+    assert bucket.acquire() == pytest.approx(3)
+    clock.now += 3
+    assert bucket.acquire() == 0.0
+
+
+def test_idle_chat_buckets_are_evicted(clock, dispatcher):
+    dispatcher._chat_bucket(1).acquire()
+    dispatcher._chat_bucket(2)
+    dispatcher._chat_bucket(3).pause(120)
+    clock.now += 30
+    dispatcher._chat_bucket(4)
+    assert set(dispatcher.chat_buckets) == {1, 2, 3, 4}
+    # 다음 정리 때 다시 가득 찬 bucket만 버린다 (pause 중인 bucket은 유지)
+    clock.now += 30
+    dispatcher._chat_bucket(5)
+    assert set(dispatcher.chat_buckets) == {3, 5}
+
+
+def test_flood_wait_pauses_the_global_bucket(clock, dispatcher):
+    def telegram(request):
+        return httpx.Response(429, json={'ok': False, 'parameters': {'retry_after': 5}})
+
+    async def scenario():
+        dispatcher.client = httpx.AsyncClient(base_url="http://telegram", transport=httpx.MockTransport(telegram))
+        dispatcher.queue = asyncio.Queue()
+        await dispatcher._deliver(({'chat_id': 1, 'text': "down"}, 0))
+        assert len(dispatcher.deferred) == 1
+        for task in dispatcher.deferred:
+            task.cancel()
+        await dispatcher.client.aclose()
+
+    asyncio.run(scenario())
+    assert dispatcher.metrics['rate_limited'] == 1
+    assert dispatcher.global_bucket.acquire() == pytest.approx(5)
+    assert dispatcher._chat_bucket(2).acquire() == 0.0
@@ -0,0 +1,47 @@
+import os
+import time
+
+from collections import OrderedDict
+
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", 20))
+# lease 모드에서는 상태 변경이 다른 프로세스에서 일어나므로 TTL로 최신성을 보장
+LIST_CACHE_TTL = float(os.getenv("LIST_CACHE_TTL", 30))
+LIST_CACHE_CHATS = int(os.getenv("LIST_CACHE_CHATS", 1000))
+
+
+class ListPageCache:
+    """
+    Singleton per-chat cache of rendered /list pages: chat_id -> {cursor: (text, reply_markup, expires)}.
+    Invalidated when the chat's services or statuses change; least recently used chats are evicted.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ListPageCache, cls).__new__(cls)
+            cls._instance.pages = OrderedDict()
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+        return cls._instance
+
+    def get(self, chat_id:str, cursor:str):
+        chat_pages = self.pages.get(chat_id)
+        page = chat_pages.get(cursor) if chat_pages is not None else None
+        if page is None or page[2] < time.monotonic():
+            self.misses += 1
+            return None
+        self.pages.move_to_end(chat_id)
+        self.hits += 1
+        return page[0], page[1]
+
+    def put(self, chat_id:str, cursor:str, text:str, reply_markup):
+        self.pages.setdefault(chat_id, dict())[cursor] = (text, reply_markup, time.monotonic() + LIST_CACHE_TTL)
+        self.pages.move_to_end(chat_id)
+        while len(self.pages) > LIST_CACHE_CHATS:
+            self.pages.popitem(last=False)
+
+    def invalidate(self, chat_id:str):
+        self.pages.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        return {'chats': len(self.pages), 'hits': self.hits, 'misses': self.misses}
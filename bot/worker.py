@@ -0,0 +1,39 @@
+import asyncio
+import signal
+
+from database.database import Database
+from database.probe_history import ProbeHistory
+from metrics.http_server import HealthServer
+from metrics.profiler import Profiler
+from notification.telegram_dispatcher import TelegramDispatcher
+from scheduler.lease_worker import LeaseWorker
+
+
+async def main_async():
+    """SCHEDULER_MODE=lease 에서 서비스 체크만 담당하는 워커 (컨테이너를 늘려 체크 용량 확장)"""
+    database = Database()
+    await database.initialize_connection()
+    await database.initialize_redis_connection()
+    await database.ensure_indexes()
+    await ProbeHistory().ensure_collections()
+    # 상태 전환 알림 전송
+    await TelegramDispatcher().start()
+
+    health_server = HealthServer()
+    health_server.add_readiness_check('mongo', database.ready.is_set)
+    await health_server.start()
+    # SIGUSR1 / SIGUSR2 프로파일링, STALL_THRESHOLD 설정 시 stall 감지
+    Profiler().install()
+
+    # SIGTERM(docker stop) / SIGINT: 진행 중인 체크와 결과 기록을 마치고 종료
+    worker = LeaseWorker()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signal_number, worker.stop)
+    await worker.run()
+    await TelegramDispatcher().stop()
+    await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())